@@ -2,6 +2,8 @@
 -- PostgreSQL Database Schema for Social Media Content Classification System
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS classification_ensembles CASCADE;
+DROP TABLE IF EXISTS near_duplicate_buckets CASCADE;
 DROP TABLE IF EXISTS classification_results CASCADE;
 DROP TABLE IF EXISTS clean_data_scraper CASCADE;
 DROP TABLE IF EXISTS clean_data_upload CASCADE;
@@ -56,6 +58,7 @@ CREATE TABLE raw_data (
     id SERIAL PRIMARY KEY,
     username VARCHAR(255) NOT NULL,
     content TEXT NOT NULL,
+    content_hash VARCHAR(64), -- SHA-256 of normalized text, used for duplicate checks
     url TEXT,
     platform VARCHAR(50) NOT NULL,
     source_type VARCHAR(20) DEFAULT 'upload',
@@ -74,6 +77,7 @@ CREATE TABLE raw_data_scraper (
     id SERIAL PRIMARY KEY,
     username VARCHAR(255) NOT NULL,
     content TEXT NOT NULL,
+    content_hash VARCHAR(64), -- SHA-256 of normalized text, used for duplicate checks
     url TEXT,
     platform VARCHAR(50) NOT NULL,
     keyword VARCHAR(255) NOT NULL,
@@ -99,10 +103,12 @@ CREATE TABLE clean_data_upload (
     username VARCHAR(255) NOT NULL,
     content TEXT NOT NULL,
     cleaned_content TEXT NOT NULL,
+    content_hash VARCHAR(64), -- SHA-256 of normalized text, used for duplicate checks
     url TEXT,
     platform VARCHAR(50) NOT NULL,
     dataset_id INTEGER REFERENCES datasets(id),
     cleaned_by INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    near_duplicate_of VARCHAR(40), -- Representative document ('upload_12') when clustered as near-duplicate
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -113,11 +119,13 @@ CREATE TABLE clean_data_scraper (
     username VARCHAR(255) NOT NULL,
     content TEXT NOT NULL,
     cleaned_content TEXT NOT NULL,
+    content_hash VARCHAR(64), -- SHA-256 of normalized text, used for duplicate checks
     url TEXT,
     platform VARCHAR(50) NOT NULL,
     keyword VARCHAR(255) NOT NULL,
     dataset_id INTEGER REFERENCES datasets(id),
     cleaned_by INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    near_duplicate_of VARCHAR(40), -- Representative document ('upload_12') when clustered as near-duplicate
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -153,6 +161,31 @@ CREATE TABLE classification_results (
     corrected_at TIMESTAMP -- When the correction was made
 );
 
+-- Create Classification Ensembles table (materialized majority vote per document)
+CREATE TABLE classification_ensembles (
+    id SERIAL PRIMARY KEY,
+    data_type VARCHAR(20) NOT NULL, -- 'upload' or 'scraper'
+    data_id INTEGER NOT NULL, -- ID from clean_data_upload or clean_data_scraper
+    dataset_id INTEGER REFERENCES datasets(id) ON DELETE CASCADE,
+    radikal_votes INTEGER NOT NULL DEFAULT 0,
+    non_radikal_votes INTEGER NOT NULL DEFAULT 0,
+    mean_probability_radikal FLOAT NOT NULL DEFAULT 0,
+    final_label VARCHAR(20) NOT NULL, -- Radikal, Non-Radikal (ties resolve to Non-Radikal)
+    classified_by INTEGER REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_classification_ensembles_document UNIQUE (data_type, data_id)
+);
+
+-- Create Near Duplicate Buckets table (MinHash/LSH index per dataset)
+CREATE TABLE near_duplicate_buckets (
+    id BIGSERIAL PRIMARY KEY,
+    dataset_id INTEGER NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
+    bucket BIGINT NOT NULL, -- LSH band hash (band number included)
+    data_type VARCHAR(20) NOT NULL, -- 'upload' or 'scraper'
+    data_id INTEGER NOT NULL -- ID from clean_data_upload or clean_data_scraper
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_users_email ON users(email);
@@ -182,6 +215,11 @@ CREATE INDEX idx_clean_data_scraper_platform ON clean_data_scraper(platform);
 CREATE INDEX idx_clean_data_scraper_dataset_id ON clean_data_scraper(dataset_id);
 CREATE INDEX idx_clean_data_scraper_created_at ON clean_data_scraper(created_at);
 
+CREATE INDEX idx_raw_data_dataset_content_hash ON raw_data(dataset_id, content_hash);
+CREATE INDEX idx_raw_data_scraper_dataset_content_hash ON raw_data_scraper(dataset_id, content_hash);
+CREATE INDEX idx_clean_data_upload_dataset_content_hash ON clean_data_upload(dataset_id, content_hash);
+CREATE INDEX idx_clean_data_scraper_dataset_content_hash ON clean_data_scraper(dataset_id, content_hash);
+
 CREATE INDEX idx_classification_results_classified_by ON classification_results(classified_by);
 CREATE INDEX idx_classification_results_prediction ON classification_results(prediction);
 CREATE INDEX idx_classification_results_classified_at ON classification_results(classified_at);
@@ -189,6 +227,12 @@ CREATE INDEX idx_classification_results_data_type ON classification_results(data
 CREATE INDEX idx_classification_results_data_id ON classification_results(data_id);
 CREATE INDEX idx_classification_results_model_name ON classification_results(model_name);
 CREATE INDEX idx_classification_results_data_type_id ON classification_results(data_type, data_id);
+CREATE INDEX idx_classification_ensembles_dataset_id ON classification_ensembles(dataset_id);
+CREATE INDEX idx_classification_ensembles_final_label ON classification_ensembles(final_label);
+CREATE INDEX idx_near_duplicate_buckets_dataset_bucket ON near_duplicate_buckets(dataset_id, bucket);
+CREATE INDEX idx_near_duplicate_buckets_document ON near_duplicate_buckets(data_type, data_id);
+CREATE INDEX ix_clean_data_upload_near_duplicate_of ON clean_data_upload(near_duplicate_of);
+CREATE INDEX ix_clean_data_scraper_near_duplicate_of ON clean_data_scraper(near_duplicate_of);
 
 -- Create full-text search indexes
 CREATE INDEX idx_clean_data_upload_content_fts ON clean_data_upload USING gin(to_tsvector('indonesian', content));
@@ -1,6 +1,8 @@
 import os
 import logging
 import locale
+import threading
+import time
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
@@ -21,12 +23,18 @@ load_dotenv(override=override_env)
 try:
     from models.models import db, User
     from models.models_otp import RegistrationRequest, AdminNotification, OTPEmailLog
+    from models.models_ensemble import ClassificationEnsemble
+    from models.models_content_hash import CONTENT_HASH_SOURCES
+    from models.models_near_duplicate import NearDuplicateBucket
     from blueprints.otp import otp_bp
     from config.config import config as config_map
 except ImportError:
     # Fallback for when running from different directory structure (e.g. docker init script)
     from src.backend.models.models import db, User
     from src.backend.models.models_otp import RegistrationRequest, AdminNotification, OTPEmailLog
+    from src.backend.models.models_ensemble import ClassificationEnsemble
+    from src.backend.models.models_content_hash import CONTENT_HASH_SOURCES
+    from src.backend.models.models_near_duplicate import NearDuplicateBucket
     from src.backend.blueprints.otp import otp_bp
     from src.backend.config.config import config as config_map
 
@@ -223,15 +231,21 @@ try:
 except Exception as e:
     logger.error(f"Error while validating/fixing upload folder permissions: {e}")
 
+# Process pools (cleaning, training) use 'spawn'. When the server runs as `python app.py`, every
+# pool worker re-imports this module as __mp_main__; workers only need it to import, so the
+# startup work below (table creation, model loading) is skipped there.
+is_spawned_worker = __name__ == '__mp_main__'
+
 # Create database tables
-with app.app_context():
-    # Wrap in try-except to handle race conditions during Docker startup
-    # where multiple workers might try to create tables simultaneously
-    try:
-        db.create_all()
-        logger.info("Database tables created/verified successfully")
-    except Exception as e:
-        logger.warning(f"Database table creation skipped (likely already exists or race condition): {e}")
+if not is_spawned_worker:
+    with app.app_context():
+        # Wrap in try-except to handle race conditions during Docker startup
+        # where multiple workers might try to create tables simultaneously
+        try:
+            db.create_all()
+            logger.info("Database tables created/verified successfully")
+        except Exception as e:
+            logger.warning(f"Database table creation skipped (likely already exists or race condition): {e}")
 
 # Initialize model variables
 word2vec_model = None
@@ -279,6 +293,32 @@ def load_models_on_first_request():
         ensure_models_loaded()
         app.models_loaded_first_request = True
 
+# Interrupted background jobs are recovered from processes that serve requests, never at import:
+# `flask db upgrade`, the gunicorn --preload master and spawned pool workers import this module too
+_job_recovery_lock = threading.Lock()
+_next_job_recovery = 0
+
+
+def recover_interrupted_jobs():
+    """Uploads left 'Processing' by a dead process are marked 'Failed'; lost batch coordinators are resumed"""
+    from services.ingestion_service import fail_orphaned_uploads
+    from services.scraping_batch_service import resume_batch_jobs
+    fail_orphaned_uploads(app)
+    resume_batch_jobs(app)
+
+
+@app.before_request
+def schedule_job_recovery():
+    """Run recover_interrupted_jobs in the background at most every JOB_RECOVERY_INTERVAL seconds per process"""
+    global _next_job_recovery
+    if time.monotonic() < _next_job_recovery or not _job_recovery_lock.acquire(blocking=False):
+        return
+    try:
+        _next_job_recovery = time.monotonic() + app.config.get('JOB_RECOVERY_INTERVAL', 300)
+        threading.Thread(target=recover_interrupted_jobs, daemon=True).start()
+    finally:
+        _job_recovery_lock.release()
+
 # Function to load models within app context with memory optimization
 def load_models():
     """Load Word2Vec dan Classification models dengan optimasi memori dan timeout handling"""
@@ -479,7 +519,7 @@ from blueprints.auth import auth_bp
 from blueprints.main import main_bp
 from blueprints.dataset import dataset_bp
 from blueprints.classification import classification_bp
-from blueprints.api import api_bp
+from blueprints.api import api_bp, apify_webhook
 from blueprints.admin import admin_bp
 from blueprints.scraper import scraper_bp
 
@@ -489,6 +529,8 @@ app.register_blueprint(dataset_bp)
 app.register_blueprint(scraper_bp)
 app.register_blueprint(classification_bp)
 app.register_blueprint(api_bp, url_prefix='/api')
+# Apify calls the webhook directly; it is authenticated with APIFY_WEBHOOK_SECRET instead of CSRF
+csrf.exempt(apify_webhook)
 
 app.register_blueprint(admin_bp)
 
@@ -517,7 +559,7 @@ else:
 # Call ensure_models_loaded at module level so it runs when imported by Gunicorn
 # But wrap it to avoid running during imports if needed, though Gunicorn imports app object.
 # Actually, Gunicorn loads the app object. If we want models loaded on worker boot:
-if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+if os.environ.get('WERKZEUG_RUN_MAIN') != 'true' and not is_spawned_worker:
    # This runs in production/Gunicorn worker boot
    try:
        ensure_models_loaded()
@@ -525,6 +567,7 @@ if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
        # If ensure_models_loaded is not defined (it was in snippet 195), let's check
        pass
 
+
 if __name__ == '__main__':
     
     # Load models only once when application starts (not during reloads)
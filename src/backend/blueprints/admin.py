@@ -6,8 +6,14 @@ from flask_login import login_required, current_user
 from sqlalchemy import text
 from utils.utils import admin_required
 from models.models import db, User, Dataset, RawData, RawDataScraper, ClassificationResult, DatasetStatistics, CleanDataUpload, CleanDataScraper, UserActivity, ManualClassificationHistory, ClassificationBatch, TrainingRun, TrainingMetric
+from models.models_ensemble import ClassificationEnsemble
+from models.models_near_duplicate import NearDuplicateBucket
 from utils.training_utils import train_models
 from utils.settings_utils import save_system_settings
+from services.chunk_upload_service import (
+    save_chunk, received_chunks, assemble_chunks, upload_checksum, open_upload,
+    ChunkChecksumError, ASSEMBLY_BUFFER_SIZE
+)
 import pandas as pd
 import os
 import shutil
@@ -23,14 +29,15 @@ from utils.i18n import t
 admin_bp = Blueprint('admin', __name__)
 
 # Global dictionary to store training tasks
-# task_id -> {status, progress, message, results, error}
+# task_id -> {status, progress, message, models, results, error}
+# models: model name -> {status: queued/training/completed/error, accuracy, seconds, error}
 training_tasks = {}
 
 # Global dictionary to store upload tasks
 # upload_id -> {status, progress, message, error, timestamp}
 upload_tasks = {}
 
-def process_indobert_upload(upload_id, temp_dir, final_filename, user_id):
+def process_indobert_upload(upload_id, temp_dir, final_filename, user_id, expected_checksum=None):
     """Background task to process uploaded IndoBERT model"""
     current_app.logger.info(f"Starting IndoBERT processing task: {upload_id}")
     try:
@@ -39,134 +46,111 @@ def process_indobert_upload(upload_id, temp_dir, final_filename, user_id):
             return
 
         upload_tasks[upload_id]['status'] = 'processing'
-        upload_tasks[upload_id]['message'] = 'Assembling file chunks...'
+        upload_tasks[upload_id]['message'] = 'Verifying file chunks...'
         upload_tasks[upload_id]['progress'] = 10
-        current_app.logger.info(f"Task {upload_id}: Assembling chunks...")
+        current_app.logger.info(f"Task {upload_id}: Verifying chunks...")
 
-        # Assemble chunks
-        assembled_file_path = os.path.join(temp_dir, final_filename)
-        
         # Check temp dir
         if not os.path.exists(temp_dir):
              raise ValueError(f"Temporary directory not found: {temp_dir}")
 
         # Check cancellation
         if upload_tasks[upload_id].get('status') == 'cancelled':
-             current_app.logger.warning(f"Task {upload_id}: Cancelled by user during chunk assembly")
+             current_app.logger.warning(f"Task {upload_id}: Cancelled by user during chunk verification")
              return
 
-        with open(assembled_file_path, 'wb') as outfile:
-            # List parts
-            parts = sorted([f for f in os.listdir(temp_dir) if f.startswith('part_')], key=lambda x: int(x.split('_')[1]))
-            total_parts = len(parts)
-            current_app.logger.info(f"Task {upload_id}: Found {total_parts} chunks")
-            
-            if total_parts == 0:
-                raise ValueError("No file chunks found")
-
-            for i, part in enumerate(parts):
-                # Check cancellation in loop
-                if i % 5 == 0 and upload_tasks[upload_id].get('status') == 'cancelled':
-                     current_app.logger.warning(f"Task {upload_id}: Cancelled by user during assembly")
-                     return
+        # Chunks are not assembled: the ZIP is read directly from the part files
+        total_parts = len(received_chunks(temp_dir))
+        current_app.logger.info(f"Task {upload_id}: Found {total_parts} chunks")
+        if total_parts == 0:
+            raise ValueError("No file chunks found")
 
-                part_path = os.path.join(temp_dir, part)
-                with open(part_path, 'rb') as infile:
-                    outfile.write(infile.read())
-                # Update progress during assembly (10-50%)
-                if total_parts > 0:
-                    progress = 10 + int((i / total_parts) * 40)
-                    upload_tasks[upload_id]['progress'] = progress
-        
-        current_app.logger.info(f"Task {upload_id}: Assembly complete. Cleaning up chunks...")
-        
-        # Cleanup parts
-        for part in parts:
-            try:
-                os.remove(os.path.join(temp_dir, part))
-            except:
-                pass
+        if expected_checksum:
+            upload_tasks[upload_id]['message'] = 'Verifying file checksum...'
+            if upload_checksum(temp_dir) != expected_checksum.strip().lower():
+                raise ChunkChecksumError("Uploaded file checksum does not match")
+            current_app.logger.info(f"Task {upload_id}: Checksum verified")
 
         upload_tasks[upload_id]['message'] = 'Validating ZIP file...'
         upload_tasks[upload_id]['progress'] = 60
 
-        # Validate ZIP
-        if not zipfile.is_zipfile(assembled_file_path):
-            raise ValueError("Assembled file is not a valid ZIP")
-            
-        current_app.logger.info(f"Task {upload_id}: ZIP validation passed")
+        with open_upload(temp_dir) as upload_stream:
+            # Validate ZIP
+            if not zipfile.is_zipfile(upload_stream):
+                raise ValueError("Uploaded file is not a valid ZIP")
+
+            current_app.logger.info(f"Task {upload_id}: ZIP validation passed")
+
+            upload_tasks[upload_id]['message'] = 'Extracting model files...'
+            upload_tasks[upload_id]['progress'] = 70
+
+            # Extract
+            indobert_path = current_app.config.get('MODEL_INDOBERT_PATH')
+            current_app.logger.info(f"Task {upload_id}: Extracting to {indobert_path}")
+
+            # Clear existing directory
+            if os.path.exists(indobert_path):
+                shutil.rmtree(indobert_path)
+            os.makedirs(indobert_path, exist_ok=True)
+
+            with zipfile.ZipFile(upload_stream, 'r') as zip_ref:
+                # Progress during extraction (70-90%)
+                file_list = zip_ref.namelist()
+                total_files = len(file_list)
+
+                # Detect root folder (if all files are in a single top-level folder)
+                root_folder = None
+                if total_files > 0:
+                    first_file = file_list[0]
+                    if '/' in first_file:
+                        potential_root = first_file.split('/')[0]
+                        # Check if all files start with this folder
+                        if all(f.startswith(potential_root + '/') for f in file_list if '/' in f):
+                             root_folder = potential_root
+
+                current_app.logger.info(f"Task {upload_id}: Root folder detected: {root_folder}")
+
+                for i, file_info in enumerate(zip_ref.infolist()):
+                    # Check cancellation
+                    if i % 50 == 0 and upload_tasks[upload_id].get('status') == 'cancelled':
+                         current_app.logger.warning(f"Task {upload_id}: Cancelled by user during extraction")
+                         return
+
+                    # Skip directories
+                    if file_info.is_dir():
+                        continue
+
+                    filename = file_info.filename
+
+                    # Strip root folder if exists
+                    if root_folder and filename.startswith(root_folder + '/'):
+                        target_filename = filename[len(root_folder) + 1:]
+                    else:
+                        target_filename = filename
 
-        upload_tasks[upload_id]['message'] = 'Extracting model files...'
-        upload_tasks[upload_id]['progress'] = 70
+                    # Skip invalid filenames (e.g. __MACOSX)
+                    if target_filename.startswith('__MACOSX') or target_filename.startswith('.'):
+                        continue
 
-        # Extract
-        indobert_path = current_app.config.get('MODEL_INDOBERT_PATH')
-        current_app.logger.info(f"Task {upload_id}: Extracting to {indobert_path}")
-        
-        # Clear existing directory
-        if os.path.exists(indobert_path):
-            shutil.rmtree(indobert_path)
-        os.makedirs(indobert_path, exist_ok=True)
-        
-        with zipfile.ZipFile(assembled_file_path, 'r') as zip_ref:
-            # Progress during extraction (70-90%)
-            file_list = zip_ref.namelist()
-            total_files = len(file_list)
-            
-            # Detect root folder (if all files are in a single top-level folder)
-            root_folder = None
-            if total_files > 0:
-                first_file = file_list[0]
-                if '/' in first_file:
-                    potential_root = first_file.split('/')[0]
-                    # Check if all files start with this folder
-                    if all(f.startswith(potential_root + '/') for f in file_list if '/' in f):
-                         root_folder = potential_root
-
-            current_app.logger.info(f"Task {upload_id}: Root folder detected: {root_folder}")
-
-            for i, file_info in enumerate(zip_ref.infolist()):
-                # Check cancellation
-                if i % 50 == 0 and upload_tasks[upload_id].get('status') == 'cancelled':
-                     current_app.logger.warning(f"Task {upload_id}: Cancelled by user during extraction")
-                     return
-
-                # Skip directories
-                if file_info.is_dir():
-                    continue
-                    
-                filename = file_info.filename
-                
-                # Strip root folder if exists
-                if root_folder and filename.startswith(root_folder + '/'):
-                    target_filename = filename[len(root_folder) + 1:]
-                else:
-                    target_filename = filename
-                
-                # Skip invalid filenames (e.g. __MACOSX)
-                if target_filename.startswith('__MACOSX') or target_filename.startswith('.'):
-                    continue
-                    
-                # Construct target path
-                target_path = os.path.join(indobert_path, target_filename)
-                
-                # Ensure directory exists
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                
-                # Extract file
-                with zip_ref.open(filename) as source, open(target_path, "wb") as target:
-                    shutil.copyfileobj(source, target)
+                    # Construct target path
+                    target_path = os.path.join(indobert_path, target_filename)
+
+                    # Ensure directory exists
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+                    # Extract file
+                    with zip_ref.open(file_info) as source, open(target_path, "wb") as target:
+                        shutil.copyfileobj(source, target, ASSEMBLY_BUFFER_SIZE)
+
+                    if i % 10 == 0 and total_files > 0:
+                         progress = 70 + int((i / total_files) * 20)
+                         upload_tasks[upload_id]['progress'] = progress
 
-                if i % 10 == 0 and total_files > 0:
-                     progress = 70 + int((i / total_files) * 20)
-                     upload_tasks[upload_id]['progress'] = progress
-        
         current_app.logger.info(f"Task {upload_id}: Extraction complete")
 
         # Final cleanup
         try:
-            os.remove(assembled_file_path)
-            os.rmdir(temp_dir)
+            shutil.rmtree(temp_dir)
         except Exception as cleanup_err:
             current_app.logger.warning(f"Task {upload_id}: Cleanup warning: {cleanup_err}")
             
@@ -274,13 +258,17 @@ def upload_chunk():
     - Supports retry logic on the frontend (up to 10 retries with exponential backoff).
     - Timeout per chunk is extended to handle network jitter.
     
+    - Chunks are streamed to disk through the shared chunk upload service; when the frontend
+      sends a `checksum` (SHA-256 hex) the chunk is only kept if it matches.
+    
     Args:
         upload_id (form): The ID of the upload session.
         chunk_index (form): The sequence number of the chunk (0-based).
+        checksum (form, optional): SHA-256 hex digest of the chunk.
         chunk (file): The file data for this chunk.
         
     Returns:
-        JSON: {'success': True} on success.
+        JSON: {'success': True, 'checksum': str} on success, 409 if the checksum does not match.
     """
     upload_id = request.form.get('upload_id')
     chunk_index = request.form.get('chunk_index')
@@ -295,24 +283,38 @@ def upload_chunk():
         return jsonify({'error': 'Invalid upload ID'}), 404
         
     task = upload_tasks[upload_id]
-    chunk_path = os.path.join(task['temp_dir'], f'part_{chunk_index}')
     
     try:
-        chunk.save(chunk_path)
-        # current_app.logger.debug(f"Chunk {chunk_index} saved for {upload_id}")
+        checksum = save_chunk(task['temp_dir'], chunk_index, chunk.stream, request.form.get('checksum'))
+    except ChunkChecksumError as e:
+        current_app.logger.warning(f"Chunk {chunk_index} for {upload_id} rejected: {e}")
+        return jsonify({'error': str(e), 'retry': True}), 409
     except Exception as e:
         current_app.logger.error(f"Failed to save chunk {chunk_index} for {upload_id}: {e}")
         return jsonify({'error': str(e)}), 500
     
-    return jsonify({'success': True})
+    return jsonify({'success': True, 'checksum': checksum})
 
-def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type, user_id):
+@admin_bp.route('/admin/upload/<upload_id>/chunks')
+@login_required
+@admin_required
+def upload_chunks_status(upload_id):
+    """
+    List chunks already stored for an upload (index -> SHA-256), so the frontend can resume
+    an interrupted upload by sending only the missing chunks.
+    """
+    if upload_id not in upload_tasks:
+        return jsonify({'error': 'Invalid upload ID'}), 404
+    return jsonify({'upload_id': upload_id, 'received': received_chunks(upload_tasks[upload_id]['temp_dir'])})
+
+def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type, user_id, expected_checksum=None):
     """
     Background task to process uploaded generic model (Word2Vec, etc) after chunk assembly.
     
     This function is triggered after all chunks are uploaded. It performs the following:
-    1.  **Assembly**: Combines `part_0`, `part_1`, ... into the final file.
-    2.  **Validation**: Basic validation (existence of chunks).
+    1.  **Assembly**: Copies `part_0`, `part_1`, ... (kernel-side via `os.sendfile`) into a
+        temporary file next to the target, so installing it is a rename on the same filesystem.
+    2.  **Validation**: Existence of chunks and, when the client sent one, the SHA-256 of the whole file.
     3.  **Installation**: 
         - Determines target path based on `model_type` from configuration.
         - Backs up/removes the old model.
@@ -329,6 +331,7 @@ def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type
         final_filename (str): Name of the final assembled file.
         model_type (str): Type of model (e.g., 'word2vec', 'svm').
         user_id (int): ID of the user performing the upload.
+        expected_checksum (str, optional): SHA-256 hex digest of the whole file.
     """
     current_app.logger.info(f"Starting generic model processing task: {upload_id}, type: {model_type}")
     try:
@@ -339,10 +342,8 @@ def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type
         upload_tasks[upload_id]['status'] = 'processing'
         upload_tasks[upload_id]['message'] = 'Assembling file chunks...'
         upload_tasks[upload_id]['progress'] = 10
-        
-        # Assemble chunks
-        assembled_file_path = os.path.join(temp_dir, final_filename)
-        
+        assembled_file_path = None
+
         if not os.path.exists(temp_dir):
              raise ValueError(f"Temporary directory not found: {temp_dir}")
         
@@ -383,35 +384,21 @@ def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type
                  import gc
                  gc.collect()
 
-        with open(assembled_file_path, 'wb') as outfile:
-            parts = sorted([f for f in os.listdir(temp_dir) if f.startswith('part_')], key=lambda x: int(x.split('_')[1]))
-            total_parts = len(parts)
-            
-            if total_parts == 0:
-                raise ValueError("No file chunks found")
+        # Assemble next to the target so the final move is a rename, not another copy
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        assembled_file_path = f"{target_path}.{upload_id}.upload"
+
+        def assembly_progress(done, total_parts):
+            upload_tasks[upload_id]['progress'] = 10 + int((done / total_parts) * 80) # 10-90%
+
+        assemble_chunks(temp_dir, assembled_file_path, expected_checksum, assembly_progress)
 
-            for i, part in enumerate(parts):
-                part_path = os.path.join(temp_dir, part)
-                with open(part_path, 'rb') as infile:
-                    outfile.write(infile.read())
-                
-                if total_parts > 0:
-                    progress = 10 + int((i / total_parts) * 80) # 10-90%
-                    upload_tasks[upload_id]['progress'] = progress
-        
         # Cleanup parts
-        for part in parts:
-            try:
-                os.remove(os.path.join(temp_dir, part))
-            except:
-                pass
-                
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
         upload_tasks[upload_id]['message'] = 'Installing model...'
         upload_tasks[upload_id]['progress'] = 90
         
-        # Move to target location
-        os.makedirs(os.path.dirname(target_path), exist_ok=True)
-        
         # Replace file logic with Pending Update Strategy for Windows
         # If immediate replacement fails, we queue it as a pending update.
         
@@ -450,12 +437,6 @@ def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type
             
             upload_tasks[upload_id]['message'] = 'Upload complete. PLEASE RESTART SERVER to apply changes.'
             # We mark as completed so the UI stops polling, but with a warning message.
-        
-        # Cleanup temp dir
-        try:
-            os.rmdir(temp_dir)
-        except:
-            pass
             
         # Log activity
         try:
@@ -487,6 +468,8 @@ def process_generic_model_upload(upload_id, temp_dir, final_filename, model_type
         try:
             if os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
+            if assembled_file_path and os.path.exists(assembled_file_path):
+                os.remove(assembled_file_path)
         except:
             pass
     finally:
@@ -512,7 +495,9 @@ def upload_finish():
     Process:
     1.  Verifies `upload_id`.
     2.  Updates status to 'pending_processing'.
-    3.  Spawns a background thread running `process_indobert_upload` or `process_generic_model_upload`
+    3.  Passes the optional `checksum` (SHA-256 hex of the whole file) to the processing task,
+        which rejects the upload if it does not match.
+    4.  Spawns a background thread running `process_indobert_upload` or `process_generic_model_upload`
         depending on the `model_type`.
     
     Returns:
@@ -535,13 +520,13 @@ def upload_finish():
     app = current_app._get_current_object()
     user_id = current_user.id
     
-    def thread_with_context(app, upload_id, temp_dir, filename, user_id, model_type):
+    def thread_with_context(app, upload_id, temp_dir, filename, user_id, model_type, checksum):
         try:
             with app.app_context():
                 if model_type == 'indobert':
-                    process_indobert_upload(upload_id, temp_dir, filename, user_id)
+                    process_indobert_upload(upload_id, temp_dir, filename, user_id, checksum)
                 else:
-                    process_generic_model_upload(upload_id, temp_dir, filename, model_type, user_id)
+                    process_generic_model_upload(upload_id, temp_dir, filename, model_type, user_id, checksum)
         except Exception as e:
             if upload_id in upload_tasks:
                 upload_tasks[upload_id]['status'] = 'failed'
@@ -549,7 +534,8 @@ def upload_finish():
             app.logger.error(f"Background upload thread crashed: {e}", exc_info=True)
             
     thread = threading.Thread(target=thread_with_context,
-                            args=(app, upload_id, task['temp_dir'], task['filename'], user_id, model_type))
+                            args=(app, upload_id, task['temp_dir'], task['filename'], user_id, model_type,
+                                  request.form.get('checksum')))
     thread.start()
     
     return jsonify({'success': True})
@@ -660,6 +646,9 @@ def run_training_async(app, task_id, df, word2vec_model, user_id, filename, col_
             def progress_callback(message, percent):
                 training_tasks[task_id]['message'] = message
                 training_tasks[task_id]['progress'] = percent
+
+            def model_progress_callback(name, state):
+                training_tasks[task_id].setdefault('models', {})[name] = state
             
             results = train_models(
                 df=df,
@@ -669,7 +658,8 @@ def run_training_async(app, task_id, df, word2vec_model, user_id, filename, col_
                 filename=filename,
                 col_text=col_text,
                 col_label=col_label,
-                progress_callback=progress_callback
+                progress_callback=progress_callback,
+                model_progress_callback=model_progress_callback
             )
             
             training_tasks[task_id]['status'] = 'completed'
@@ -1589,9 +1579,11 @@ def database_reset():
             pass
             
         # 3. Delete classification results
+        ClassificationEnsemble.query.delete()
         ClassificationResult.query.delete()
         
         # 4. Delete clean data
+        NearDuplicateBucket.query.delete()
         CleanDataUpload.query.delete()
         CleanDataScraper.query.delete()
         
@@ -1627,7 +1619,7 @@ def database_reset():
             
         # Reset sequences
         tables = [
-            'classification_results', 'clean_data_upload', 'clean_data_scraper',
+            'classification_results', 'classification_ensembles', 'near_duplicate_buckets', 'clean_data_upload', 'clean_data_scraper',
             'raw_data', 'raw_data_scraper', 'classification_batches', 'datasets', 'user_activities',
             'dataset_statistics', 'manual_classification_history', 'training_runs', 'training_metrics',
             'registration_requests', 'admin_notifications', 'otp_email_logs'
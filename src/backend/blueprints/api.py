@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, current_app, request
 from datetime import datetime
+import hmac
 import threading
 import uuid
 import pytz
@@ -8,8 +9,14 @@ from werkzeug.utils import secure_filename
 from flask_login import login_required, current_user
 from models.models import db, Dataset, User, RawData, RawDataScraper, CleanDataUpload, CleanDataScraper, ClassificationResult, UserActivity, ClassificationBatch, ManualClassificationHistory, ClassificationConfig, TrainingRun
 from sqlalchemy import desc, func
-from services.apify_service import ApifyService
-from utils.utils import get_jakarta_time, JAKARTA_TZ, admin_required, flatten_dict, generate_activity_log, check_dataset_permission
+from services.apify_service import ApifyService, WEBHOOK_TOKEN_HEADER
+from services.scraping_service import get_mapping_preview, handle_run_event, start_finished_run_job
+from utils.cache_utils import get_or_compute, invalidate
+from models.models_ensemble import ClassificationEnsemble
+from services.ensemble_service import delete_ensembles
+from services.near_duplicate_service import delete_near_duplicate_buckets
+from services.ingestion_service import remove_upload_file
+from utils.utils import get_jakarta_time, JAKARTA_TZ, admin_required, generate_activity_log, check_dataset_permission
 
 api_bp = Blueprint('api', __name__)
 
@@ -26,154 +33,155 @@ def models_status():
         'classification_models_count': len([m for m in classification_models.values() if m is not None])
     })
 
+SCRAPING_FINAL_STATUSES = ('SUCCEEDED', 'FAILED', 'ABORTED', 'TIMED-OUT')
+
+
+def _stored_scraping_progress(dataset_record):
+    """Progress from the database once the run webhook has recorded a final status, else None"""
+    meta_info = (dataset_record.meta_info or {}) if dataset_record else {}
+    status = meta_info.get('apify_status')
+    if status not in SCRAPING_FINAL_STATUSES:
+        return None
+    
+    schema = meta_info.get('mapping_schema') or {}
+    # A succeeded run still needs Apify for the mapping preview until the schema is stored
+    if status == 'SUCCEEDED' and not schema.get('columns') and not meta_info.get('column_mapping'):
+        return None
+    
+    return {
+        'status': status,
+        'progress_percentage': 100 if status == 'SUCCEEDED' else 0,
+        'items_processed': dataset_record.total_records or 0,
+        'requests_handled': dataset_record.total_records or 0,
+        'apify_dataset_id': meta_info.get('apify_dataset_id'),
+        'columns': schema.get('columns', []),
+        'sample_data': schema.get('sample_data', []),
+        'dataset_status': dataset_record.status
+    }
+
+
+def _fetch_scraping_progress(job_id, dataset_record):
+    """Run status, item count and (once finished) mapping preview from Apify for one run"""
+    # job_id is the Apify Run ID
+    run_data = ApifyService.get_run_status(job_id)
+    
+    status = run_data.get('status')
+    default_dataset_id = run_data.get('defaultDatasetId')
+    
+    # Try to extract stats
+    stats = run_data.get('stats', {})
+    requests_finished = stats.get('requestsFinished', 0)
+    
+    # Try to get real item count from dataset
+    items_processed = requests_finished
+    if default_dataset_id:
+        dataset_info = ApifyService.get_dataset_info(default_dataset_id)
+        if dataset_info is not None:
+            items_processed = dataset_info.get('itemCount', 0)
+            
+    if status == 'SUCCEEDED':
+        # Ensure items_processed is at least requestsFinished if dataset info failed
+        if items_processed == 0 and requests_finished > 0:
+            items_processed = requests_finished
+    
+    # If finished, we can fetch columns and sample data
+    sample_data = []
+    columns = []
+    if status == 'SUCCEEDED' and default_dataset_id:
+        try:
+            # Sample only; the column schema is cached with the dataset
+            preview = get_mapping_preview(default_dataset_id, dataset_record)
+            columns = preview['columns']
+            sample_data = preview['sample_data']
+            if not sample_data and items_processed > 0:
+                current_app.logger.warning(f"Apify status SUCCEEDED and items_processed={items_processed} but the item sample was empty.")
+        except Exception as e:
+            current_app.logger.error(f"Error fetching dataset items: {e}")
+            # Don't fail the whole request, just return empty data
+    
+    return {
+        'status': status,
+        'items_processed': items_processed,
+        'requests_handled': requests_finished,
+        'apify_dataset_id': default_dataset_id,
+        'columns': columns,
+        'sample_data': sample_data
+    }
+
+
+def _scraping_progress_ttl(progress):
+    if progress.get('status') in SCRAPING_FINAL_STATUSES:
+        return current_app.config.get('SCRAPING_PROGRESS_FINAL_TTL', 60)
+    return current_app.config.get('SCRAPING_PROGRESS_TTL', 3)
+
+
+def _estimate_progress_percentage(progress, dataset_record):
+    status = progress['status']
+    if status == 'SUCCEEDED':
+        return 100
+    if status != 'RUNNING':
+        return 0
+    
+    # Use itemCount against the requested max_results as the estimate
+    max_results = 0
+    if dataset_record and dataset_record.meta_info:
+        max_results = dataset_record.meta_info.get('max_results', 100) or 0
+    if max_results <= 0:
+        return 50 # Fallback
+    
+    progress_percentage = min(99, int((progress['items_processed'] / max_results) * 100))
+    
+    # Heuristic: if progress is 0 but we have requests finished, estimate from requests instead
+    requests_finished = progress['requests_handled']
+    if progress_percentage == 0 and requests_finished > 0:
+        progress_percentage = min(95, int((requests_finished / max_results) * 100)) or 5
+    return progress_percentage
+
+
 @api_bp.route('/scraping/progress/<job_id>')
 @login_required
 def get_scraping_progress(job_id):
     try:
-        # Check permission based on dataset ownership if exists
+        # Single lookup: permission, max_results and the status update all use this record
         dataset_record = Dataset.query.filter_by(external_id=job_id).first()
         if dataset_record and not check_dataset_permission(dataset_record, current_user):
              return jsonify({'success': False, 'message': 'Permission denied'}), 403
-             
-        # job_id is the Apify Run ID
-        run_data = ApifyService.get_run_status(job_id)
-        
-        status = run_data.get('status')
-        default_dataset_id = run_data.get('defaultDatasetId')
-        
-        # Try to extract stats
-        stats = run_data.get('stats', {})
-        options = run_data.get('options', {})
-        
-        # Calculate progress
-        # If actor provides progress in meta field, use it. Otherwise guess based on status.
-        progress_percentage = 0
-        items_processed = 0
-        
-        # Try to get real item count from dataset
-        if default_dataset_id:
-            dataset_info = ApifyService.get_dataset_info(default_dataset_id)
-            if dataset_info is not None:
-                items_processed = dataset_info.get('itemCount', 0)
-            else:
-                # If fetching dataset info failed, fallback to requestsFinished as proxy
-                items_processed = stats.get('requestsFinished', 0)
-        else:
-             items_processed = stats.get('requestsFinished', 0)
-            
-        # Try to get max items from meta_info if stored in dataset
-        # But we don't have easy access to dataset object here without querying DB
-        # However, we can try to guess from options or run inputs if available in run_data
-        # For now, let's use a heuristic
-        
-        if status == 'SUCCEEDED':
-            progress_percentage = 100
-            # Ensure items_processed is at least requestsFinished if dataset info failed
-            if items_processed == 0 and stats.get('requestsFinished', 0) > 0:
-                items_processed = stats.get('requestsFinished', 0)
-                
-        elif status == 'RUNNING':
-            # Use itemCount to estimate progress if we have a target
-            # Since we don't have max_results easily available here (it's in the DB), 
-            # we can either query DB or just use items_processed as a signal of life
-            # Let's query the dataset to get max_results from meta_info
-            # This is slightly expensive but accurate
-            try:
-                # Find dataset by external_id (run_id)
-                dataset_record = Dataset.query.filter_by(external_id=job_id).first()
-                if dataset_record and dataset_record.meta_info:
-                    max_results = dataset_record.meta_info.get('max_results', 100)
-                    if max_results > 0:
-                        progress_percentage = min(99, int((items_processed / max_results) * 100))
-                    else:
-                        progress_percentage = 50 # Fallback
-                else:
-                    progress_percentage = 50 # Fallback
-            except:
-                progress_percentage = 50 # Fallback
-                
-            # Heuristic: if progress is 0 but we have requests finished, show at least 5%
-            # Also try to estimate progress from requests if items count is lagging
-            requests_finished = stats.get('requestsFinished', 0)
-            
-            if progress_percentage == 0 and requests_finished > 0:
-                 # Try to calculate based on requests vs max_results
-                 try:
-                     dataset_record = Dataset.query.filter_by(external_id=job_id).first()
-                     if dataset_record and dataset_record.meta_info:
-                        max_results = dataset_record.meta_info.get('max_results', 100)
-                        if max_results > 0:
-                            progress_percentage = min(95, int((requests_finished / max_results) * 100))
-                 except:
-                     pass
-                     
-                 if progress_percentage == 0:
-                    progress_percentage = 5
-        elif status in ['FAILED', 'ABORTED', 'TIMED-OUT']:
-            progress_percentage = 0
-            
-        # If finished, we can fetch columns and sample data
-        sample_data = []
-        columns = []
+        
+        # Finished runs reported by the webhook are answered from the database
+        stored = _stored_scraping_progress(dataset_record)
+        if stored:
+            return jsonify({'success': True, 'data': stored})
+        
+        # Upstream calls are cached per run for a few seconds and coalesced across tabs and workers
+        progress = get_or_compute(
+            f"scraping_progress:{job_id}",
+            _scraping_progress_ttl,
+            lambda: _fetch_scraping_progress(job_id, dataset_record)
+        )
+        status = progress['status']
+        items_processed = progress['items_processed']
+        progress_percentage = _estimate_progress_percentage(progress, dataset_record)
         
         # Update Dataset Record in Database to reflect real-time progress
-        try:
-            dataset = Dataset.query.filter_by(external_id=job_id).first()
-            if dataset:
-                # Update record count
-                if items_processed > dataset.total_records:
-                    dataset.total_records = items_processed
+        if dataset_record:
+            try:
+                if items_processed > (dataset_record.total_records or 0):
+                    dataset_record.total_records = items_processed
                 
                 # Update status based on Apify status
                 if status == 'SUCCEEDED':
-                    dataset.status = 'Raw'
+                    dataset_record.status = 'Raw'
                 elif status in ['FAILED', 'TIMED-OUT']:
-                    dataset.status = 'Failed'
+                    dataset_record.status = 'Failed'
                 elif status == 'ABORTED':
-                    dataset.status = 'Aborted'
+                    dataset_record.status = 'Aborted'
                 # If RUNNING, we leave it as is (likely 'Raw' from creation)
                 
-                db.session.commit()
-        except Exception as db_e:
-            current_app.logger.error(f"Error updating dataset progress in DB: {db_e}")
-
-        if status == 'SUCCEEDED' and default_dataset_id:
-            try:
-                # Use limit=10 to fetch only a sample for column mapping and preview
-                # This prevents timeouts on large datasets during progress checking
-                items = ApifyService.get_dataset_items(default_dataset_id, limit=10)
-                
-                # If sample with limit returns empty but we know there are items, try fetching without limit (maybe bug in Apify API with limit?)
-                # Or try fetching from offset
-                if not items and items_processed > 0:
-                     current_app.logger.warning(f"Apify status SUCCEEDED and items_processed={items_processed} but get_dataset_items(limit=10) returned empty. Retrying without limit...")
-                     # Try fetching just 1 item without limit param logic if possible, or just standard call
-                     # Note: ApifyService.get_dataset_items handles limit param manually
-                     # Let's try to get info again to be sure
-                     pass
-                
-                if items:
-                    # Note: items_processed here is just the sample count if we used limit
-                    # So we should NOT overwrite items_processed with len(items) if we used limit
-                    # Use the count from dataset_info or stats instead (already calculated above)
-                    
-                    # Get columns from first item (flattened)
-                    first_item = items[0]
-                    # Deep flattening for columns using recursive function
-                    flat_item = flatten_dict(first_item)
-                    columns = list(flat_item.keys())
-                    
-                    # Flatten sample data as well for consistent preview
-                    sample_data = [flatten_dict(item) for item in items[:5]]
-                else:
-                    # If items are really empty, we can't do much mapping
-                    if items_processed > 0:
-                         current_app.logger.warning(f"Apify status SUCCEEDED and items_processed={items_processed} but get_dataset_items returned empty.")
-                    # Don't reset items_processed to 0 here because we might have failed to fetch sample 
-                    # but we know from stats that items exist.
-            except Exception as e:
-                current_app.logger.error(f"Error fetching dataset items: {e}")
-                # Don't fail the whole request, just return empty data
+                if db.session.dirty:
+                    db.session.commit()
+            except Exception as db_e:
+                db.session.rollback()
+                current_app.logger.error(f"Error updating dataset progress in DB: {db_e}")
         
         return jsonify({
             'success': True,
@@ -181,16 +189,60 @@ def get_scraping_progress(job_id):
                 'status': status,
                 'progress_percentage': progress_percentage,
                 'items_processed': items_processed,
-                'requests_handled': stats.get('requestsFinished', 0),
-                'apify_dataset_id': default_dataset_id,
-                'columns': columns,
-                'sample_data': sample_data
+                'requests_handled': progress['requests_handled'],
+                'apify_dataset_id': progress['apify_dataset_id'],
+                'columns': progress['columns'],
+                'sample_data': progress['sample_data']
             }
         })
     except Exception as e:
         current_app.logger.error(f"Error getting scraping progress: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@api_bp.route('/scraping/webhook/apify', methods=['POST'])
+def apify_webhook():
+    """
+    Receiver for Apify run webhooks registered by ApifyService.start_scraping_job.
+    Authenticated with the shared APIFY_WEBHOOK_SECRET sent in the X-Apify-Webhook-Token header.
+    Unknown or repeated events are acknowledged with 200 so Apify does not keep retrying them.
+    """
+    # Only accepted while runs are registered with webhooks (URL and secret both configured)
+    if not ApifyService.webhooks_enabled():
+        return jsonify({'success': False, 'message': 'Webhook not configured'}), 404
+    
+    secret = current_app.config.get('APIFY_WEBHOOK_SECRET')
+    token = request.headers.get(WEBHOOK_TOKEN_HEADER, '')
+    if not hmac.compare_digest(token.encode('utf-8'), secret.encode('utf-8')):
+        return jsonify({'success': False, 'message': 'Invalid webhook token'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    run = payload.get('resource') or {}
+    run_id = run.get('id') or (payload.get('eventData') or {}).get('actorRunId')
+    if not run_id:
+        return jsonify({'success': False, 'message': 'Run ID missing'}), 400
+    
+    try:
+        # Row lock: a concurrent delivery of the same event waits here and then sees the final status
+        dataset = Dataset.query.filter_by(external_id=run_id).with_for_update().first()
+        if not dataset:
+            db.session.rollback()
+            current_app.logger.warning(f"Apify webhook for unknown run {run_id} ({payload.get('eventType')})")
+            return jsonify({'success': True, 'handled': False})
+        handled = handle_run_event(dataset, run)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error handling Apify webhook for run {run_id}: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    # Only after the commit, so the job reads the stored status and dataset id
+    if handled:
+        start_finished_run_job(current_app._get_current_object(), dataset)
+    invalidate(f"scraping_progress:{run_id}")
+    current_app.logger.info(f"Apify webhook {payload.get('eventType')} for run {run_id} (handled: {handled})")
+    return jsonify({'success': True, 'handled': handled})
+
+
 @api_bp.route('/scraping/mapping-data/<dataset_id>')
 @login_required
 def get_scraping_mapping_data(dataset_id):
@@ -198,6 +250,7 @@ def get_scraping_mapping_data(dataset_id):
         # dataset_id might be the Apify Dataset ID (string) or Internal Dataset ID (int)
         apify_dataset_id = dataset_id
         
+        dataset = None
         # Check if it looks like an internal ID (integer)
         if str(dataset_id).isdigit():
              internal_id = int(dataset_id)
@@ -208,25 +261,16 @@ def get_scraping_mapping_data(dataset_id):
         if not apify_dataset_id:
              return jsonify({'success': False, 'message': 'Invalid Dataset ID'}), 400
 
-        items = ApifyService.get_dataset_items(apify_dataset_id)
-        
-        sample_data = []
-        columns = []
-        
-        if items:
-            # Get columns from first item (flattened)
-            first_item = items[0]
-            # Deep flattening for columns using recursive function
-            flat_item = flatten_dict(first_item)
-            columns = list(flat_item.keys())
-            
-            # Flatten sample data as well for consistent preview
-            sample_data = [flatten_dict(item) for item in items[:5]]
+        # Sample items + dataset info only; the column schema is cached per run (external_id)
+        preview = get_mapping_preview(apify_dataset_id, dataset)
+        if dataset is not None:
+            db.session.commit()
             
         return jsonify({
             'success': True,
-            'columns': columns,
-            'sample_data': sample_data,
+            'columns': preview['columns'],
+            'sample_data': preview['sample_data'],
+            'total_items': preview['total_items'],
             'apify_dataset_id': apify_dataset_id
         })
     except Exception as e:
@@ -581,6 +625,8 @@ def delete_scraper(id):
                 ClassificationResult.data_type == 'upload',
                 ClassificationResult.data_id.in_(clean_upload_ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('upload', clean_upload_ids)
+            delete_near_duplicate_buckets('upload', clean_upload_ids)
             for item in clean_uploads:
                 db.session.delete(item)
             
@@ -592,6 +638,8 @@ def delete_scraper(id):
                 ClassificationResult.data_type == 'scraper',
                 ClassificationResult.data_id.in_(clean_scraper_ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('scraper', clean_scraper_ids)
+            delete_near_duplicate_buckets('scraper', clean_scraper_ids)
             for item in clean_scrapers:
                 db.session.delete(item)
                 
@@ -641,6 +689,8 @@ def delete_dataset(id):
                 ClassificationResult.data_type == 'upload',
                 ClassificationResult.data_id.in_(clean_upload_ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('upload', clean_upload_ids)
+            delete_near_duplicate_buckets('upload', clean_upload_ids)
             for item in clean_uploads:
                 db.session.delete(item)
             
@@ -652,6 +702,8 @@ def delete_dataset(id):
                 ClassificationResult.data_type == 'scraper',
                 ClassificationResult.data_id.in_(clean_scraper_ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('scraper', clean_scraper_ids)
+            delete_near_duplicate_buckets('scraper', clean_scraper_ids)
             for item in clean_scrapers:
                 db.session.delete(item)
                 
@@ -667,8 +719,10 @@ def delete_dataset(id):
         ClassificationBatch.query.filter_by(dataset_id=dataset.id).delete(synchronize_session=False)
             
         # 6. Dataset
+        file_path = dataset.file_path
         db.session.delete(dataset)
         db.session.commit()
+        remove_upload_file(file_path)
         
         generate_activity_log(
             action='delete',
@@ -765,6 +819,8 @@ def delete_user(id):
                     ClassificationResult.data_type == 'upload',
                     ClassificationResult.data_id.in_(clean_upload_ids)
                 ).delete(synchronize_session=False)
+                delete_ensembles('upload', clean_upload_ids)
+                delete_near_duplicate_buckets('upload', clean_upload_ids)
                 for item in clean_uploads:
                     db.session.delete(item)
             
@@ -776,6 +832,8 @@ def delete_user(id):
                     ClassificationResult.data_type == 'scraper',
                     ClassificationResult.data_id.in_(clean_scraper_ids)
                 ).delete(synchronize_session=False)
+                delete_ensembles('scraper', clean_scraper_ids)
+                delete_near_duplicate_buckets('scraper', clean_scraper_ids)
                 for item in clean_scrapers:
                     db.session.delete(item)
                     
@@ -806,6 +864,8 @@ def delete_user(id):
                 ClassificationResult.data_type == 'upload',
                 ClassificationResult.data_id.in_(ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('upload', ids)
+            delete_near_duplicate_buckets('upload', ids)
             for item in orphan_clean_uploads:
                 db.session.delete(item)
                 
@@ -817,11 +877,14 @@ def delete_user(id):
                 ClassificationResult.data_type == 'scraper',
                 ClassificationResult.data_id.in_(ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('scraper', ids)
+            delete_near_duplicate_buckets('scraper', ids)
             for item in orphan_clean_scrapers:
                 db.session.delete(item)
         
         # 4. Delete Classification Results by this user (classified_by)
         ClassificationResult.query.filter_by(classified_by=user.id).delete(synchronize_session=False)
+        ClassificationEnsemble.query.filter_by(classified_by=user.id).delete(synchronize_session=False)
         
         # 5. Update Classification Results corrected by this user (set to NULL)
         ClassificationResult.query.filter_by(corrected_by=user.id).update({'corrected_by': None})
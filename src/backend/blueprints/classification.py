@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file
 from flask_login import login_required, current_user
 from sqlalchemy import text, desc
+from sqlalchemy.orm import selectinload
 from models.models import db, Dataset, RawData, RawDataScraper, CleanDataUpload, CleanDataScraper, ClassificationResult, ManualClassificationHistory, ClassificationBatch
 from utils.utils import active_user_required, check_permission_with_feedback, vectorize_text, classify_content, generate_activity_log, preprocess_for_model, check_dataset_permission
 from utils.i18n import t
+from services.ensemble_service import EnsembleAccumulator, delete_ensembles, get_ensemble_map, get_consensus_counts
 from datetime import datetime
 import numpy as np
 import pandas as pd
@@ -257,6 +259,110 @@ def classify_manual_text():
         current_app.logger.error(f"Error manual classification: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def _consensus_dict(ensemble):
+    """Serialize a ClassificationEnsemble row for templates/JSON"""
+    if ensemble is None:
+        return None
+    return {
+        'label': ensemble.final_label,
+        'radikal_votes': ensemble.radikal_votes,
+        'non_radikal_votes': ensemble.non_radikal_votes,
+        'total_votes': ensemble.total_votes,
+        'mean_probability_radikal': ensemble.mean_probability_radikal
+    }
+
+def _build_dataset_preview(ds, visible_algorithms, limit=50):
+    """Build the results-page preview for a dataset with a fixed number of queries.
+
+    Items are limited for performance; classification results and consensus for all
+    previewed items are fetched with a single IN query each instead of one per row.
+    """
+    # Fetch clean upload data
+    upload_items = CleanDataUpload.query.filter_by(dataset_id=ds.id).limit(limit).all()
+    
+    # Fetch clean scraper data
+    # Need to join with RawDataScraper to filter by dataset_id; raw row is eager-loaded
+    # because username/url/original content are read from it below
+    scraper_items = db.session.query(CleanDataScraper).join(
+        RawDataScraper, CleanDataScraper.raw_data_scraper_id == RawDataScraper.id
+    ).options(
+        selectinload(CleanDataScraper.raw_data_scraper)
+    ).filter(RawDataScraper.dataset_id == ds.id).limit(limit).all()
+    
+    upload_ids = [item.id for item in upload_items]
+    scraper_ids = [item.id for item in scraper_items]
+    
+    # Load results for the whole page at once and group them per document
+    results_map = {}
+    if upload_ids or scraper_ids:
+        results_query = ClassificationResult.query.filter(
+            ((ClassificationResult.data_type == 'upload') & (ClassificationResult.data_id.in_(upload_ids))) |
+            ((ClassificationResult.data_type == 'scraper') & (ClassificationResult.data_id.in_(scraper_ids)))
+        )
+        for res in results_query.all():
+            results_map.setdefault(f"{res.data_type}_{res.data_id}", []).append(res)
+    
+    consensus_map = get_ensemble_map(upload_ids=upload_ids, scraper_ids=scraper_ids)
+    
+    def models_for(key):
+        models_result = {}
+        for res in results_map.get(key, []):
+            if res.model_name in visible_algorithms:
+                models_result[res.model_name] = {
+                    'prediction': res.prediction,
+                    'probability_radikal': res.probability_radikal,
+                    'probability_non_radikal': res.probability_non_radikal
+                }
+        return models_result
+    
+    data_items = []
+    
+    for item in upload_items:
+        key = f"upload_{item.id}"
+        if key not in results_map: continue
+        
+        data_items.append({
+            'data_id': item.id,
+            'username': item.username,
+            'content': item.cleaned_content,
+            'original_content': item.content,
+            'url': item.url,
+            'data_type': 'Upload',
+            'models': models_for(key),
+            'consensus': _consensus_dict(consensus_map.get(key)),
+            'created_at': item.created_at
+        })
+    
+    for item in scraper_items:
+        key = f"scraper_{item.id}"
+        if key not in results_map: continue
+        
+        # For scraper data, some fields come from the raw_data_scraper relationship
+        raw = item.raw_data_scraper
+        username = raw.username if raw else 'N/A'
+        url = raw.url if raw else None
+        original_content = raw.content if raw else item.content
+        
+        data_items.append({
+            'data_id': item.id,
+            'username': username,
+            'content': item.cleaned_content,
+            'original_content': original_content,
+            'url': url,
+            'data_type': 'Scraper',
+            'models': models_for(key),
+            'consensus': _consensus_dict(consensus_map.get(key)),
+            'created_at': item.created_at
+        })
+    
+    return {
+        'id': ds.id,
+        'dataset_name': ds.name,
+        'name': ds.name,
+        'total_items': ds.classified_records or 0,
+        'data_items': data_items
+    }
+
 @classification_bp.route('/classification/results')
 @login_required
 @active_user_required
@@ -344,8 +450,8 @@ def results():
     
     # Calculate statistics (based on filtered query)
     total_classifications = pagination.total
-    total_data_items = db.session.query(db.func.count(db.distinct(ClassificationResult.data_id))).filter(
-        ClassificationResult.id.in_([r.id for r in query.all()]) # Reuse filters from query
+    total_data_items = query.order_by(None).with_entities(
+        db.func.count(db.distinct(ClassificationResult.data_id))  # Reuse filters from query
     ).scalar() if total_classifications > 0 else 0
     
     # Calculate per-model stats
@@ -374,6 +480,12 @@ def results():
     # (Should match pagination.total if query was correctly filtered by model_name)
     total_classifications = total_radikal + total_non_radikal
     
+    # Majority vote per document (materialized in classification_ensembles)
+    consensus_stats = get_consensus_counts(
+        dataset_id=target_dataset.id if target_dataset else None,
+        user_id=None if current_user.is_admin() else current_user.id
+    )
+    
     # Prepare datasets list with aggregated results
     datasets = []
     
@@ -381,83 +493,7 @@ def results():
     classified_datasets = [target_dataset] if target_dataset else []
     
     for ds in classified_datasets:
-        # Count items
-        total_items = ds.classified_records or 0
-        
-        data_items = []
-        
-        # Fetch clean upload data
-        upload_items = CleanDataUpload.query.filter_by(dataset_id=ds.id).limit(50).all() # Limit for performance
-        
-        for item in upload_items:
-            # Get results for this item
-            item_results = ClassificationResult.query.filter_by(data_type='upload', data_id=item.id).all()
-            if not item_results: continue
-            
-            models_result = {}
-            for res in item_results:
-                if res.model_name in visible_algorithms:
-                    models_result[res.model_name] = {
-                        'prediction': res.prediction,
-                        'probability_radikal': res.probability_radikal,
-                        'probability_non_radikal': res.probability_non_radikal
-                    }
-            
-            data_items.append({
-                'data_id': item.id,
-                'username': item.username,
-                'content': item.cleaned_content,
-                'original_content': item.content,
-                'url': item.url,
-                'data_type': 'Upload',
-                'models': models_result,
-                'created_at': item.created_at
-            })
-            
-        # Fetch clean scraper data
-        # Need to join with RawDataScraper to filter by dataset_id
-        scraper_items = db.session.query(CleanDataScraper).join(
-            RawDataScraper, CleanDataScraper.raw_data_scraper_id == RawDataScraper.id
-        ).filter(RawDataScraper.dataset_id == ds.id).limit(50).all()
-        
-        for item in scraper_items:
-            # Get results for this item
-            item_results = ClassificationResult.query.filter_by(data_type='scraper', data_id=item.id).all()
-            if not item_results: continue
-            
-            models_result = {}
-            for res in item_results:
-                if res.model_name in visible_algorithms:
-                    models_result[res.model_name] = {
-                        'prediction': res.prediction,
-                        'probability_radikal': res.probability_radikal,
-                        'probability_non_radikal': res.probability_non_radikal
-                    }
-            
-            # For scraper data, we need to get some fields from raw_data_scraper relationship if not present in clean model
-            # Assuming CleanDataScraper has raw_data_scraper relationship
-            username = item.raw_data_scraper.username if item.raw_data_scraper else 'N/A'
-            url = item.raw_data_scraper.url if item.raw_data_scraper else None
-            original_content = item.raw_data_scraper.content if item.raw_data_scraper else item.content
-            
-            data_items.append({
-                'data_id': item.id,
-                'username': username,
-                'content': item.cleaned_content,
-                'original_content': original_content,
-                'url': url,
-                'data_type': 'Scraper',
-                'models': models_result,
-                'created_at': item.created_at
-            })
-            
-        datasets.append({
-            'id': ds.id,
-            'dataset_name': ds.name,
-            'name': ds.name,
-            'total_items': total_items,
-            'data_items': data_items
-        })
+        datasets.append(_build_dataset_preview(ds, visible_algorithms))
     
     return render_template('classification/results.html',
                          results=results,
@@ -467,6 +503,7 @@ def results():
                          total_radikal=total_radikal,
                          total_non_radikal=total_non_radikal,
                          model_stats=model_stats,
+                         consensus_stats=consensus_stats,
                          datasets=datasets,
                          visible_algorithms=visible_algorithms)
 
@@ -605,6 +642,7 @@ def process_classification_background(app, dataset_id, user_id):
             
             # Use a mutable object to track totals across the inner function
             batch_stats = {'radikal': 0, 'non_radikal': 0}
+            ensemble = EnsembleAccumulator(user_id)
             
             # Helper function
             def process_item(item, data_type, raw_content):
@@ -654,6 +692,7 @@ def process_classification_background(app, dataset_id, user_id):
                         classified_by=user_id
                     )
                     db.session.add(result)
+                    ensemble.add(data_type, item.id, dataset_id, prediction, prob_rad)
             
             # Process Uploads
             for item in clean_uploads:
@@ -671,6 +710,8 @@ def process_classification_background(app, dataset_id, user_id):
                 classification_progress[dataset_id]['processed_items'] = processed
                 classification_progress[dataset_id]['progress_percentage'] = int((processed / total_items) * 100)
 
+            ensemble.flush()
+
             dataset.status = 'Classified'
             dataset.classified_records = total_items
             
@@ -800,12 +841,14 @@ def reset_latest_api():
                     ClassificationResult.data_type == 'upload',
                     ClassificationResult.data_id.in_(upload_ids)
                 ).delete(synchronize_session=False)
+                delete_ensembles('upload', upload_ids)
                 
             if scraper_ids:
                 ClassificationResult.query.filter(
                     ClassificationResult.data_type == 'scraper',
                     ClassificationResult.data_id.in_(scraper_ids)
                 ).delete(synchronize_session=False)
+                delete_ensembles('scraper', scraper_ids)
                 
             db.session.commit()
         except Exception as e:
@@ -819,7 +862,8 @@ def reset_latest_api():
 @login_required
 def latest_results_api():
     # Return stats for all results or specific dataset
-    dataset_id = request.args.get('dataset_id')
+    dataset_id = request.args.get('dataset_id', type=int)
+    visible_algorithms = current_app.config.get('VISIBLE_ALGORITHMS')
     
     query = ClassificationResult.query
     if dataset_id:
@@ -842,8 +886,6 @@ def latest_results_api():
         )
 
     total_classifications = query.count()
-    total_radikal = query.filter_by(prediction='Radikal').count()
-    total_non_radikal = query.filter_by(prediction='Non-Radikal').count()
     
     # Calculate model stats
     model_stats = {}
@@ -871,36 +913,11 @@ def latest_results_api():
     if 'model2' not in model_stats: model_stats['model2'] = {'radikal': 0, 'non_radikal': 0, 'name': 'Model 2'}
     if 'model3' not in model_stats: model_stats['model3'] = {'radikal': 0, 'non_radikal': 0, 'name': 'Model 3'}
 
-    # Calculate unique documents count and majority vote stats
-    # Group by data_type and data_id
-    from sqlalchemy import func, case
-    
-    # Subquery to count votes per document
-    vote_query = query.with_entities(
-        ClassificationResult.data_type,
-        ClassificationResult.data_id,
-        func.sum(case((ClassificationResult.prediction == 'Radikal', 1), else_=0)).label('rad_votes'),
-        func.sum(case((ClassificationResult.prediction == 'Non-Radikal', 1), else_=0)).label('non_rad_votes')
-    ).group_by(ClassificationResult.data_type, ClassificationResult.data_id).subquery()
-    
-    # Query the subquery
-    # We want to count how many documents are majority radical vs non-radical
-    # Tie-breaking: If votes are equal, we can default to 'non-radikal' or 'radikal'.
-    # Here assuming Radikal if rad_votes > non_rad_votes, else Non-Radikal.
-    
-    # Note: SQLite/Postgres compatibility check. This standard SQL should work.
-    
-    # Count total unique documents
-    total_unique_docs = db.session.query(vote_query).count()
-    
-    # Count majority radical
-    # We need to filter the subquery results
-    # Since we can't easily filter on the subquery columns in all ORM versions without defining them,
-    # let's iterate or use a simpler approach if the dataset is small. 
-    # But for 1000+ items, SQL is better.
-    
-    total_radikal_docs = db.session.query(vote_query).filter(vote_query.c.rad_votes > vote_query.c.non_rad_votes).count()
-    total_non_radikal_docs = total_unique_docs - total_radikal_docs
+    # Unique documents and majority vote stats come from the materialized ensemble table
+    consensus = get_consensus_counts(dataset_id=dataset_id)
+    total_unique_docs = consensus['total']
+    total_radikal_docs = consensus['radikal']
+    total_non_radikal_docs = consensus['non_radikal']
     
     return jsonify({
         'success': True,
@@ -1012,6 +1029,7 @@ def classify_selected_datasets():
                 db.session.add(batch_record)
                 
                 batch_stats = {'radikal': 0, 'non_radikal': 0}
+                ensemble = EnsembleAccumulator(current_user.id)
 
                 # Process Clean Data Uploads
                 for item in clean_uploads:
@@ -1063,6 +1081,7 @@ def classify_selected_datasets():
                             classified_by=current_user.id
                         )
                         db.session.add(result)
+                        ensemble.add('upload', item.id, dataset_id, prediction, prob_rad)
 
                 # Process Clean Data Scraper
                 for item in clean_scrapers:
@@ -1114,7 +1133,10 @@ def classify_selected_datasets():
                             classified_by=current_user.id
                         )
                         db.session.add(result)
+                        ensemble.add('scraper', item.id, dataset_id, prediction, prob_rad)
                 
+                ensemble.flush()
+
                 # Update dataset status
                 dataset.status = 'Classified'
                 dataset.classified_records = total_clean_data
@@ -1252,6 +1274,9 @@ def export_classification_results():
                     results_map[key] = {}
                 results_map[key][res.model_name] = res
                 
+            # Majority vote per document (materialized, no recomputation needed)
+            consensus_map = get_ensemble_map(upload_ids=upload_ids, scraper_ids=scraper_ids)
+                
             # Build export rows
             for item in items:
                 row = {
@@ -1273,6 +1298,12 @@ def export_classification_results():
                         model_col = model_name.replace('_', ' ').title()
                         row[f'{model_col} Prediction'] = res.prediction
                         row[f'{model_col} Probability'] = f"{max(res.probability_radikal, res.probability_non_radikal):.4f}"
+                
+                consensus = consensus_map.get(key)
+                if consensus:
+                    row['Consensus'] = consensus.final_label
+                    row['Consensus Votes'] = f"{consensus.radikal_votes}/{consensus.total_votes}"
+                    row['Consensus Probability Radikal'] = f"{consensus.mean_probability_radikal:.4f}"
                         
                 export_data.append(row)
                 
@@ -1284,9 +1315,10 @@ def export_classification_results():
         
         # Reorder columns to match visible_algorithms order and ensure consistent structure
         base_columns = ['Dataset', 'Username', 'Content', 'Original Content', 'URL', 'Data Type', 'Date']
+        consensus_columns = [c for c in ['Consensus', 'Consensus Votes', 'Consensus Probability Radikal'] if c in df.columns]
         
         # Identify dynamic model columns present in the dataframe
-        dynamic_cols = [c for c in df.columns if c not in base_columns]
+        dynamic_cols = [c for c in df.columns if c not in base_columns and c not in consensus_columns]
         
         # Sort dynamic columns based on visible_algorithms order
         def get_model_sort_key(col_name):
@@ -1302,7 +1334,7 @@ def export_classification_results():
         dynamic_cols.sort(key=get_model_sort_key)
         
         # Final column list
-        final_cols = base_columns + dynamic_cols
+        final_cols = base_columns + dynamic_cols + consensus_columns
         
         # Reindex to enforce order (only includes columns that actually have data)
         df = df[final_cols]
@@ -5,6 +5,10 @@ from models.models import db, Dataset, RawData, RawDataScraper, CleanDataUpload,
 from utils.utils import active_user_required, check_permission_with_feedback, clean_text, check_cleaned_content_duplicate, get_jakarta_time, generate_activity_log, check_dataset_permission
 from utils.security_utils import generate_secure_filename, SecurityValidator, log_security_event
 from utils.i18n import t
+from services.ensemble_service import delete_ensembles
+from services.near_duplicate_service import delete_near_duplicate_buckets
+from services.chunk_upload_service import create_session, find_session, save_chunk, received_chunks, missing_chunks, ChunkChecksumError, DEFAULT_CHUNK_SIZE
+from services.ingestion_service import detect_columns, read_file_header, save_upload_file, detect_file_dialect, read_dataset_header, remove_staging, remove_upload_file, start_staging_job, start_upload_job, get_upload_progress, find_upload_job, is_orphaned_upload
 import os
 import uuid
 import threading
@@ -428,6 +432,13 @@ def clean_dataset(id):
         if not check_dataset_permission(dataset, current_user):
             return jsonify({'success': False, 'message': 'Permission denied'}), 403
             
+        # Import service here to avoid circular import
+        from services.cleaning_service import process_bulk_cleaning, UNCLEANABLE_STATUSES
+        
+        # Upload job still inserting rows (or waiting for its column mapping)
+        if dataset.status in UNCLEANABLE_STATUSES:
+            return jsonify({'success': False, 'message': 'Dataset upload is still being processed'}), 409
+            
         # Check if already cleaned
         if dataset.status == 'Cleaned':
              return jsonify({
@@ -437,9 +448,6 @@ def clean_dataset(id):
                 'cleaned_count': dataset.cleaned_records
             })
 
-        # Import service here to avoid circular import
-        from services.cleaning_service import process_bulk_cleaning
-        
         # Generate task ID
         task_id = str(uuid.uuid4())
         
@@ -546,6 +554,33 @@ def get_cleaning_progress(task_id):
         
     return jsonify(progress)
 
+@dataset_bp.route('/dataset/upload/progress/<job_id>')
+@login_required
+def get_upload_progress_api(job_id):
+    progress = get_upload_progress(current_app, job_id)
+    
+    if not progress or (progress.get('user_id') != current_user.id and not current_user.is_admin()):
+        return jsonify({'status': 'error', 'message': 'Task not found'}), 404
+        
+    return jsonify(progress)
+
+@dataset_bp.route('/dataset/<int:id>/upload/progress')
+@login_required
+def get_dataset_upload_progress(id):
+    dataset = Dataset.query.get_or_404(id)
+    if not current_user.is_admin() and dataset.uploaded_by != current_user.id:
+        return jsonify({'status': 'error', 'message': 'Permission denied'}), 403
+    
+    job_id, progress = find_upload_job(current_app, dataset.id)
+    if not progress:
+        # Job no longer in memory (e.g. worker restarted): report the stored dataset status
+        if is_orphaned_upload(current_app, dataset):
+            dataset.status = 'Failed'
+            db.session.commit()
+        return jsonify({'status': dataset.status, 'dataset_status': dataset.status, 'job_id': None})
+    
+    return jsonify(dict(progress, job_id=job_id, dataset_status=dataset.status))
+
 @dataset_bp.route('/dataset/upload', methods=['GET', 'POST'])
 @login_required
 def upload_file():
@@ -562,97 +597,48 @@ def upload_file():
             return redirect(request.url)
             
         if file and (file.filename.endswith('.csv') or file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
+            file_path = None
             try:
                 # Create dataset entry
                 dataset_name = request.form.get('dataset_name')
                 if not dataset_name:
                     dataset_name = file.filename
                 
+                # Store the file and read only its header; parsing/inserting runs as a background job
+                file_path = save_upload_file(file, current_app.config['UPLOAD_FOLDER'])
+                dialect = detect_file_dialect(file_path)
+                columns = detect_columns(read_file_header(file_path, file.filename, dialect=dialect).columns)
+                
+                if not columns['content']:
+                    os.remove(file_path)
+                    flash(t('File must contain content/text/tweet/comment column'), 'error')
+                    return redirect(request.url)
+                
                 # Create Dataset record
                 new_dataset = Dataset(
                     name=dataset_name,
                     description=f"Dataset uploaded on {datetime.now().strftime('%Y-%m-%d %H:%M')}",
                     uploaded_by=current_user.id,
-                    status='Raw'
+                    status='Processing',
+                    file_path=file_path,
+                    meta_info={'csv_dialect': dialect} if dialect else None,
+                    total_records=0
                 )
                 db.session.add(new_dataset)
-                db.session.flush() # Get ID
-                
-                # Get file size properly
-                file.seek(0, os.SEEK_END)
-                file_size_bytes = file.tell()
-                file.seek(0)
-                
-                # Fallback if size is 0
-                if file_size_bytes == 0:
-                    try:
-                        blob = file.read()
-                        file_size_bytes = len(blob)
-                        file.seek(0)
-                    except:
-                        pass
-                
-                # Process file
-                if file.filename.endswith('.csv'):
-                    try:
-                        df = pd.read_csv(file)
-                    except:
-                        # Try with different encoding/separator
-                        file.seek(0)
-                        df = pd.read_csv(file, sep=';', encoding='latin1')
-                else:
-                    df = pd.read_excel(file)
-                
-                # Loose column mapping
-                df.columns = [str(c).lower().strip() for c in df.columns]
-                
-                # Check if 'content' or 'text' or 'komentar' exists
-                content_col = next((c for c in df.columns if c in ['content', 'text', 'tweet', 'comment', 'komentar', 'isi', 'text_original']), None)
-                username_col = next((c for c in df.columns if c in ['username', 'user', 'author', 'pengguna', 'screen_name']), None)
-                platform_col = next((c for c in df.columns if c in ['platform', 'source', 'sumber']), None)
-                
-                if not content_col:
-                    flash(t('File must contain content/text/tweet/comment column'), 'error')
-                    db.session.rollback()
-                    return redirect(request.url)
+                db.session.commit()
                 
-                count = 0
-                for _, row in df.iterrows():
-                    # Skip empty content
-                    if pd.isna(row[content_col]) or str(row[content_col]).strip() == '':
-                        continue
-                        
-                    raw_data = RawData(
-                        username=str(row[username_col]) if username_col and pd.notna(row[username_col]) else 'anonymous',
-                        content=str(row[content_col]),
-                        platform=str(row[platform_col]).lower() if platform_col and pd.notna(row[platform_col]) else 'unknown',
-                        source_type='upload',
-                        status='raw',
-                        file_size=file_size_bytes, 
-                        original_filename=file.filename,
-                        dataset_id=new_dataset.id,
-                        dataset_name=new_dataset.name,
-                        uploaded_by=current_user.id
-                    )
-                    db.session.add(raw_data)
-                    count += 1
+                job_id = start_upload_job(current_app._get_current_object(), new_dataset, columns, current_user.id, file.filename)
                 
-                new_dataset.total_records = count
-                db.session.commit()
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    return jsonify({'success': True, 'processing': True, 'dataset_id': new_dataset.id, 'job_id': job_id})
                 
-                generate_activity_log(
-                    action='upload',
-                    description=f'Uploaded dataset: {new_dataset.name} ({count} records)',
-                    user_id=current_user.id,
-                    icon='fa-upload',
-                    color='primary'
-                )
-
-                flash(t('Dataset uploaded successfully') + f'. {count} data added.', 'success')
+                flash(t('Dataset is being processed') + '. ' + t('You can follow the progress in the dataset list.'), 'info')
                 return redirect(url_for('dataset.management_table'))
                 
             except Exception as e:
                 db.session.rollback()
+                if file_path and os.path.exists(file_path):
+                    os.remove(file_path)
                 flash(f"{t('Error processing file')}: {str(e)}", 'error')
                 return redirect(request.url)
         else:
@@ -661,6 +647,62 @@ def upload_file():
 
     return render_template('data/upload.html')
 
+def _register_stored_upload(file_path, filename, dataset_name):
+    """
+    Create the dataset for an upload already stored on disk (single file or chunk session).
+    Returns the JSON payload: column mapping request, or the background job that ingests it.
+    """
+    dialect = detect_file_dialect(file_path)
+    header = read_file_header(file_path, filename, dialect=dialect)
+    columns = detect_columns(header.columns)
+    
+    # If no content column found, offer mapping
+    if not columns['content']:
+        # Create dataset with 'Pending Mapping' status
+        pending_dataset = Dataset(
+            name=dataset_name,
+            description=f"Dataset uploaded on {get_jakarta_time().strftime('%Y-%m-%d %H:%M')}",
+            uploaded_by=current_user.id,
+            status='Pending Mapping',
+            file_path=file_path,
+            meta_info={'csv_dialect': dialect} if dialect else None,
+            total_records=0
+        )
+        db.session.add(pending_dataset)
+        db.session.commit()
+        
+        # Convert to Parquet while the user picks the columns
+        start_staging_job(current_app._get_current_object(), pending_dataset.id)
+        
+        sample = header.fillna('').to_dict(orient='records')
+        
+        return {
+            'success': True, 
+            'show_mapping': True, 
+            'columns': list(header.columns), 
+            'sample_data': sample, 
+            'filename': filename,
+            'dataset_id': pending_dataset.id
+        }
+        
+    # Create dataset; rows are inserted by the background job
+    new_dataset = Dataset(
+        name=dataset_name,
+        description=f"Dataset uploaded on {get_jakarta_time().strftime('%Y-%m-%d %H:%M')}",
+        uploaded_by=current_user.id,
+        status='Processing',
+        file_path=file_path,
+        meta_info={'csv_dialect': dialect} if dialect else None,
+        total_records=0
+    )
+    db.session.add(new_dataset)
+    db.session.commit()
+    
+    job_id = start_upload_job(current_app._get_current_object(), new_dataset, columns, current_user.id, filename)
+
+    return {'success': True, 'processing': True, 'dataset_id': new_dataset.id, 'job_id': job_id}
+
+
 @dataset_bp.route('/upload_data', methods=['GET', 'POST'])
 @login_required
 def upload_data_legacy():
@@ -685,125 +727,9 @@ def upload_data_legacy():
             
         dataset_name = request.form.get('dataset_name') or file.filename
         
-        # Get file size properly
-        file.seek(0, os.SEEK_END)
-        file_size_bytes = file.tell()
-        file.seek(0)
-        
-        # Fallback if size is 0
-        if file_size_bytes == 0:
-            try:
-                blob = file.read()
-                file_size_bytes = len(blob)
-                file.seek(0)
-            except:
-                pass
-        
-        # Read file
-        if file.filename.endswith('.csv'):
-            try:
-                df = pd.read_csv(file)
-            except:
-                file.seek(0)
-                df = pd.read_csv(file, sep=';', encoding='latin1')
-        else:
-            df = pd.read_excel(file)
-            
-        # Normalize columns
-        df.columns = [str(c).lower().strip() for c in df.columns]
-        
-        # Check for required columns
-        content_col = next((c for c in df.columns if c in ['content', 'text', 'tweet', 'comment', 'komentar', 'isi', 'text_original']), None)
-        username_col = next((c for c in df.columns if c in ['username', 'user', 'author', 'pengguna', 'screen_name']), None)
-        platform_col = next((c for c in df.columns if c in ['platform', 'source', 'sumber']), None)
-        
-        # If no content column found, offer mapping
-        if not content_col:
-            # Save file to temp storage for persistence
-            filename = secure_filename(file.filename)
-            temp_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'temp')
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            # Generate unique filename to avoid collision
-            unique_filename = f"{uuid.uuid4().hex}_{filename}"
-            file_path = os.path.join(temp_dir, unique_filename)
-            
-            # Reset file pointer and save
-            file.seek(0)
-            file.save(file_path)
-            
-            # Create dataset with 'Pending Mapping' status
-            pending_dataset = Dataset(
-                name=dataset_name,
-                description=f"Dataset uploaded on {get_jakarta_time().strftime('%Y-%m-%d %H:%M')}",
-                uploaded_by=current_user.id,
-                status='Pending Mapping',
-                file_path=file_path,
-                total_records=0
-            )
-            db.session.add(pending_dataset)
-            db.session.commit()
-            
-            sample = df.head(5).fillna('').to_dict(orient='records')
-            
-            return jsonify({
-                'success': True, 
-                'show_mapping': True, 
-                'columns': list(df.columns), 
-                'sample_data': sample, 
-                'filename': file.filename,
-                'dataset_id': pending_dataset.id
-            })
-            
-        # Create dataset
-        new_dataset = Dataset(
-            name=dataset_name,
-            description=f"Dataset uploaded on {get_jakarta_time().strftime('%Y-%m-%d %H:%M')}",
-            uploaded_by=current_user.id,
-            status='Raw'
-        )
-        db.session.add(new_dataset)
-        db.session.flush()
-        
-        count = 0
-        for _, row in df.iterrows():
-            if pd.isna(row[content_col]) or str(row[content_col]).strip() == '':
-                continue
-            
-            # Safe extraction
-            username_val = str(row[username_col]) if username_col and pd.notna(row[username_col]) else 'anonymous'
-            content_val = str(row[content_col])
-            url_val = str(row['url']) if 'url' in df.columns and pd.notna(row['url']) else None
-            platform_val = str(row[platform_col]).lower() if platform_col and pd.notna(row[platform_col]) else 'unknown'
-            
-            raw_data = RawData(
-                username=username_val,
-                content=content_val,
-                url=url_val,
-                platform=platform_val,
-                source_type='upload',
-                status='raw',
-                file_size=file_size_bytes,
-                original_filename=file.filename,
-                dataset_id=new_dataset.id,
-                dataset_name=new_dataset.name,
-                uploaded_by=current_user.id
-            )
-            db.session.add(raw_data)
-            count += 1
-            
-        new_dataset.total_records = count
-        db.session.commit()
-        
-        generate_activity_log(
-            action='upload',
-            description=f'Uploaded dataset: {new_dataset.name} ({count} records)',
-            user_id=current_user.id,
-            icon='fa-upload',
-            color='primary'
-        )
-
-        return jsonify({'success': True, 'count': count, 'dataset_id': new_dataset.id})
+        # Store the file and read only its header to detect columns
+        file_path = save_upload_file(file, current_app.config['UPLOAD_FOLDER'])
+        return jsonify(_register_stored_upload(file_path, file.filename, dataset_name))
         
     except Exception as e:
         db.session.rollback()
@@ -811,6 +737,109 @@ def upload_data_legacy():
         current_app.logger.error(f"Upload error: {str(e)}")
         return jsonify({'success': False, 'message': f'Server Error: {str(e)}'}), 500
 
+def _get_chunk_session(upload_id):
+    session = find_session(current_app.config['UPLOAD_FOLDER'], upload_id)
+    if not session or session.get('purpose') != 'dataset' or session.get('user_id') != current_user.id:
+        return None
+    return session
+
+@dataset_bp.route('/dataset/upload/init', methods=['POST'])
+@login_required
+def upload_chunked_init():
+    """
+    Start a resumable chunked dataset upload (same init -> chunk -> finish protocol as the admin
+    model uploader). Returns the upload_id and the suggested chunk size.
+    """
+    filename = request.form.get('filename', '')
+    if not filename:
+        return jsonify({'success': False, 'message': 'Filename required'}), 400
+    if not (filename.endswith('.csv') or filename.endswith('.xlsx') or filename.endswith('.xls')):
+        return jsonify({'success': False, 'message': 'File format not supported. Use CSV or Excel.'}), 400
+    total_chunks = request.form.get('total_chunks', type=int)
+    if not total_chunks or total_chunks < 1:
+        return jsonify({'success': False, 'message': 'total_chunks required'}), 400
+    
+    upload_id, _ = create_session(
+        current_app.config['UPLOAD_FOLDER'],
+        filename,
+        current_user.id,
+        purpose='dataset',
+        total_chunks=total_chunks,
+        total_size=request.form.get('total_size', type=int),
+        dataset_name=request.form.get('dataset_name') or filename
+    )
+    
+    return jsonify({'success': True, 'upload_id': upload_id, 'chunk_size': DEFAULT_CHUNK_SIZE})
+
+@dataset_bp.route('/dataset/upload/<upload_id>/chunks')
+@login_required
+def upload_chunked_status(upload_id):
+    """Chunks already stored (with their SHA-256), so an interrupted upload can resume"""
+    session = _get_chunk_session(upload_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'Upload session not found'}), 404
+    
+    received = received_chunks(session['path'])
+    total_chunks = session.get('total_chunks')
+    return jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'total_chunks': total_chunks,
+        'received': received,
+        'missing': missing_chunks(session['path'], total_chunks)
+    })
+
+@dataset_bp.route('/dataset/upload/chunk', methods=['POST'])
+@login_required
+def upload_chunked_chunk():
+    """Store one chunk; the optional 'checksum' (SHA-256 hex) is verified before it is kept"""
+    upload_id = request.form.get('upload_id')
+    chunk_index = request.form.get('chunk_index', type=int)
+    chunk = request.files.get('chunk')
+    
+    if chunk_index is None or not chunk:
+        return jsonify({'success': False, 'message': 'Missing parameters'}), 400
+    
+    session = _get_chunk_session(upload_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'Upload session not found'}), 404
+    total_chunks = session.get('total_chunks')
+    if chunk_index < 0 or (total_chunks and chunk_index >= total_chunks):
+        return jsonify({'success': False, 'message': 'Invalid chunk_index'}), 400
+    
+    try:
+        checksum = save_chunk(session['path'], chunk_index, chunk.stream, request.form.get('checksum'))
+    except ChunkChecksumError as e:
+        return jsonify({'success': False, 'message': str(e), 'retry': True}), 409
+    except Exception as e:
+        current_app.logger.error(f"Failed to save chunk {chunk_index} for {upload_id}: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({'success': True, 'chunk_index': chunk_index, 'checksum': checksum})
+
+@dataset_bp.route('/dataset/upload/finish', methods=['POST'])
+@login_required
+def upload_chunked_finish():
+    """
+    Create the dataset from the uploaded chunks. The chunks are not concatenated: the session
+    directory is read as one stream by the ingestion job.
+    """
+    session = _get_chunk_session(request.form.get('upload_id'))
+    if not session:
+        return jsonify({'success': False, 'message': 'Upload session not found'}), 404
+    
+    # Also catches gaps for sessions created without total_chunks
+    missing = missing_chunks(session['path'], session.get('total_chunks'))
+    if missing or not received_chunks(session['path']):
+        return jsonify({'success': False, 'message': 'Upload incomplete', 'missing': missing}), 400
+    
+    try:
+        return jsonify(_register_stored_upload(session['path'], session['filename'], session.get('dataset_name') or session['filename']))
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Upload error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Server Error: {str(e)}'}), 500
+
 @dataset_bp.route('/dataset/<int:id>/reset_data', methods=['POST'])
 @login_required
 def reset_dataset_data(id):
@@ -830,6 +859,8 @@ def reset_dataset_data(id):
                 ClassificationResult.data_type == 'upload',
                 ClassificationResult.data_id.in_(clean_upload_ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('upload', clean_upload_ids)
+            delete_near_duplicate_buckets('upload', clean_upload_ids)
             
             # Delete clean data
             for item in clean_uploads:
@@ -844,6 +875,8 @@ def reset_dataset_data(id):
                 ClassificationResult.data_type == 'scraper',
                 ClassificationResult.data_id.in_(clean_scraper_ids)
             ).delete(synchronize_session=False)
+            delete_ensembles('scraper', clean_scraper_ids)
+            delete_near_duplicate_buckets('scraper', clean_scraper_ids)
             
             # Delete clean data
             for item in clean_scrapers:
@@ -865,6 +898,7 @@ def reset_dataset_data(id):
         dataset.status = 'Raw'
         
         db.session.commit()
+        remove_staging(dataset.file_path)
         
         generate_activity_log(
             action='delete',
@@ -889,100 +923,39 @@ def process_column_mapping():
     username_column = data.get('username_column')
     url_column = data.get('url_column')
     
-    # Try to load from DB first (Persistent way)
-    dataset = None
-    df = None
-    filename = "unknown"
-    file_size_bytes = 0
+    mapping = {
+        'content': content_column,
+        'username': username_column,
+        'url': url_column,
+        'platform': None
+    }
     
-    if dataset_id:
-        dataset = Dataset.query.get(dataset_id)
-        if dataset and dataset.uploaded_by == current_user.id and dataset.file_path and os.path.exists(dataset.file_path):
-            try:
-                if dataset.file_path.endswith('.csv'):
-                    try:
-                        df = pd.read_csv(dataset.file_path)
-                    except:
-                        df = pd.read_csv(dataset.file_path, sep=';', encoding='latin1')
-                else:
-                    df = pd.read_excel(dataset.file_path)
-                
-                # Normalize columns
-                df.columns = [str(c).lower().strip() for c in df.columns]
-                filename = os.path.basename(dataset.file_path).split('_', 1)[1] if '_' in os.path.basename(dataset.file_path) else os.path.basename(dataset.file_path)
-                file_size_bytes = os.path.getsize(dataset.file_path)
-            except Exception as e:
-                return jsonify({'success': False, 'message': f'Error reading saved file: {str(e)}'}), 500
-        else:
-            return jsonify({'success': False, 'message': 'Dataset or file not found'}), 404
-            
-    # Fallback to legacy session (In-memory) - for backward compatibility or if DB load fails
-    if df is None:
-        store = current_app.config.setdefault('UPLOAD_SESSIONS', {})
-        sess = store.get(current_user.id)
-        if not sess:
-            return jsonify({'success': False, 'message': 'Upload session not found'}), 400
-        df = sess['df']
-        filename = sess.get('filename')
-        dataset_name = sess.get('dataset_name') or filename
-        
-        # Create new dataset since we didn't find one in DB
-        dataset = Dataset(
-            name=dataset_name,
-            description=f"Dataset uploaded on {get_jakarta_time().strftime('%Y-%m-%d %H:%M')}",
-            uploaded_by=current_user.id,
-            status='Raw'
-        )
-        db.session.add(dataset)
-        db.session.flush()
-
-    if not content_column or content_column not in df.columns:
+    dataset = Dataset.query.get(dataset_id) if dataset_id else None
+    if not dataset or dataset.uploaded_by != current_user.id or not dataset.file_path or not os.path.exists(dataset.file_path):
+        return jsonify({'success': False, 'message': 'Dataset or file not found'}), 404
+    
+    try:
+        # Parquet staging file when available, so only the header/schema is read
+        columns = list(read_dataset_header(dataset).columns)
+        filename = os.path.basename(dataset.file_path).split('_', 1)[1] if '_' in os.path.basename(dataset.file_path) else os.path.basename(dataset.file_path)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error reading saved file: {str(e)}'}), 500
+    
+    if not content_column or content_column not in columns:
         return jsonify({'success': False, 'message': 'Invalid content column'}), 400
-        
-    count = 0
-    for _, row in df.iterrows():
-        v = row[content_column]
-        if pd.isna(v) or str(v).strip() == '':
-            continue
-        un = str(row[username_column]) if username_column and username_column in df.columns and pd.notna(row[username_column]) else 'anonymous'
-        urlv = str(row[url_column]) if url_column and url_column in df.columns and pd.notna(row[url_column]) else None
-        raw_data = RawData(
-            username=un,
-            content=str(v),
-            url=urlv,
-            platform='unknown',
-            source_type='upload',
-            status='raw',
-            file_size=file_size_bytes,
-            original_filename=filename,
-            dataset_id=dataset.id,
-            dataset_name=dataset.name,
-            uploaded_by=current_user.id
-        )
-        db.session.add(raw_data)
-        count += 1
-        
-    dataset.total_records = count
-    dataset.status = 'Raw' # Update status from 'Pending Mapping'
+    
+    # Claim the dataset ('Pending Mapping' -> 'Processing'); a repeated submit must not start a second ingest
+    claimed = Dataset.query.filter_by(id=dataset.id, status='Pending Mapping').update(
+        {'status': 'Processing'}, synchronize_session=False)
     db.session.commit()
+    if not claimed:
+        return jsonify({'success': False, 'message': 'Dataset is already being processed'}), 409
     
-    generate_activity_log(
-        action='upload',
-        description=f'Uploaded dataset: {dataset.name} ({count} records) via mapping',
-        user_id=current_user.id,
-        icon='fa-upload',
-        color='primary'
-    )
-
-    # Cleanup session
-    try:
-        store = current_app.config.get('UPLOAD_SESSIONS', {})
-        if current_user.id in store:
-            del store[current_user.id]
-    except:
-        pass
-        
-    return jsonify({'success': True, 'message': 'Data successfully processed', 'dataset_id': dataset.id, 'total_records': count})
+    # Rows are inserted by the background job
+    
+    job_id = start_upload_job(current_app._get_current_object(), dataset, mapping, current_user.id, filename, source_label='mapping')
+    
+    return jsonify({'success': True, 'processing': True, 'message': 'Data is being processed', 'dataset_id': dataset.id, 'job_id': job_id})
 
 @dataset_bp.route('/dataset/bulk/delete', methods=['POST'])
 @login_required
@@ -1006,6 +979,7 @@ def bulk_delete_datasets():
             
         count = 0
         errors = []
+        deleted_files = []
         
         for ds in datasets:
             try:
@@ -1020,6 +994,8 @@ def bulk_delete_datasets():
                         ClassificationResult.data_type == 'upload',
                         ClassificationResult.data_id.in_(clean_upload_ids)
                     ).delete(synchronize_session=False)
+                    delete_ensembles('upload', clean_upload_ids)
+                    delete_near_duplicate_buckets('upload', clean_upload_ids)
                     
                     # Delete clean data
                     for item in clean_uploads:
@@ -1034,6 +1010,8 @@ def bulk_delete_datasets():
                         ClassificationResult.data_type == 'scraper',
                         ClassificationResult.data_id.in_(clean_scraper_ids)
                     ).delete(synchronize_session=False)
+                    delete_ensembles('scraper', clean_scraper_ids)
+                    delete_near_duplicate_buckets('scraper', clean_scraper_ids)
                     
                     # Delete clean data
                     for item in clean_scrapers:
@@ -1049,6 +1027,7 @@ def bulk_delete_datasets():
                 ClassificationBatch.query.filter_by(dataset_id=ds.id).delete(synchronize_session=False)
                 
                 # 6. Finally delete the dataset
+                deleted_files.append(ds.file_path)
                 db.session.delete(ds)
                 count += 1
             except Exception as e:
@@ -1056,6 +1035,8 @@ def bulk_delete_datasets():
                 
         if count > 0:
             db.session.commit()
+            for file_path in deleted_files:
+                remove_upload_file(file_path)
             
             generate_activity_log(
                 action='delete',
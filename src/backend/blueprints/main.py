@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from sqlalchemy import desc, func
 from models.models import db, RawData, RawDataScraper, DatasetStatistics, CleanDataUpload, CleanDataScraper, ClassificationResult, UserActivity
 from utils.utils import active_user_required, format_datetime
+from services.ensemble_service import get_consensus_counts
 from datetime import datetime, timedelta
 import calendar
 
@@ -24,10 +25,8 @@ def get_current_user_stats(user):
         total_clean_upload = CleanDataUpload.query.join(RawData).filter(RawData.dataset_id.isnot(None)).count()
         total_clean_scraper = CleanDataScraper.query.join(RawDataScraper).filter(RawDataScraper.dataset_id.isnot(None)).count()
         
-        # Classification
-        total_classified = ClassificationResult.query.count()
-        total_radikal = ClassificationResult.query.filter(func.lower(ClassificationResult.prediction) == 'radikal').count()
-        total_non_radikal = ClassificationResult.query.filter(func.lower(ClassificationResult.prediction) == 'non-radikal').count()
+        # Classification (majority vote per document)
+        consensus = get_consensus_counts()
     else:
         # Count user specific
         total_raw_upload = RawData.query.filter_by(uploaded_by=user.id).filter(RawData.dataset_id.isnot(None)).count()
@@ -37,10 +36,12 @@ def get_current_user_stats(user):
         total_clean_upload = CleanDataUpload.query.filter_by(cleaned_by=user.id).count()
         total_clean_scraper = CleanDataScraper.query.filter_by(cleaned_by=user.id).count()
         
-        # Classification
-        total_classified = ClassificationResult.query.filter_by(classified_by=user.id).count()
-        total_radikal = ClassificationResult.query.filter_by(classified_by=user.id).filter(func.lower(ClassificationResult.prediction) == 'radikal').count()
-        total_non_radikal = ClassificationResult.query.filter_by(classified_by=user.id).filter(func.lower(ClassificationResult.prediction) == 'non-radikal').count()
+        # Classification (majority vote per document)
+        consensus = get_consensus_counts(user_id=user.id)
+        
+    total_classified = consensus['total']
+    total_radikal = consensus['radikal']
+    total_non_radikal = consensus['non_radikal']
         
     return StatsDTO(
         total_raw_upload=total_raw_upload,
@@ -4,7 +4,6 @@ from models.models import db, RawDataScraper, Dataset
 from datetime import datetime
 from utils.utils import get_jakarta_time, generate_activity_log
 import uuid
-import re
 
 scraper_bp = Blueprint('scraper', __name__)
 
@@ -56,6 +55,10 @@ def legacy_index():
     return redirect(url_for('scraper.index'))
 
 from services.apify_service import ApifyService
+from services.scraping_service import import_scraped_items
+from services.scraping_batch_service import (
+    create_batch_dataset, start_batch_job, summarize_batch, abort_batch, SUPPORTED_PLATFORMS
+)
 
 @scraper_bp.route('/start_scraping', methods=['POST'])
 @login_required
@@ -116,8 +119,16 @@ def start_scraping():
                 'keywords': keywords,
                 'apify_run_id': apify_run_id,
                 'apify_dataset_id': apify_dataset_id,
-                'language': language
+                'language': language,
+                'webhook': ApifyService.webhooks_enabled()
             }
+            # Optional mapping given up front: the run webhook then imports without the mapping dialog
+            if data.get('content_column'):
+                new_dataset.meta_info['column_mapping'] = {
+                    'content_column': data.get('content_column'),
+                    'username_column': data.get('username_column'),
+                    'url_column': data.get('url_column')
+                }
             db.session.commit()
             
             generate_activity_log(
@@ -133,7 +144,7 @@ def start_scraping():
                 'job_id': new_dataset.id, 
                 'run_id': apify_run_id, 
                 'apify_dataset_id': apify_dataset_id,
-                'requires_mapping': True
+                'requires_mapping': 'column_mapping' not in new_dataset.meta_info
             })
             
         except Exception as e:
@@ -144,6 +155,109 @@ def start_scraping():
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@scraper_bp.route('/start_scraping_batch', methods=['POST'])
+@login_required
+def start_scraping_batch():
+    """
+    Start one parent job that scrapes every keyword on every platform.
+    Runs are fanned out with at most `max_concurrent_runs` Apify runs at a time and all results
+    are merged (deduplicated) into a single dataset.
+    """
+    data = request.get_json() or {}
+    platforms = [str(p).lower() for p in (data.get('platforms') or [])]
+    keywords = [str(k).strip() for k in (data.get('keywords') or []) if str(k).strip()]
+    
+    if not platforms or not keywords:
+        return jsonify({'success': False, 'message': 'Platforms and keywords must be filled'}), 400
+    
+    unsupported = [p for p in platforms if p not in SUPPORTED_PLATFORMS]
+    if unsupported:
+        return jsonify({'success': False, 'message': f"Platform not supported: {', '.join(unsupported)}. Only Twitter, TikTok, and Facebook are available."}), 400
+    
+    max_runs = current_app.config.get('SCRAPING_BATCH_MAX_RUNS', 100)
+    if len(platforms) * len(keywords) > max_runs:
+        return jsonify({'success': False, 'message': f'A batch can start at most {max_runs} runs'}), 400
+    
+    # Never exceed the configured Apify concurrency cap, whatever the client asks for
+    concurrency_cap = current_app.config.get('SCRAPING_BATCH_MAX_CONCURRENT_RUNS', 5)
+    try:
+        max_results = int(data.get('max_results') or 25)
+        max_concurrent_runs = min(int(data.get('max_concurrent_runs') or concurrency_cap), concurrency_cap)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'max_results and max_concurrent_runs must be numbers'}), 400
+    if max_results < 1 or max_concurrent_runs < 1:
+        return jsonify({'success': False, 'message': 'max_results and max_concurrent_runs must be at least 1'}), 400
+    
+    try:
+        dataset = create_batch_dataset(
+            current_user.id,
+            list(dict.fromkeys(platforms)),
+            list(dict.fromkeys(keywords)),
+            max_results,
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            language=data.get('language') or 'id',
+            max_concurrent_runs=max_concurrent_runs,
+            column_mappings=data.get('column_mappings')
+        )
+        db.session.commit()
+        
+        start_batch_job(current_app._get_current_object(), dataset.id)
+        
+        generate_activity_log(
+            action='scraping',
+            description=f"Started batch scraping of {len(keywords)} keywords on {', '.join(platforms)}",
+            user_id=current_user.id,
+            icon='fa-robot',
+            color='warning'
+        )
+        
+        return jsonify({
+            'success': True,
+            'job_id': dataset.id,
+            'total_runs': len(dataset.meta_info['runs']),
+            'max_concurrent_runs': max_concurrent_runs
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f"Failed to start batch scraping: {str(e)}"}), 500
+
+@scraper_bp.route('/scraping_batch/<int:dataset_id>', methods=['GET'])
+@login_required
+def scraping_batch_status(dataset_id):
+    dataset = Dataset.query.get(dataset_id)
+    if not dataset or not (dataset.meta_info or {}).get('batch'):
+        return jsonify({'success': False, 'message': 'Batch job not found'}), 404
+    if dataset.uploaded_by != current_user.id and not current_user.is_admin():
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    return jsonify({'success': True, 'data': summarize_batch(dataset)})
+
+@scraper_bp.route('/scraping_batch/<int:dataset_id>/abort', methods=['POST'])
+@login_required
+def abort_scraping_batch(dataset_id):
+    try:
+        dataset = Dataset.query.filter_by(id=dataset_id).with_for_update().first()
+        if not dataset or not (dataset.meta_info or {}).get('batch'):
+            return jsonify({'success': False, 'message': 'Batch job not found'}), 404
+        if dataset.uploaded_by != current_user.id and not current_user.is_admin():
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+        if not abort_batch(dataset):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Batch job has already finished'}), 400
+        
+        generate_activity_log(
+            action='scraping',
+            description=f"Aborted batch scraping: {dataset.name}",
+            user_id=current_user.id,
+            icon='fa-stop',
+            color='danger'
+        )
+        return jsonify({'success': True, 'message': 'Batch scraping aborted', 'data': summarize_batch(dataset)})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error aborting batch scraping: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @scraper_bp.route('/process_scraping_column_mapping', methods=['POST'])
 @login_required
 def process_scraping_column_mapping():
@@ -184,197 +298,15 @@ def process_scraping_column_mapping():
          return jsonify({'success': False, 'message': 'Apify Dataset ID required'}), 400
          
     try:
-        # Fetch all items from Apify
-        # Use clean=False to match the preview logic and get all fields
-        items = ApifyService.get_dataset_items(apify_dataset_id)
-        current_app.logger.info(f"Apify Dataset {apify_dataset_id} items count: {len(items)}")
-        
-        # If no items, try to fetch from run stats or check if run is still running/failed
-        if not items:
+        # Items are fetched, deduplicated and bulk-inserted one page at a time
+        count, fetched = import_scraped_items(
+            dataset, apify_dataset_id, content_col, username_col, url_col, current_user.id
+        )
+        current_app.logger.info(f"Apify Dataset {apify_dataset_id} items read: {fetched}, new records: {count}")
+
+        if not fetched:
              current_app.logger.warning(f"No items found for dataset {apify_dataset_id}")
-             # Check run status if possible (optional, might need run_id)
-             
-        # Parse platform and keyword from dataset name (format: "Scraping {Platform} - {Keyword}")
-        platform = 'unknown'
-        keyword = 'unknown'
-        if dataset.name.startswith('Scraping '):
-            parts = dataset.name[9:].split(' - ', 1)
-            if len(parts) >= 1:
-                platform = parts[0].lower()
-            if len(parts) >= 2:
-                keyword = parts[1]
-        
-        # Fetch existing content for this dataset to prevent duplicates
-        existing_contents = set([r[0] for r in db.session.query(RawDataScraper.content).filter_by(dataset_id=dataset.id).all()])
-        
-        count = 0
-        for raw_item in items:
-            # Flatten item first to handle nested objects in columns
-            item = {}
-            for k, v in raw_item.items():
-                if isinstance(v, dict):
-                    for sub_k, sub_v in v.items():
-                        item[f"{k}_{sub_k}"] = sub_v
-                    # Keep original for fallback logic
-                    item[k] = v
-                else:
-                    item[k] = v
-            
-            # Map item keys to our model
-            content = item.get(content_col, '')
-            # Try to get content from original raw item if flattened key failed or empty
-            if not content and content_col in raw_item:
-                 content = raw_item[content_col]
-                 
-            # Skip empty content
-            if not content:
-                continue
-            
-            # Check duplicate
-            if content in existing_contents:
-                continue
-                
-            username = item.get(username_col, 'unknown')
-            if username == 'unknown' and username_col in raw_item:
-                username = raw_item[username_col]
-                
-            url = item.get(url_col, '')
-            if not url and url_col in raw_item:
-                url = raw_item[url_col]
-            
-            # Additional fields (best effort mapping for social media metrics)
-            likes = item.get('likes') or item.get('favorite_count') or item.get('likeCount') or item.get('diggCount') or 0
-            retweets = item.get('retweets') or item.get('retweet_count') or item.get('repostCount') or 0
-            replies = item.get('replies') or item.get('reply_count') or item.get('commentCount') or 0
-            shares = item.get('shares') or item.get('shareCount') or 0
-            views = item.get('views') or item.get('view_count') or item.get('playCount') or 0
-            
-            # Ensure types
-            try:
-                likes = int(likes)
-            except:
-                likes = 0
-                
-            try:
-                retweets = int(retweets)
-            except:
-                retweets = 0
-                
-            try:
-                replies = int(replies)
-            except:
-                replies = 0
-                
-            try:
-                shares = int(shares)
-            except:
-                shares = 0
-                
-            try:
-                views = int(views)
-            except:
-                views = 0
-                
-            # Handle Twitter object structure (sometimes username is inside 'user' or 'author')
-            if isinstance(username, dict):
-                username = username.get('screen_name') or username.get('username') or username.get('name') or 'unknown'
-            elif not username or username == 'unknown' or (isinstance(username, str) and username.isdigit()):
-                # Try fallback fields for username
-                # Twitter: user.screen_name, author.userName
-                # TikTok: authorMeta.name, authorMeta.nickName, author.uniqueId
-                username = (item.get('screen_name') or 
-                           item.get('user', {}).get('screen_name') or 
-                           item.get('user', {}).get('username') or 
-                           item.get('core', {}).get('user_results', {}).get('result', {}).get('legacy', {}).get('screen_name') or # Deeply nested Twitter structure
-                           item.get('author', {}).get('userName') or 
-                           item.get('author', {}).get('uniqueId') or 
-                           item.get('authorMeta', {}).get('name') or 
-                           item.get('authorMeta', {}).get('nickName') or 
-                           'unknown')
-                
-                # Special check for TikTok structure which is often nested or flattened
-                if platform.lower() == 'tiktok':
-                     # Prioritize uniqueId or name over numeric IDs
-                     tiktok_user = (item.get('authorMeta', {}).get('name') or 
-                                   item.get('authorMeta', {}).get('nickName') or 
-                                   item.get('author_uniqueId') or 
-                                   item.get('author_nickname') or 
-                                   item.get('author_userName'))
-                     
-                     if tiktok_user and not str(tiktok_user).isdigit():
-                         username = tiktok_user
-                
-                # Special check for Facebook structure
-                if platform.lower() == 'facebook':
-                    # Check for author_name in top level or inside user object
-                    facebook_user = (item.get('author_name') or
-                                    item.get('user', {}).get('name') or
-                                    item.get('user', {}).get('username') or
-                                    item.get('userName') or
-                                    item.get('authorName') or # Common in some scrapers
-                                    item.get('user_name') or
-                                    item.get('name')) # Sometimes just name
-                    
-                    # If still not found, try to extract from URL if it's a profile URL
-                    if not facebook_user and url:
-                        # Try to extract from facebook.com/username/posts/...
-                        fb_match = re.search(r'facebook\.com/([^/?#]+)', url)
-                        if fb_match:
-                            potential_user = fb_match.group(1)
-                            # Avoid 'groups', 'pages', 'story' etc if possible, but better than nothing
-                            if potential_user not in ['groups', 'watch', 'story', 'permalink']:
-                                facebook_user = potential_user
-                                
-                    if facebook_user:
-                        username = facebook_user
-                
-            # Handle Twitter content structure (sometimes content is 'full_text' or 'text')
-            if not content:
-                content = item.get('full_text') or item.get('text') or item.get('description') or ''
-                
-            # Handle URL structure
-            if not url:
-                url = (item.get('url') or 
-                      item.get('expanded_url') or 
-                      item.get('postUrl') or 
-                      item.get('webUrl') or 
-                      item.get('webVideoUrl') or 
-                      '')
-            
-            # Extract username from URL if still unknown or looks like a URL (user mapped URL to username)
-            if (not username or username == 'unknown' or username == 'None' or 'http' in str(username)) and url:
-                # Pattern for Twitter: twitter.com/username/status/... or x.com/username/...
-                twitter_match = re.search(r'https?://(?:www\.)?(?:twitter|x)\.com/([^/?#]+)', url)
-                if twitter_match:
-                    username = twitter_match.group(1)
-                
-                # Pattern for TikTok: tiktok.com/@username/...
-                tiktok_match = re.search(r'https?://(?:www\.)?tiktok\.com/@([^/?#]+)', url)
-                if tiktok_match:
-                    username = tiktok_match.group(1)
 
-            raw_data = RawDataScraper(
-                username=str(username)[:255],
-                content=str(content),
-                url=str(url),
-                platform=platform,
-                keyword=keyword,
-                scrape_date=get_jakarta_time().date(),
-                status='raw',
-                dataset_id=dataset.id,
-                dataset_name=dataset.name,
-                scraped_by=current_user.id,
-                likes=likes,
-                retweets=retweets,
-                replies=replies,
-                shares=shares,
-                comments=replies,
-                views=views
-            )
-            db.session.add(raw_data)
-            existing_contents.add(content)
-            count += 1
-            
         db.session.commit()
         
         # Update total records based on actual count in DB
@@ -66,6 +66,10 @@ class Config:
     
     # File upload settings
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
+    UPLOAD_CHUNK_ROWS = int(os.environ.get('UPLOAD_CHUNK_ROWS', '10000'))  # rows parsed and inserted per batch
+    UPLOAD_MEMORY_BUDGET_MB = int(os.environ.get('UPLOAD_MEMORY_BUDGET_MB', '512'))  # max memory for reading one Excel upload
+    UPLOAD_PROGRESS_TTL = int(os.environ.get('UPLOAD_PROGRESS_TTL', '3600'))  # seconds a finished upload job's progress is kept
+    CHUNK_SESSION_MAX_AGE = int(os.environ.get('CHUNK_SESSION_MAX_AGE', '86400'))  # seconds before an untouched chunk upload session is swept
 
     # OTP Settings
     OTP_ENABLED = os.environ.get('OTP_ENABLED', 'True').lower() == 'true'
@@ -117,6 +121,14 @@ class Config:
     # Label Encoder Path
     LABEL_ENCODER_PATH = os.getenv('LABEL_ENCODER_PATH',
         os.path.join(_model_base_path, 'label_encoder', 'label_encoder.joblib'))
+
+    # Retraining: max worker processes for training models in parallel (0 = one per CPU, capped at model count)
+    TRAINING_MAX_WORKERS = int(os.getenv('TRAINING_MAX_WORKERS', '0'))
+    # 'split' saves the evaluated models, 'background' refits them on the full dataset after training
+    TRAINING_FINAL_FIT = os.getenv('TRAINING_FINAL_FIT', 'split')
+    # Word2Vec feature matrices reused across retraining runs (empty = disabled), keeping the newest N
+    TRAINING_FEATURE_CACHE_DIR = os.getenv('TRAINING_FEATURE_CACHE_DIR', os.path.join(_model_base_path, 'feature_cache'))
+    TRAINING_FEATURE_CACHE_MAX_ENTRIES = int(os.getenv('TRAINING_FEATURE_CACHE_MAX_ENTRIES', '5'))
     
     # Email Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -133,6 +145,38 @@ class Config:
     APIFY_TWITTER_ACTOR = os.environ.get('APIFY_TWITTER_ACTOR', 'kaitoeasyapi/twitter-x-data-tweet-scraper-pay-per-result-cheapest')
     APIFY_FACEBOOK_ACTOR = os.environ.get('APIFY_FACEBOOK_ACTOR', 'powerai/facebook-post-search-scraper')
     APIFY_TIKTOK_ACTOR = os.environ.get('APIFY_TIKTOK_ACTOR', 'clockworks/free-tiktok-scraper')
+    # Shared Apify HTTP client: timeouts in seconds, retries with jittered backoff on 429/5xx
+    APIFY_BASE_URL = os.environ.get('APIFY_BASE_URL', 'https://api.apify.com/v2')
+    APIFY_CONNECT_TIMEOUT = float(os.environ.get('APIFY_CONNECT_TIMEOUT', 5))
+    APIFY_TIMEOUT = float(os.environ.get('APIFY_TIMEOUT', 30))
+    APIFY_MAX_RETRIES = int(os.environ.get('APIFY_MAX_RETRIES', 3))
+    APIFY_BACKOFF_FACTOR = float(os.environ.get('APIFY_BACKOFF_FACTOR', 0.5))
+    # Scraping import: Apify dataset items fetched and inserted per page of this size
+    SCRAPING_IMPORT_PAGE_SIZE = int(os.environ.get('SCRAPING_IMPORT_PAGE_SIZE', 1000))
+    # Scraping progress: Apify run status cached per run (seconds); final states are cached longer
+    SCRAPING_PROGRESS_TTL = float(os.environ.get('SCRAPING_PROGRESS_TTL', 3))
+    SCRAPING_PROGRESS_FINAL_TTL = float(os.environ.get('SCRAPING_PROGRESS_FINAL_TTL', 60))
+    # Apify run webhooks: public URL of /api/scraping/webhook/apify and the shared token it checks.
+    # Webhooks are only registered when both are set.
+    APIFY_WEBHOOK_URL = os.environ.get('APIFY_WEBHOOK_URL')
+    APIFY_WEBHOOK_SECRET = os.environ.get('APIFY_WEBHOOK_SECRET')
+    # Batch scraping (keywords x platforms): Apify runs in flight at once, runs per batch, poll interval (seconds)
+    SCRAPING_BATCH_MAX_CONCURRENT_RUNS = int(os.environ.get('SCRAPING_BATCH_MAX_CONCURRENT_RUNS', 5))
+    SCRAPING_BATCH_MAX_RUNS = int(os.environ.get('SCRAPING_BATCH_MAX_RUNS', 100))
+    SCRAPING_BATCH_POLL_INTERVAL = float(os.environ.get('SCRAPING_BATCH_POLL_INTERVAL', 10))
+    SCRAPING_BATCH_STALE_AFTER = int(os.environ.get('SCRAPING_BATCH_STALE_AFTER', 900))
+    JOB_RECOVERY_INTERVAL = int(os.environ.get('JOB_RECOVERY_INTERVAL', 300))
+    
+    # Near-Duplicate Detection (MinHash + LSH over cleaned content)
+    # Mode: 'off', 'ignore' (mark near-duplicates as ignored) or 'cluster' (keep them, linked to a representative)
+    NEAR_DUPLICATE_MODE = os.environ.get('NEAR_DUPLICATE_MODE', 'off').lower()
+    NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.8'))  # Jaccard similarity
+    NEAR_DUPLICATE_NUM_PERM = int(os.environ.get('NEAR_DUPLICATE_NUM_PERM', '128'))
+    NEAR_DUPLICATE_SHINGLE_SIZE = int(os.environ.get('NEAR_DUPLICATE_SHINGLE_SIZE', '5'))  # character n-grams
+    
+    # Bulk Cleaning: clean selected datasets in parallel worker processes (each with its own DB connection)
+    CLEANING_PARALLEL = os.environ.get('CLEANING_PARALLEL', 'False').lower() == 'true'
+    CLEANING_MAX_WORKERS = int(os.environ.get('CLEANING_MAX_WORKERS', '2'))  # cap to avoid saturating the database
     
     @staticmethod
     def init_app(app):
@@ -0,0 +1,69 @@
+"""add classification ensembles table
+
+Revision ID: 3f6b2a1c9e47
+Revises: d02f3e9c2890
+Create Date: 2026-01-12 09:14:03.512884
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2a1c9e47'
+down_revision = 'd02f3e9c2890'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS classification_ensembles (
+        id SERIAL PRIMARY KEY,
+        data_type VARCHAR(20) NOT NULL,
+        data_id INTEGER NOT NULL,
+        dataset_id INTEGER REFERENCES datasets(id) ON DELETE CASCADE,
+        radikal_votes INTEGER NOT NULL DEFAULT 0,
+        non_radikal_votes INTEGER NOT NULL DEFAULT 0,
+        mean_probability_radikal FLOAT NOT NULL DEFAULT 0,
+        final_label VARCHAR(20) NOT NULL,
+        classified_by INTEGER REFERENCES users(id),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT uq_classification_ensembles_document UNIQUE (data_type, data_id)
+    );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_classification_ensembles_dataset_id ON classification_ensembles(dataset_id);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_classification_ensembles_final_label ON classification_ensembles(final_label);")
+
+    # Backfill from existing classification results (one-off GROUP BY)
+    op.execute("""
+    INSERT INTO classification_ensembles (
+        data_type, data_id, dataset_id, radikal_votes, non_radikal_votes,
+        mean_probability_radikal, final_label, classified_by
+    )
+    SELECT
+        cr.data_type,
+        cr.data_id,
+        COALESCE(MAX(cu.dataset_id), MAX(cs.dataset_id)),
+        SUM(CASE WHEN cr.prediction = 'Radikal' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN cr.prediction = 'Radikal' THEN 0 ELSE 1 END),
+        AVG(cr.probability_radikal),
+        CASE
+            WHEN SUM(CASE WHEN cr.prediction = 'Radikal' THEN 1 ELSE 0 END)
+               > SUM(CASE WHEN cr.prediction = 'Radikal' THEN 0 ELSE 1 END)
+            THEN 'Radikal' ELSE 'Non-Radikal'
+        END,
+        MAX(cr.classified_by)
+    FROM classification_results cr
+    LEFT JOIN clean_data_upload cu ON cr.data_type = 'upload' AND cu.id = cr.data_id
+    LEFT JOIN clean_data_scraper cs ON cr.data_type = 'scraper' AND cs.id = cr.data_id
+    GROUP BY cr.data_type, cr.data_id
+    ON CONFLICT (data_type, data_id) DO NOTHING;
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_classification_ensembles_final_label;")
+    op.execute("DROP INDEX IF EXISTS idx_classification_ensembles_dataset_id;")
+    op.execute("DROP TABLE IF EXISTS classification_ensembles;")
@@ -0,0 +1,61 @@
+"""add content_hash columns for duplicate detection
+
+Revision ID: 7a91c4d2e5b8
+Revises: 3f6b2a1c9e47
+Create Date: 2026-01-19 10:02:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a91c4d2e5b8'
+down_revision = '3f6b2a1c9e47'
+branch_labels = None
+depends_on = None
+
+# table -> column that is hashed (must match utils.utils.compute_content_hash)
+CONTENT_HASH_TABLES = {
+    'raw_data': 'content',
+    'raw_data_scraper': 'content',
+    'clean_data_upload': 'cleaned_content',
+    'clean_data_scraper': 'cleaned_content',
+}
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    for table, source_column in CONTENT_HASH_TABLES.items():
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        if 'content_hash' not in columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+        # Backfill: SHA-256 hex of trimmed text with whitespace runs collapsed; NULL for empty text
+        op.execute(f"""
+        UPDATE {table}
+        SET content_hash = encode(
+            sha256(convert_to(NULLIF(btrim(regexp_replace({source_column}, '\\s+', ' ', 'g')), ''), 'UTF8')),
+            'hex'
+        )
+        WHERE content_hash IS NULL AND {source_column} IS NOT NULL;
+        """)
+
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_dataset_content_hash ON {table}(dataset_id, content_hash);"
+        )
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    for table in CONTENT_HASH_TABLES:
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_dataset_content_hash;")
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        if 'content_hash' in columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.drop_column('content_hash')
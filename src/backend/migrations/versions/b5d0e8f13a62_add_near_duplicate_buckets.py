@@ -0,0 +1,54 @@
+"""add near duplicate buckets and near_duplicate_of columns
+
+Revision ID: b5d0e8f13a62
+Revises: 7a91c4d2e5b8
+Create Date: 2026-01-26 14:37:55.904216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d0e8f13a62'
+down_revision = '7a91c4d2e5b8'
+branch_labels = None
+depends_on = None
+
+CLEAN_TABLES = ['clean_data_upload', 'clean_data_scraper']
+
+
+def upgrade():
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS near_duplicate_buckets (
+        id BIGSERIAL PRIMARY KEY,
+        dataset_id INTEGER NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
+        bucket BIGINT NOT NULL,
+        data_type VARCHAR(20) NOT NULL,
+        data_id INTEGER NOT NULL
+    );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_near_duplicate_buckets_dataset_bucket ON near_duplicate_buckets(dataset_id, bucket);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_near_duplicate_buckets_document ON near_duplicate_buckets(data_type, data_id);")
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    for table in CLEAN_TABLES:
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        if 'near_duplicate_of' not in columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('near_duplicate_of', sa.String(length=40), nullable=True))
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_near_duplicate_of ON {table}(near_duplicate_of);")
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    for table in CLEAN_TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_near_duplicate_of;")
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        if 'near_duplicate_of' in columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                batch_op.drop_column('near_duplicate_of')
+
+    op.execute("DROP TABLE IF EXISTS near_duplicate_buckets;")
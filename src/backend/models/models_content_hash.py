@@ -0,0 +1,42 @@
+"""
+Kolom content_hash untuk raw_data, raw_data_scraper, clean_data_upload dan clean_data_scraper.
+
+Kolom ditambahkan ke model yang sudah ada (declarative) beserta index (dataset_id, content_hash),
+sehingga pengecekan duplikasi tidak lagi membandingkan kolom TEXT secara langsung.
+Nilai hash diisi otomatis saat insert (termasuk bulk_insert_mappings) dan saat konten berubah.
+"""
+from sqlalchemy import event
+from models.models import db, RawData, RawDataScraper, CleanDataUpload, CleanDataScraper
+from utils.utils import compute_content_hash
+
+# model -> kolom sumber yang di-hash
+CONTENT_HASH_SOURCES = {
+    RawData: 'content',
+    RawDataScraper: 'content',
+    CleanDataUpload: 'cleaned_content',
+    CleanDataScraper: 'cleaned_content',
+}
+
+
+def _hash_default(source_column):
+    def default(context):
+        return compute_content_hash(context.get_current_parameters().get(source_column))
+    return default
+
+
+def _attach_content_hash(model, source_column):
+    model.content_hash = db.Column(db.String(64), default=_hash_default(source_column))
+    db.Index(
+        f'idx_{model.__tablename__}_dataset_content_hash',
+        model.__table__.c.dataset_id,
+        model.__table__.c.content_hash
+    )
+
+    @event.listens_for(model, 'before_update')
+    def refresh_content_hash(mapper, connection, target):
+        target.content_hash = compute_content_hash(getattr(target, source_column))
+
+
+for _model, _source_column in CONTENT_HASH_SOURCES.items():
+    if 'content_hash' not in _model.__table__.c:
+        _attach_content_hash(_model, _source_column)
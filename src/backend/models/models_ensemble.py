@@ -0,0 +1,36 @@
+from datetime import datetime
+from models.models import db
+
+
+class ClassificationEnsemble(db.Model):
+    """Hasil majority vote per dokumen (data_type, data_id) yang dimaterialisasi.
+
+    Diperbarui secara inkremental setiap kali batch classification menulis
+    ClassificationResult, sehingga dashboard, halaman hasil, dan export tidak
+    perlu menghitung ulang GROUP BY dari tabel classification_results.
+    """
+    __tablename__ = 'classification_ensembles'
+    __table_args__ = (
+        db.UniqueConstraint('data_type', 'data_id', name='uq_classification_ensembles_document'),
+        db.Index('idx_classification_ensembles_dataset_id', 'dataset_id'),
+        db.Index('idx_classification_ensembles_final_label', 'final_label'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    data_type = db.Column(db.String(20), nullable=False)  # 'upload' or 'scraper'
+    data_id = db.Column(db.Integer, nullable=False)  # ID from clean_data_upload or clean_data_scraper
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'))
+    radikal_votes = db.Column(db.Integer, nullable=False, default=0)
+    non_radikal_votes = db.Column(db.Integer, nullable=False, default=0)
+    mean_probability_radikal = db.Column(db.Float, nullable=False, default=0.0)
+    final_label = db.Column(db.String(20), nullable=False)  # Radikal, Non-Radikal
+    classified_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def total_votes(self):
+        return (self.radikal_votes or 0) + (self.non_radikal_votes or 0)
+
+    def __repr__(self):
+        return f'<ClassificationEnsemble {self.data_type}:{self.data_id} {self.final_label}>'
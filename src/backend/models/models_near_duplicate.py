@@ -0,0 +1,29 @@
+from models.models import db, CleanDataUpload, CleanDataScraper
+
+
+class NearDuplicateBucket(db.Model):
+    """Bucket LSH (MinHash) per dokumen clean data, dipakai untuk deteksi near-duplicate per dataset.
+
+    Satu baris per (band, dokumen); kolom bucket sudah memuat nomor band sehingga
+    pencarian kandidat cukup memakai index (dataset_id, bucket).
+    """
+    __tablename__ = 'near_duplicate_buckets'
+    __table_args__ = (
+        db.Index('idx_near_duplicate_buckets_dataset_bucket', 'dataset_id', 'bucket'),
+        db.Index('idx_near_duplicate_buckets_document', 'data_type', 'data_id'),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'), nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
+    data_type = db.Column(db.String(20), nullable=False)  # 'upload' or 'scraper'
+    data_id = db.Column(db.Integer, nullable=False)  # ID from clean_data_upload or clean_data_scraper
+
+    def __repr__(self):
+        return f'<NearDuplicateBucket {self.data_type}:{self.data_id} {self.bucket}>'
+
+
+# Representative document ("upload_12" / "scraper_34") for rows kept in 'cluster' mode
+for _model in (CleanDataUpload, CleanDataScraper):
+    if 'near_duplicate_of' not in _model.__table__.c:
+        _model.near_duplicate_of = db.Column(db.String(40), index=True)
@@ -0,0 +1,158 @@
+"""
+HTTP client bersama untuk Apify API.
+
+Satu requests.Session per proses dan konfigurasi APIFY_* (koneksi keep-alive di-pool), timeout
+connect/read di setiap request, dan retry terbatas dengan backoff eksponensial + jitter untuk 429/5xx.
+Base URL dapat diarahkan ke server lokal (APIFY_BASE_URL), sehingga client ini bisa diuji dengan stub
+HTTP server.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = 'https://api.apify.com/v2'
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+MAX_BACKOFF = 30
+POOL_SIZE = 10
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Request yang tidak idempotent (mis. memulai actor run) hanya diulang jika server jelas menolaknya
+# sebelum diproses, agar tidak membuat run ganda.
+NON_IDEMPOTENT_RETRY_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+_client = None
+_client_pid = None
+_client_config = None
+_client_lock = threading.Lock()
+
+
+class ApifyClient:
+    """Session Apify dengan pooling, timeout, dan retry"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_factor=DEFAULT_BACKOFF_FACTOR, pool_size=POOL_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt, response=None):
+        """Full jitter: acak di antara 0 dan backoff_factor * 2^attempt; Retry-After dihormati"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), MAX_BACKOFF)
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff_factor * (2 ** attempt)))
+
+    def request(self, method, path, timeout=None, **kwargs):
+        """
+        Kirim request dan kembalikan Response (status error tidak di-raise; pemanggil tetap memakai
+        raise_for_status() atau memeriksa status_code seperti sebelumnya).
+        """
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+
+        url = self.url(path)
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as e:
+                # Selain connect timeout, request tidak idempotent mungkin sudah sampai ke server
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in retry_statuses and attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+            return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def _setting(name, default, app_config=None):
+    if app_config is not None and app_config.get(name) is not None:
+        return app_config.get(name)
+    return os.environ.get(name, default)
+
+
+def _client_settings(app_config=None):
+    return {
+        'base_url': _setting('APIFY_BASE_URL', DEFAULT_BASE_URL, app_config),
+        'connect_timeout': float(_setting('APIFY_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT, app_config)),
+        'read_timeout': float(_setting('APIFY_TIMEOUT', DEFAULT_READ_TIMEOUT, app_config)),
+        'max_retries': int(_setting('APIFY_MAX_RETRIES', DEFAULT_MAX_RETRIES, app_config)),
+        'backoff_factor': float(_setting('APIFY_BACKOFF_FACTOR', DEFAULT_BACKOFF_FACTOR, app_config)),
+    }
+
+
+def create_client(app_config=None):
+    """Buat ApifyClient dari Flask config (jika ada) atau environment variable"""
+    return ApifyClient(**_client_settings(app_config))
+
+
+def get_client(app_config=None):
+    """
+    Client bersama untuk proses ini. Tanpa app_config dipakai current_app.config jika ada app
+    context. Dibuat ulang setelah fork (worker gunicorn) agar socket pool tidak dipakai bersama
+    antar proses, dan jika konfigurasi APIFY_* berbeda dari client yang ada.
+    """
+    global _client, _client_pid, _client_config
+    if app_config is None and has_app_context():
+        app_config = current_app.config
+    settings = _client_settings(app_config)
+    pid = os.getpid()
+    if _client is None or _client_pid != pid or _client_config != settings:
+        with _client_lock:
+            if _client is None or _client_pid != pid or _client_config != settings:
+                # The previous client is not closed: other threads may still be using its session
+                _client = ApifyClient(**settings)
+                _client_pid = pid
+                _client_config = settings
+    return _client
+
+
+def reset_client():
+    """Tutup client bersama (mis. setelah konfigurasi APIFY_* berubah atau di test)"""
+    global _client, _client_pid, _client_config
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_pid = None
+        _client_config = None
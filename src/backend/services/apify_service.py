@@ -1,9 +1,17 @@
-import requests
+import base64
+import json
 import os
 from flask import current_app
+from services.apify_client import get_client
+
+WEBHOOK_TOKEN_HEADER = 'X-Apify-Webhook-Token'
+WEBHOOK_EVENT_TYPES = ['ACTOR.RUN.SUCCEEDED', 'ACTOR.RUN.FAILED', 'ACTOR.RUN.ABORTED', 'ACTOR.RUN.TIMED_OUT']
 
 class ApifyService:
-    BASE_URL = "https://api.apify.com/v2"
+    @staticmethod
+    def client():
+        # Shared pooled session with timeouts and retry (see services/apify_client.py)
+        return get_client(current_app.config)
 
     @staticmethod
     def get_token():
@@ -20,7 +28,22 @@ class ApifyService:
         return actors.get(platform.lower())
 
     @staticmethod
-    def start_scraping_job(platform, keywords, max_results=100, start_date=None, end_date=None, language='id', **kwargs):
+    def webhooks_enabled():
+        return bool(current_app.config.get('APIFY_WEBHOOK_URL') and current_app.config.get('APIFY_WEBHOOK_SECRET'))
+
+    @staticmethod
+    def build_webhooks_param():
+        """Ad-hoc webhook definition for a run (base64 JSON, as expected by the `webhooks` query param)"""
+        webhooks = [{
+            'eventTypes': WEBHOOK_EVENT_TYPES,
+            'requestUrl': current_app.config.get('APIFY_WEBHOOK_URL'),
+            # Apify sends these headers with every delivery; the receiver checks the token
+            'headersTemplate': json.dumps({WEBHOOK_TOKEN_HEADER: current_app.config.get('APIFY_WEBHOOK_SECRET')}),
+        }]
+        return base64.b64encode(json.dumps(webhooks).encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def start_scraping_job(platform, keywords, max_results=100, start_date=None, end_date=None, language='id', webhook=True, **kwargs):
         token = ApifyService.get_token()
         if not token:
             raise Exception("APIFY_API_TOKEN not configured")
@@ -39,7 +62,7 @@ class ApifyService:
         # Safe replacement: / -> ~
         api_actor_id = actor_id.replace('/', '~')
         
-        url = f"{ApifyService.BASE_URL}/acts/{api_actor_id}/runs?token={token}"
+        url = f"acts/{api_actor_id}/runs"
         
         # Prepare input based on platform/actor
         # This input structure varies by actor!
@@ -153,7 +176,11 @@ class ApifyService:
             }
         
         try:
-            response = requests.post(url, json=input_data)
+            params = {'token': token}
+            if webhook and ApifyService.webhooks_enabled():
+                # Completion is pushed to /api/scraping/webhook/apify instead of being polled
+                params['webhooks'] = ApifyService.build_webhooks_param()
+            response = ApifyService.client().post(url, params=params, json=input_data)
             response.raise_for_status()
             data = response.json()
             return data.get('data', {})
@@ -173,10 +200,8 @@ class ApifyService:
         if not token:
             raise Exception("APIFY_API_TOKEN not configured")
             
-        url = f"{ApifyService.BASE_URL}/actor-runs/{run_id}?token={token}"
-        
         try:
-            response = requests.get(url)
+            response = ApifyService.client().get(f"actor-runs/{run_id}", params={'token': token})
             response.raise_for_status()
             data = response.json()
             return data.get('data', {})
@@ -190,10 +215,8 @@ class ApifyService:
         if not token:
             raise Exception("APIFY_API_TOKEN not configured")
             
-        url = f"{ApifyService.BASE_URL}/datasets/{dataset_id}?token={token}"
-        
         try:
-            response = requests.get(url)
+            response = ApifyService.client().get(f"datasets/{dataset_id}", params={'token': token})
             response.raise_for_status()
             data = response.json()
             return data.get('data', {})
@@ -210,15 +233,15 @@ class ApifyService:
             
         # Use clean=false to ensure we get all fields including hidden ones if necessary
         # clean=true might hide fields that are important for mapping
-        url = f"{ApifyService.BASE_URL}/datasets/{dataset_id}/items?token={token}&clean=false"
+        params = {'token': token, 'clean': 'false'}
         
         if limit is not None:
-            url += f"&limit={limit}"
+            params['limit'] = limit
         if offset is not None:
-            url += f"&offset={offset}"
+            params['offset'] = offset
         
         try:
-            response = requests.get(url)
+            response = ApifyService.client().get(f"datasets/{dataset_id}/items", params=params)
             response.raise_for_status()
             data = response.json()
             # Apify sometimes returns list directly, sometimes inside 'data' wrapper depending on endpoint?
@@ -230,16 +253,27 @@ class ApifyService:
             current_app.logger.error(f"Apify get dataset items error: {str(e)}")
             raise
 
+    @staticmethod
+    def iter_dataset_items(dataset_id, page_size=1000):
+        """Yield dataset items page by page (offset/limit) so callers never hold the whole dataset"""
+        offset = 0
+        while True:
+            page = ApifyService.get_dataset_items(dataset_id, limit=page_size, offset=offset)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
     @staticmethod
     def abort_run(run_id):
         token = ApifyService.get_token()
         if not token:
             raise Exception("APIFY_API_TOKEN not configured")
             
-        url = f"{ApifyService.BASE_URL}/actor-runs/{run_id}/abort?token={token}"
-        
         try:
-            response = requests.post(url)
+            response = ApifyService.client().post(f"actor-runs/{run_id}/abort", params={'token': token})
             response.raise_for_status()
             data = response.json()
             return data.get('data', {})
@@ -0,0 +1,348 @@
+"""
+Protokol upload file per chunk (init -> chunk -> finish) yang dipakai bersama oleh upload model
+admin dan upload dataset.
+
+Setiap chunk disimpan sebagai part_<index> di direktori sesi dengan checksum SHA-256 yang
+diverifikasi saat diterima, sehingga klien dapat melanjutkan upload yang terputus dengan menanyakan
+chunk mana yang sudah ada. Chunk tidak perlu digabung ke satu file: open_upload() membaca
+direktori sesi sebagai satu stream (seekable) langsung ke pipeline ingestion.
+"""
+import bisect
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+ASSEMBLY_BUFFER_SIZE = 8 * 1024 * 1024
+SESSION_FILE = 'session.json'
+
+_PART_RE = re.compile(r'^part_(\d+)$')
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChunkChecksumError(ValueError):
+    """Checksum chunk yang diterima tidak sama dengan checksum dari klien"""
+
+
+def chunk_root(upload_folder):
+    return os.path.join(upload_folder, 'temp_chunks')
+
+
+def create_session(upload_folder, filename, user_id, purpose='dataset', total_chunks=None, total_size=None, **extra):
+    """
+    Buat sesi upload baru di temp_chunks/<upload_id>/: metadata di session.json dan chunk di
+    subdirektori bernama file asli (mis. ".../<upload_id>/data.csv") sehingga direktori tersebut
+    bisa dipakai sebagai file_path dataset.
+    Returns (upload_id, session_dir).
+    """
+    upload_id = uuid.uuid4().hex
+    session_dir = _session_dir(upload_folder, upload_id, filename)
+    os.makedirs(session_dir, exist_ok=True)
+
+    session = {
+        'upload_id': upload_id,
+        'filename': filename,
+        'user_id': user_id,
+        'purpose': purpose,
+        'total_chunks': total_chunks,
+        'total_size': total_size,
+        'created_at': time.time(),
+    }
+    session.update(extra)
+    with open(os.path.join(os.path.dirname(session_dir), SESSION_FILE), 'w') as handle:
+        json.dump(session, handle)
+
+    return upload_id, session_dir
+
+
+def _session_dir(upload_folder, upload_id, filename):
+    return os.path.join(chunk_root(upload_folder), upload_id, secure_filename(filename) or 'upload')
+
+
+def find_session(upload_folder, upload_id):
+    """Metadata sesi (dengan key 'path') untuk upload_id, atau None"""
+    if not upload_id or not _UPLOAD_ID_RE.match(upload_id):
+        return None
+
+    try:
+        with open(os.path.join(chunk_root(upload_folder), upload_id, SESSION_FILE)) as handle:
+            session = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    session['path'] = _session_dir(upload_folder, upload_id, session.get('filename', ''))
+    return session
+
+
+def _last_modified(path):
+    """mtime terbaru dari direktori dan seluruh isinya"""
+    latest = os.path.getmtime(path)
+    for directory, _, files in os.walk(path):
+        for entry in [directory] + [os.path.join(directory, name) for name in files]:
+            try:
+                latest = max(latest, os.path.getmtime(entry))
+            except OSError:
+                pass  # removed while walking
+    return latest
+
+
+def sweep_sessions(upload_folder, max_age, keep_paths=()):
+    """
+    Hapus sesi upload (dan direktori chunk upload model) yang tidak berubah selama max_age detik.
+    Entry yang berisi atau sama dengan salah satu keep_paths (mis. Dataset.file_path yang belum
+    di-ingest) tidak dihapus. Returns jumlah entry yang dihapus.
+    """
+    root = chunk_root(upload_folder)
+    if not os.path.isdir(root):
+        return 0
+
+    keep = [os.path.realpath(path) for path in keep_paths if path]
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        real = os.path.realpath(path)
+        if any(kept == real or kept.startswith(real + os.sep) for kept in keep):
+            continue
+        try:
+            if _last_modified(path) > cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def save_chunk(session_dir, index, stream, expected_checksum=None):
+    """
+    Simpan satu chunk secara streaming sambil menghitung SHA-256.
+    Chunk ditulis ke file sementara dan baru di-rename jika checksum cocok, sehingga part_<index>
+    yang ada selalu utuh. Returns checksum hex.
+    """
+    index = int(index)
+    if index < 0:
+        raise ValueError('Invalid chunk index')
+
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(session_dir, f".upload_{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, 'wb') as target:
+            while True:
+                block = stream.read(COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                target.write(block)
+
+        checksum = digest.hexdigest()
+        if expected_checksum and checksum != expected_checksum.strip().lower():
+            raise ChunkChecksumError(f'Checksum mismatch for chunk {index}')
+
+        os.replace(tmp_path, os.path.join(session_dir, f'part_{index}'))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    with open(os.path.join(session_dir, f'checksum_{index}'), 'w') as handle:
+        handle.write(checksum)
+    return checksum
+
+
+def received_chunks(session_dir):
+    """{index: checksum} untuk chunk yang sudah tersimpan utuh"""
+    chunks = {}
+    for name in os.listdir(session_dir):
+        match = _PART_RE.match(name)
+        if not match:
+            continue
+        index = int(match.group(1))
+        try:
+            with open(os.path.join(session_dir, f'checksum_{index}')) as handle:
+                chunks[index] = handle.read().strip()
+        except OSError:
+            chunks[index] = None
+    return dict(sorted(chunks.items()))
+
+
+def missing_chunks(session_dir, total_chunks=None):
+    """
+    Index chunk yang belum diterima. Tanpa total_chunks hanya celah sebelum index tertinggi yang
+    diketahui (chunk terakhir yang belum dikirim tidak terdeteksi).
+    """
+    received = received_chunks(session_dir)
+    if total_chunks is None:
+        total_chunks = max(received) + 1 if received else 0
+    return [index for index in range(total_chunks) if index not in received]
+
+
+def chunk_paths(session_dir):
+    """Path part_<index> terurut berdasarkan index; ValueError jika index tidak berurutan dari 0"""
+    indices = list(received_chunks(session_dir))
+    if indices != list(range(len(indices))):
+        missing = sorted(set(range(indices[-1] + 1)) - set(indices))
+        raise ValueError(f"Missing file chunks: {missing}")
+    return [os.path.join(session_dir, f'part_{index}') for index in indices]
+
+
+def _sendfile(source, target, size):
+    """Kernel-side copy (os.sendfile); returns False if not supported for these files"""
+    offset = 0
+    try:
+        while offset < size:
+            sent = os.sendfile(target.fileno(), source.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    except OSError:
+        if offset:
+            raise
+        return False
+    return True
+
+
+def _hashed_copy(source, target, digest):
+    buffer = bytearray(ASSEMBLY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        count = source.readinto(buffer)
+        if not count:
+            break
+        if digest is not None:
+            digest.update(view[:count])
+        target.write(view[:count])
+
+
+def assemble_chunks(session_dir, target_path, expected_checksum=None, progress_callback=None):
+    """
+    Gabungkan part_<index> ke target_path.
+    Tanpa checksum dipakai os.sendfile (tanpa menyalin data lewat Python); dengan checksum file
+    utuh, data disalin dengan buffer besar sambil dihitung SHA-256 dalam satu pass.
+    progress_callback(done, total) dipanggil per part.
+    """
+    parts = chunk_paths(session_dir)
+    if not parts:
+        raise ValueError("No file chunks found")
+
+    digest = hashlib.sha256() if expected_checksum else None
+    with open(target_path, 'wb') as target:
+        for done, part in enumerate(parts, start=1):
+            with open(part, 'rb') as source:
+                copied = digest is None and hasattr(os, 'sendfile') and _sendfile(source, target, os.path.getsize(part))
+                if not copied:
+                    _hashed_copy(source, target, digest)
+            if progress_callback:
+                progress_callback(done, len(parts))
+
+    if digest is not None and digest.hexdigest() != expected_checksum.strip().lower():
+        os.remove(target_path)
+        raise ChunkChecksumError('Checksum mismatch for assembled file')
+
+
+def upload_checksum(path):
+    """SHA-256 hex dari file upload (file biasa atau direktori sesi chunk), dibaca secara streaming"""
+    digest = hashlib.sha256()
+    with open_upload(path) as handle:
+        _hashed_copy(handle, _NullWriter(), digest)
+    return digest.hexdigest()
+
+
+class _NullWriter:
+    def write(self, data):
+        return len(data)
+
+
+def delete_session(session_dir):
+    """Hapus direktori sesi; untuk sesi dataset juga direktori <upload_id> beserta session.json-nya"""
+    parent = os.path.dirname(session_dir)
+    if os.path.exists(os.path.join(parent, SESSION_FILE)):
+        session_dir = parent
+    shutil.rmtree(session_dir, ignore_errors=True)
+
+
+class ChunkedFileReader(io.RawIOBase):
+    """Baca beberapa file part sebagai satu file (read/seek/tell) tanpa menggabungkannya ke disk"""
+
+    def __init__(self, paths):
+        super().__init__()
+        self._paths = list(paths)
+        self._sizes = [os.path.getsize(path) for path in self._paths]
+        self._offsets = []
+        offset = 0
+        for size in self._sizes:
+            self._offsets.append(offset)
+            offset += size
+        self._size = offset
+        self._position = 0
+        self._index = None
+        self._handle = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+        if position < 0:
+            raise ValueError('Negative seek position')
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        if self._position >= self._size:
+            return 0
+
+        index = bisect.bisect_right(self._offsets, self._position) - 1
+        if index != self._index:
+            if self._handle:
+                self._handle.close()
+            self._handle = open(self._paths[index], 'rb')
+            self._index = index
+
+        part_offset = self._position - self._offsets[index]
+        self._handle.seek(part_offset)
+        view = memoryview(buffer)[:self._sizes[index] - part_offset]
+        count = self._handle.readinto(view)
+        self._position += count
+        return count
+
+    def close(self):
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+        super().close()
+
+
+def open_upload(path):
+    """Buka file upload (file biasa atau direktori sesi chunk) sebagai file biner"""
+    if os.path.isdir(path):
+        return io.BufferedReader(ChunkedFileReader(chunk_paths(path)), buffer_size=COPY_BUFFER_SIZE)
+    return open(path, 'rb')
+
+
+def upload_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(part) for part in chunk_paths(path))
+    return os.path.getsize(path)
@@ -1,204 +1,429 @@
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait
+from sqlalchemy import insert, text
 from models.models import db, Dataset, RawData, RawDataScraper, CleanDataUpload, CleanDataScraper
-from utils.utils import clean_text, check_cleaned_content_duplicate_by_dataset
+from utils.utils import clean_text, compute_content_hash
+from services.near_duplicate_service import NearDuplicateIndex
 
-def process_cleaning(dataset_id, user_id):
+
+def _load_cleaned_content_keys(dataset_id):
     """
-    Process cleaning for a single dataset (synchronous)
+    Load content_hash of all cleaned content already stored for a dataset (2 index-backed queries).
+    Mirrors check_cleaned_content_duplicate_by_dataset, but once per dataset instead of per row.
     """
-    dataset = Dataset.query.get(dataset_id)
-    if not dataset:
-        raise ValueError("Dataset not found")
-        
-    processed_count = 0
-    
-    # Process Upload Data
-    raw_uploads = RawData.query.filter_by(dataset_id=dataset.id, status='raw').all()
-    for raw_data in raw_uploads:
-        try:
-            cleaned_content = clean_text(raw_data.content)
-            
-            # Check for duplicate cleaned content in the same dataset
-            if check_cleaned_content_duplicate_by_dataset(cleaned_content, dataset.id):
-                raw_data.status = 'ignored' # Mark as ignored/duplicate
-                continue
+    keys = set()
 
-            clean_data = CleanDataUpload(
-                raw_data_id=raw_data.id,
-                username=raw_data.username,
-                content=raw_data.content,
-                cleaned_content=cleaned_content,
-                url=raw_data.url,
-                platform=raw_data.platform,
-                dataset_id=raw_data.dataset_id,
-                cleaned_by=user_id
-            )
-            db.session.add(clean_data)
-            raw_data.status = 'cleaned'
-            processed_count += 1
-        except Exception as e:
-            print(f"Error cleaning upload {raw_data.id}: {str(e)}")
-            
-    # Process Scraper Data
-    raw_scrapers = RawDataScraper.query.filter_by(dataset_id=dataset.id, status='raw').all()
-    for raw_scraper in raw_scrapers:
-        try:
-            cleaned_content = clean_text(raw_scraper.content)
-            
-            # Check for duplicate cleaned content in the same dataset
-            if check_cleaned_content_duplicate_by_dataset(cleaned_content, dataset.id):
-                raw_scraper.status = 'ignored' # Mark as ignored/duplicate
-                continue
+    for model in (CleanDataUpload, CleanDataScraper):
+        rows = db.session.query(model.content_hash).filter(
+            model.dataset_id == dataset_id,
+            model.content_hash.isnot(None)
+        )
+        keys.update(content_hash for (content_hash,) in rows.yield_per(5000))
+
+    return keys
+
+
+# Datasets whose upload has not finished yet
+UNCLEANABLE_STATUSES = ('Processing', 'Pending Mapping')
+
+# Raw ids per set-based status UPDATE statement
+STATUS_UPDATE_CHUNK_SIZE = 10000
+# Clean rows per multi-row INSERT ... RETURNING id statement
+CLEAN_INSERT_BATCH_SIZE = 1000
+# Raw rows per cleaning batch (also the yield_per size); each batch is inserted and its statuses written before the next
+CLEAN_FLUSH_ROWS = 5000
+
+# (data_type, raw model, clean model)
+RAW_SOURCES = (
+    ('upload', RawData, CleanDataUpload),
+    ('scraper', RawDataScraper, CleanDataScraper),
+)
+
+
+def _clean_row(data_type, raw, cleaned_content, content_hash, user_id):
+    """Mapping for a clean row, built from a raw row tuple"""
+    row = {
+        'username': raw.username,
+        'content': raw.content,
+        'cleaned_content': cleaned_content,
+        'content_hash': content_hash,
+        'url': raw.url,
+        'platform': raw.platform,
+        'dataset_id': raw.dataset_id,
+        'cleaned_by': user_id
+    }
+    if data_type == 'upload':
+        row['raw_data_id'] = raw.id
+    else:
+        row['raw_data_scraper_id'] = raw.id
+        row['keyword'] = raw.keyword
+    return row
+
+
+def _bulk_update_status(raw_model, ids, status):
+    """Set-based status update: one UPDATE ... WHERE id = ANY(:ids) per chunk"""
+    table = raw_model.__table__.name
+    for start in range(0, len(ids), STATUS_UPDATE_CHUNK_SIZE):
+        db.session.execute(
+            text(f"UPDATE {table} SET status = :status, updated_at = CURRENT_TIMESTAMP WHERE id = ANY(:ids)"),
+            {'status': status, 'ids': ids[start:start + STATUS_UPDATE_CHUNK_SIZE]}
+        )
+
+
+def _clean_dataset(dataset, user_id, progress_callback=None):
+    """
+    Clean all raw rows of a dataset in batches of CLEAN_FLUSH_ROWS rows.
+
+    Duplicates (against stored clean data and rows cleaned earlier in this run) are
+    detected in memory and marked 'ignored'; survivors are bulk-inserted. When
+    NEAR_DUPLICATE_MODE is enabled, near-duplicates are then ignored or clustered.
+    Raw rows are read as plain tuples and their status is written back with chunked
+    set-based UPDATEs, so no per-row ORM objects are tracked. Each batch is written
+    before the next one is read; only the content keys seen so far are kept across batches.
+    Returns (cleaned_count, ignored_count, errors). Caller commits.
+    """
+    seen = _load_cleaned_content_keys(dataset.id)
+    near_duplicate_index = NearDuplicateIndex.from_app_config(dataset.id)
+    cleaned_count = 0
+    ignored_count = 0
+    errors = []
+
+    for data_type, raw_model, _ in RAW_SOURCES:
+        columns = [raw_model.id, raw_model.username, raw_model.content, raw_model.url,
+                   raw_model.platform, raw_model.dataset_id]
+        if data_type == 'scraper':
+            columns.append(raw_model.keyword)
+        raw_rows = db.session.query(*columns).filter(
+            raw_model.dataset_id == dataset.id,
+            raw_model.status == 'raw'
+        ).yield_per(CLEAN_FLUSH_ROWS)
+
+        # (data_type, raw id, clean row mapping) for rows of the current batch surviving exact dedupe
+        candidates = []
+        ignored_ids = []
+
+        for raw in raw_rows:
+            try:
+                cleaned_content = clean_text(raw.content)
+                key = compute_content_hash(cleaned_content)
+
+                if key is not None and key in seen:
+                    ignored_ids.append(raw.id) # Mark as ignored/duplicate
+                    ignored_count += 1
+                else:
+                    if key is not None:
+                        seen.add(key)
+                    candidates.append((data_type, raw.id, _clean_row(data_type, raw, cleaned_content, key, user_id)))
+                    cleaned_count += 1
+            except Exception as e:
+                errors.append(f"Error cleaning {data_type} {raw.id}: {str(e)}")
+
+            if len(candidates) + len(ignored_ids) >= CLEAN_FLUSH_ROWS:
+                near_duplicates = _flush_clean_batch(near_duplicate_index, raw_model, candidates, ignored_ids)
+                cleaned_count -= near_duplicates
+                ignored_count += near_duplicates
+                candidates, ignored_ids = [], []
+
+            if progress_callback:
+                progress_callback(cleaned_count, ignored_count)
+
+        near_duplicates = _flush_clean_batch(near_duplicate_index, raw_model, candidates, ignored_ids)
+        if near_duplicates:
+            cleaned_count -= near_duplicates
+            ignored_count += near_duplicates
+            if progress_callback:
+                progress_callback(cleaned_count, ignored_count)
 
-            clean_scraper_obj = CleanDataScraper(
-                raw_data_scraper_id=raw_scraper.id,
-                username=raw_scraper.username,
-                content=raw_scraper.content,
-                cleaned_content=cleaned_content,
-                url=raw_scraper.url,
-                platform=raw_scraper.platform,
-                keyword=raw_scraper.keyword,
-                dataset_id=raw_scraper.dataset_id,
-                cleaned_by=user_id
-            )
-            db.session.add(clean_scraper_obj)
-            raw_scraper.status = 'cleaned'
-            processed_count += 1
-        except Exception as e:
-            print(f"Error cleaning scraper {raw_scraper.id}: {str(e)}")
-            
     dataset.status = 'Cleaned'
-    
+
     # Update cleaned_records count based on actual database records
+    # This ensures accuracy even if process was restarted or duplicates were skipped
+    db.session.flush()
     clean_upload_count = CleanDataUpload.query.filter_by(dataset_id=dataset.id).count()
     clean_scraper_count = CleanDataScraper.query.filter_by(dataset_id=dataset.id).count()
     dataset.cleaned_records = clean_upload_count + clean_scraper_count
-    
+
+    return cleaned_count, ignored_count, errors
+
+
+def _flush_clean_batch(near_duplicate_index, raw_model, candidates, ignored_ids):
+    """
+    Write one batch: near-duplicate assignment and insert of the survivors, then the raw
+    status updates. Returns the number of survivors ignored as near-duplicates.
+    """
+    near_duplicates = []
+    if near_duplicate_index and candidates:
+        candidates, near_duplicates = _apply_near_duplicates(near_duplicate_index, candidates)
+        ignored_ids = ignored_ids + [raw_id for _, raw_id in near_duplicates]
+    else:
+        _insert_clean_rows(candidates)
+
+    _bulk_update_status(raw_model, [raw_id for _, raw_id, _ in candidates], 'cleaned')
+    _bulk_update_status(raw_model, ignored_ids, 'ignored')
+    return len(near_duplicates)
+
+
+def _insert_clean_rows(candidates, return_ids=False):
+    """
+    Bulk insert survivors (executemany instead of one INSERT per object).
+    With return_ids, rows are inserted as multi-row INSERT ... VALUES ... RETURNING id batches
+    and each row mapping gets its 'id'.
+    """
+    for data_type, _, clean_model in RAW_SOURCES:
+        rows = [row for candidate_type, _, row in candidates if candidate_type == data_type]
+        if not rows:
+            continue
+        if not return_ids:
+            db.session.bulk_insert_mappings(clean_model, rows)
+            continue
+        for start in range(0, len(rows), CLEAN_INSERT_BATCH_SIZE):
+            batch = rows[start:start + CLEAN_INSERT_BATCH_SIZE]
+            ids = db.session.execute(insert(clean_model).values(batch).returning(clean_model.id)).scalars().all()
+            for row, row_id in zip(batch, ids):
+                row['id'] = row_id
+
+
+def _apply_near_duplicates(index, candidates):
+    """
+    Run MinHash/LSH near-duplicate detection over the survivors of exact dedupe and insert them.
+
+    'ignore' mode drops near-duplicates (returned as (data_type, raw id) so the caller marks
+    them ignored); 'cluster' mode keeps them with near_duplicate_of pointing at the
+    representative. Only representatives are added to the LSH index.
+    Returns (kept candidates, ignored near-duplicates).
+    """
+    representatives, buckets = index.assign([row['cleaned_content'] for _, _, row in candidates])
+
+    kept = []
+    kept_positions = []
+    near_duplicates = []
+    for position, (candidate, representative) in enumerate(zip(candidates, representatives)):
+        if representative is not None and index.mode == 'ignore':
+            near_duplicates.append((candidate[0], candidate[1]))
+            continue
+        kept_positions.append(position)
+        kept.append(candidate)
+
+    # ids are needed to register buckets and resolve in-batch representatives
+    _insert_clean_rows(kept, return_ids=True)
+
+    def document_key(position):
+        data_type, _, row = candidates[position]
+        return f"{data_type}_{row['id']}"
+
+    index.register_rows(
+        (candidates[position][0], candidates[position][2]['id'], buckets[position])
+        for position in kept_positions
+        if representatives[position] is None and buckets[position]
+    )
+
+    if index.mode == 'cluster':
+        cluster_updates = {'upload': [], 'scraper': []}
+        for position in kept_positions:
+            representative = representatives[position]
+            if representative is None:
+                continue
+            data_type, _, row = candidates[position]
+            representative_key = representative if isinstance(representative, str) else document_key(representative)
+            cluster_updates[data_type].append({'id': row['id'], 'near_duplicate_of': representative_key})
+        for data_type, _, clean_model in RAW_SOURCES:
+            if cluster_updates[data_type]:
+                db.session.bulk_update_mappings(clean_model, cluster_updates[data_type])
+
+    return kept, near_duplicates
+
+
+def process_cleaning(dataset_id, user_id):
+    """
+    Process cleaning for a single dataset (synchronous)
+    """
+    dataset = Dataset.query.get(dataset_id)
+    if not dataset:
+        raise ValueError("Dataset not found")
+
+    processed_count, _, errors = _clean_dataset(dataset, user_id)
+    for error in errors:
+        print(error)
+
     db.session.commit()
-    
+
     return processed_count
 
+
+# Settings copied into worker processes (everything else stays in the parent app)
+WORKER_CONFIG_PREFIXES = ('SQLALCHEMY_', 'NEAR_DUPLICATE_')
+# Rows between progress messages sent from a worker to the coordinator
+WORKER_PROGRESS_INTERVAL = 500
+
+_worker_app = None
+
+
+def _init_cleaning_worker(worker_config):
+    """Process pool initializer: build a minimal app with its own engine/connection pool"""
+    global _worker_app
+    from flask import Flask
+    # Register columns/tables defined outside models.models, as app.py does
+    import models.models_content_hash  # noqa: F401
+    import models.models_near_duplicate  # noqa: F401
+    from utils.utils import load_text_processing_resources
+
+    _worker_app = Flask(__name__)
+    _worker_app.config.update(worker_config)
+    db.init_app(_worker_app)
+    load_text_processing_resources()
+
+
+def _clean_dataset_worker(dataset_id, user_id, progress_queue):
+    """Clean one dataset inside a worker process. Returns (dataset_id, cleaned, ignored, errors)."""
+    with _worker_app.app_context():
+        try:
+            dataset = db.session.get(Dataset, dataset_id)
+            if not dataset:
+                return dataset_id, 0, 0, [f"Dataset {dataset_id} not found"]
+
+            last_reported = [0]
+
+            def report(cleaned, ignored):
+                done = cleaned + ignored
+                if done - last_reported[0] >= WORKER_PROGRESS_INTERVAL:
+                    last_reported[0] = done
+                    progress_queue.put((dataset_id, cleaned, ignored))
+
+            cleaned, ignored, errors = _clean_dataset(dataset, user_id, report)
+            db.session.commit()
+            return dataset_id, cleaned, ignored, errors
+        except Exception as e:
+            db.session.rollback()
+            return dataset_id, 0, 0, [f"Error cleaning dataset {dataset_id}: {str(e)}"]
+        finally:
+            db.session.remove()
+
+
+def _run_parallel_cleaning(app, datasets, user_id, progress_dict, total_records):
+    """
+    Coordinator: fan datasets out to a capped process pool and aggregate worker
+    progress into the CLEANING_PROGRESS entry. Returns (processed_count, ignored_count).
+    """
+    max_workers = max(1, min(app.config.get('CLEANING_MAX_WORKERS', 2), len(datasets)))
+    worker_config = {
+        key: value for key, value in app.config.items()
+        if key.startswith(WORKER_CONFIG_PREFIXES)
+    }
+    # Each worker only needs a single connection
+    worker_config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+        worker_config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}, pool_size=1, max_overflow=0
+    )
+
+    # spawn: never fork a process holding the parent's engine, sessions and threads
+    context = multiprocessing.get_context('spawn')
+    counts = {dataset.id: (0, 0) for dataset in datasets}
+
+    def publish():
+        processed = sum(cleaned + ignored for cleaned, ignored in counts.values())
+        progress_dict['current'] = processed
+        progress_dict['ignored_count'] = sum(ignored for _, ignored in counts.values())
+        progress_dict['progress'] = min(int((processed / total_records) * 100), 100)
+
+    with context.Manager() as manager, ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context,
+        initializer=_init_cleaning_worker,
+        initargs=(worker_config,)
+    ) as executor:
+        progress_queue = manager.Queue()
+        pending = {
+            executor.submit(_clean_dataset_worker, dataset.id, user_id, progress_queue)
+            for dataset in datasets
+        }
+
+        while pending:
+            done, pending = wait(pending, timeout=0.5)
+
+            while True:
+                try:
+                    dataset_id, cleaned, ignored = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                counts[dataset_id] = (cleaned, ignored)
+
+            for future in done:
+                try:
+                    dataset_id, cleaned, ignored, errors = future.result()
+                    counts[dataset_id] = (cleaned, ignored)
+                    progress_dict['errors'].extend(errors)
+                except Exception as e:
+                    progress_dict['errors'].append(f"Cleaning worker failed: {str(e)}")
+
+            publish()
+
+    processed_count = sum(cleaned + ignored for cleaned, ignored in counts.values())
+    ignored_count = sum(ignored for _, ignored in counts.values())
+    return processed_count, ignored_count
+
+
 def process_bulk_cleaning(app, dataset_ids, task_id, user_id):
     with app.app_context():
         try:
             progress_dict = app.config['CLEANING_PROGRESS'][task_id]
-            
+
             total_records = 0
-            datasets = Dataset.query.filter(Dataset.id.in_(dataset_ids)).all()
-            
+            datasets = []
+            for dataset in Dataset.query.filter(Dataset.id.in_(dataset_ids)).all():
+                # Rows of these are still being inserted (or not yet mapped); cleaning now would be undone
+                if dataset.status in UNCLEANABLE_STATUSES:
+                    progress_dict['errors'].append(
+                        f"Dataset '{dataset.name}' skipped: upload is still being processed ({dataset.status})")
+                    continue
+                datasets.append(dataset)
+
             for dataset in datasets:
                 raw_upload_count = RawData.query.filter_by(dataset_id=dataset.id, status='raw').count()
                 raw_scraper_count = RawDataScraper.query.filter_by(dataset_id=dataset.id, status='raw').count()
                 total_records += (raw_upload_count + raw_scraper_count)
-            
+
             progress_dict['total'] = total_records
             progress_dict['status'] = 'processing'
-            
+
             if total_records == 0:
                 progress_dict['progress'] = 100
                 progress_dict['status'] = 'completed'
                 progress_dict['message'] = 'No raw data to clean'
                 return
 
+            if app.config.get('CLEANING_PARALLEL') and len(datasets) > 1:
+                processed_count, ignored_count = _run_parallel_cleaning(
+                    app, datasets, user_id, progress_dict, total_records
+                )
+                progress_dict['status'] = 'completed'
+                progress_dict['message'] = f'Successfully cleaned {processed_count - ignored_count} data. {ignored_count} data ignored as duplicates.'
+                return
+
             processed_count = 0
             ignored_count = 0
-            
+
             for dataset in datasets:
-                current_dataset_processed_start = processed_count
-                # Process Upload Data
-                raw_uploads = RawData.query.filter_by(dataset_id=dataset.id, status='raw').all()
-                for raw_data in raw_uploads:
-                    try:
-                        cleaned_content = clean_text(raw_data.content)
-                        
-                        # Check for duplicate cleaned content in the same dataset
-                        if check_cleaned_content_duplicate_by_dataset(cleaned_content, dataset.id):
-                             raw_data.status = 'ignored' # Mark as ignored/duplicate
-                             # We still count it as processed, but maybe not add to clean data?
-                             # Or we can skip adding to clean data
-                             processed_count += 1
-                             ignored_count += 1
-                             progress_dict['current'] = processed_count
-                             progress_dict['ignored_count'] = ignored_count
-                             progress_dict['progress'] = int((processed_count / total_records) * 100)
-                             continue
-
-                        clean_data = CleanDataUpload(
-                            raw_data_id=raw_data.id,
-                            username=raw_data.username,
-                            content=raw_data.content,
-                            cleaned_content=cleaned_content,
-                            url=raw_data.url,
-                            platform=raw_data.platform,
-                            dataset_id=raw_data.dataset_id,
-                            cleaned_by=user_id
-                        )
-                        db.session.add(clean_data)
-                        raw_data.status = 'cleaned'
-                        
-                        processed_count += 1
-                        progress_dict['current'] = processed_count
-                        progress_dict['progress'] = int((processed_count / total_records) * 100)
-                        
-                    except Exception as e:
-                        progress_dict['errors'].append(f"Error cleaning upload {raw_data.id}: {str(e)}")
-                
-                db.session.commit()
-                
-                # Process Scraper Data
-                raw_scrapers = RawDataScraper.query.filter_by(dataset_id=dataset.id, status='raw').all()
-                for raw_scraper in raw_scrapers:
-                    try:
-                        cleaned_content = clean_text(raw_scraper.content)
-                        
-                        # Check for duplicate cleaned content in the same dataset
-                        if check_cleaned_content_duplicate_by_dataset(cleaned_content, dataset.id):
-                             raw_scraper.status = 'ignored'
-                             processed_count += 1
-                             ignored_count += 1
-                             progress_dict['current'] = processed_count
-                             progress_dict['ignored_count'] = ignored_count
-                             progress_dict['progress'] = int((processed_count / total_records) * 100)
-                             continue
-
-                        clean_scraper_obj = CleanDataScraper(
-                            raw_data_scraper_id=raw_scraper.id,
-                            username=raw_scraper.username,
-                            content=raw_scraper.content,
-                            cleaned_content=cleaned_content,
-                            url=raw_scraper.url,
-                            platform=raw_scraper.platform,
-                            keyword=raw_scraper.keyword,
-                            dataset_id=raw_scraper.dataset_id,
-                            cleaned_by=user_id
-                        )
-                        db.session.add(clean_scraper_obj)
-                        raw_scraper.status = 'cleaned'
-                        
-                        processed_count += 1
-                        progress_dict['current'] = processed_count
-                        progress_dict['progress'] = int((processed_count / total_records) * 100)
-                        
-                    except Exception as e:
-                        progress_dict['errors'].append(f"Error cleaning scraper {raw_scraper.id}: {str(e)}")
-                
-                # Update status and counts
-                dataset.status = 'Cleaned'
-                
-                # Update cleaned_records count based on actual database records
-                # This ensures accuracy even if process was restarted or duplicates were skipped
-                clean_upload_count = CleanDataUpload.query.filter_by(dataset_id=dataset.id).count()
-                
-                # For scrapers, we need to join or filter carefully
-                # CleanDataScraper stores dataset_id directly as per model definition
-                clean_scraper_count = CleanDataScraper.query.filter_by(dataset_id=dataset.id).count()
-                
-                dataset.cleaned_records = clean_upload_count + clean_scraper_count
-                
+                base_processed = processed_count
+                base_ignored = ignored_count
+
+                def update_progress(cleaned, ignored):
+                    current = base_processed + cleaned + ignored
+                    progress_dict['current'] = current
+                    progress_dict['ignored_count'] = base_ignored + ignored
+                    progress_dict['progress'] = int((current / total_records) * 100)
+
+                cleaned, ignored, errors = _clean_dataset(dataset, user_id, update_progress)
+                progress_dict['errors'].extend(errors)
+
+                # Ignored rows still count as processed
+                processed_count += cleaned + ignored
+                ignored_count += ignored
+
                 db.session.commit()
-            
+
             progress_dict['status'] = 'completed'
             progress_dict['message'] = f'Successfully cleaned {processed_count - ignored_count} data. {ignored_count} data ignored as duplicates.'
-            
+
         except Exception as e:
             app.logger.error(f"Bulk cleaning error: {str(e)}")
             progress_dict['status'] = 'error'
@@ -0,0 +1,146 @@
+from sqlalchemy import func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.models import db
+from models.models_ensemble import ClassificationEnsemble
+
+# Rows per upsert statement; keeps statement size and bind parameters bounded on large datasets
+ENSEMBLE_UPSERT_BATCH_SIZE = 5000
+
+
+def consensus_label(radikal_votes, non_radikal_votes):
+    """Majority vote; ties resolve to Non-Radikal (same rule as the old GROUP BY stats)."""
+    return 'Radikal' if radikal_votes > non_radikal_votes else 'Non-Radikal'
+
+
+class EnsembleAccumulator:
+    """
+    Collects per-model predictions during a classification batch and flushes
+    them into classification_ensembles as batched upserts.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._votes = {}
+
+    def add(self, data_type, data_id, dataset_id, prediction, probability_radikal):
+        key = (data_type, data_id)
+        entry = self._votes.get(key)
+        if entry is None:
+            entry = {'dataset_id': dataset_id, 'radikal': 0, 'non_radikal': 0, 'prob_sum': 0.0}
+            self._votes[key] = entry
+
+        if prediction == 'Radikal':
+            entry['radikal'] += 1
+        else:
+            entry['non_radikal'] += 1
+        entry['prob_sum'] += float(probability_radikal or 0.0)
+
+    def flush(self):
+        """Upsert accumulated votes into the current session (caller commits)."""
+        if not self._votes:
+            return 0
+
+        rows = []
+        for (data_type, data_id), entry in self._votes.items():
+            total = entry['radikal'] + entry['non_radikal']
+            rows.append({
+                'data_type': data_type,
+                'data_id': data_id,
+                'dataset_id': entry['dataset_id'],
+                'radikal_votes': entry['radikal'],
+                'non_radikal_votes': entry['non_radikal'],
+                'mean_probability_radikal': entry['prob_sum'] / total if total else 0.0,
+                'final_label': consensus_label(entry['radikal'], entry['non_radikal']),
+                'classified_by': self.user_id
+            })
+
+        table = ClassificationEnsemble.__table__
+        stmt = pg_insert(table)
+        excluded = stmt.excluded
+
+        # Merge with votes already stored for the document (results accumulate
+        # in classification_results too unless reset-latest cleared them first)
+        radikal_votes = table.c.radikal_votes + excluded.radikal_votes
+        non_radikal_votes = table.c.non_radikal_votes + excluded.non_radikal_votes
+        total_votes = radikal_votes + non_radikal_votes
+        mean_probability = (
+            table.c.mean_probability_radikal * (table.c.radikal_votes + table.c.non_radikal_votes)
+            + excluded.mean_probability_radikal * (excluded.radikal_votes + excluded.non_radikal_votes)
+        ) / func.nullif(total_votes, 0)
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['data_type', 'data_id'],
+            set_={
+                'dataset_id': excluded.dataset_id,
+                'radikal_votes': radikal_votes,
+                'non_radikal_votes': non_radikal_votes,
+                'mean_probability_radikal': func.coalesce(mean_probability, 0.0),
+                'final_label': case((radikal_votes > non_radikal_votes, 'Radikal'), else_='Non-Radikal'),
+                'classified_by': excluded.classified_by,
+                'updated_at': func.now()
+            }
+        )
+        for start in range(0, len(rows), ENSEMBLE_UPSERT_BATCH_SIZE):
+            db.session.execute(stmt.values(rows[start:start + ENSEMBLE_UPSERT_BATCH_SIZE]))
+
+        flushed = len(rows)
+        self._votes = {}
+        return flushed
+
+
+def delete_ensembles(data_type, data_ids):
+    """Delete ensemble rows for the given documents (caller commits)."""
+    if not data_ids:
+        return 0
+    return ClassificationEnsemble.query.filter(
+        ClassificationEnsemble.data_type == data_type,
+        ClassificationEnsemble.data_id.in_(data_ids)
+    ).delete(synchronize_session=False)
+
+
+def delete_dataset_ensembles(dataset_ids):
+    """Delete ensemble rows for one or more datasets (caller commits)."""
+    if not isinstance(dataset_ids, (list, tuple, set)):
+        dataset_ids = [dataset_ids]
+    if not dataset_ids:
+        return 0
+    return ClassificationEnsemble.query.filter(
+        ClassificationEnsemble.dataset_id.in_(list(dataset_ids))
+    ).delete(synchronize_session=False)
+
+
+def get_ensemble_map(upload_ids=None, scraper_ids=None):
+    """Return {f"{data_type}_{data_id}": ClassificationEnsemble} for the given documents."""
+    upload_ids = list(upload_ids or [])
+    scraper_ids = list(scraper_ids or [])
+    if not upload_ids and not scraper_ids:
+        return {}
+
+    rows = ClassificationEnsemble.query.filter(
+        ((ClassificationEnsemble.data_type == 'upload') & (ClassificationEnsemble.data_id.in_(upload_ids))) |
+        ((ClassificationEnsemble.data_type == 'scraper') & (ClassificationEnsemble.data_id.in_(scraper_ids)))
+    ).all()
+    return {f"{row.data_type}_{row.data_id}": row for row in rows}
+
+
+def get_consensus_counts(dataset_id=None, user_id=None):
+    """Count documents per consensus label, optionally scoped to a dataset or classifier."""
+    query = db.session.query(
+        func.count(ClassificationEnsemble.id),
+        func.coalesce(func.sum(case((ClassificationEnsemble.final_label == 'Radikal', 1), else_=0)), 0),
+        func.coalesce(func.sum(ClassificationEnsemble.radikal_votes + ClassificationEnsemble.non_radikal_votes), 0)
+    )
+    if dataset_id is not None:
+        query = query.filter(ClassificationEnsemble.dataset_id == dataset_id)
+    if user_id is not None:
+        query = query.filter(ClassificationEnsemble.classified_by == user_id)
+
+    total_docs, total_radikal, total_votes = query.one()
+    total_docs = int(total_docs or 0)
+    total_radikal = int(total_radikal or 0)
+    return {
+        'total': total_docs,
+        'radikal': total_radikal,
+        'non_radikal': total_docs - total_radikal,
+        'total_votes': int(total_votes or 0)
+    }
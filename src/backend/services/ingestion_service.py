@@ -0,0 +1,827 @@
+"""
+Ingestion file upload (CSV/Excel) ke raw_data secara streaming.
+
+File dibaca per chunk (pyarrow streaming CSV reader bila tersedia, pd.read_csv(chunksize=...)
+atau openpyxl read-only), kolom diekstrak secara vectorized tanpa iterrows, lalu setiap chunk
+langsung dimasukkan dengan COPY (PostgreSQL) atau bulk insert. Memori tetap konstan berapa pun
+jumlah baris file. Encoding dan delimiter CSV di-sniff sekali dari beberapa KB pertama dan
+disimpan di Dataset.meta_info['csv_dialect'].
+
+Upload yang menunggu column mapping dikonversi sekali ke file Parquet staging di samping file
+asli (semua kolom sebagai string). Preview header dan ingestion setelah mapping hanya membaca
+kolom yang dibutuhkan dari file Parquet tersebut, bukan mem-parse ulang CSV/Excel. File staging
+dihapus setelah ingestion berhasil dan saat dataset dihapus/di-reset (remove_staging). File asli
+(atau folder sesi chunk upload) juga dihapus setelah ingestion berhasil dan saat dataset dihapus
+(remove_upload_file), karena isinya sudah ada di raw_data.
+
+Upload diproses sebagai job background: request hanya menyimpan file dan membuat dataset
+berstatus 'Processing'; progress job disimpan di app.config['UPLOAD_PROGRESS'][job_id] dan dihapus
+UPLOAD_PROGRESS_TTL detik setelah job selesai. Proses pemilik job dicatat di
+Dataset.meta_info['upload_job'], sehingga upload yang tertinggal 'Processing' karena proses tersebut
+mati/restart ditandai 'Failed' (fail_orphaned_uploads saat startup, is_orphaned_upload saat polling).
+"""
+import csv
+import io
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+import zipfile
+
+import chardet
+import pandas as pd
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from models.models import db, Dataset, RawData
+from utils.utils import compute_content_hash, generate_activity_log
+from services.chunk_upload_service import open_upload, upload_size, delete_session
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pa_csv
+except ImportError:  # optional: pandas C parser is used and no Parquet staging file is written
+    pa = pq = pa_csv = None
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # optional: openpyxl read-only streaming is used instead
+    CalamineWorkbook = None
+
+DEFAULT_CHUNK_ROWS = 10000
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_BLOCK_SIZE = 4 * 1024 * 1024  # bytes per pyarrow record batch
+CSV_DELIMITERS = ',;\t|'
+DEFAULT_PROGRESS_TTL = 3600  # seconds a finished upload job stays in UPLOAD_PROGRESS
+FINISHED_JOB_STATUSES = ('completed', 'error')
+
+# Excel memory budget (UPLOAD_MEMORY_BUDGET_MB): sheets are streamed in chunks sized to a share
+# of the budget, and workbooks that cannot be read within it are rejected with a clear error
+DEFAULT_MEMORY_BUDGET_MB = 512
+CHUNK_BUDGET_SHARE = 0.25
+DATAFRAME_OVERHEAD = 3  # row tuples + DataFrame copy + extracted columns
+ROW_SIZE_SAMPLE = 200
+XLS_MEMORY_FACTOR = 10  # xlrd object model vs. file size
+
+CONTENT_COLUMNS = ['content', 'text', 'tweet', 'comment', 'komentar', 'isi', 'text_original']
+USERNAME_COLUMNS = ['username', 'user', 'author', 'pengguna', 'screen_name']
+PLATFORM_COLUMNS = ['platform', 'source', 'sumber']
+URL_COLUMNS = ['url']
+
+
+def normalize_columns(columns):
+    """Lowercase/strip nama kolom; nama ganda diberi akhiran .1, .2 (seperti pandas)"""
+    seen = {}
+    result = []
+    for column in columns:
+        name = str(column).lower().strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        result.append(name)
+    return result
+
+
+def detect_columns(columns):
+    """Cari kolom content/username/platform/url berdasarkan nama kolom yang umum"""
+    def find(candidates):
+        return next((c for c in columns if c in candidates), None)
+
+    return {
+        'content': find(CONTENT_COLUMNS),
+        'username': find(USERNAME_COLUMNS),
+        'platform': find(PLATFORM_COLUMNS),
+        'url': find(URL_COLUMNS),
+    }
+
+
+def _chunk_rows():
+    try:
+        return current_app.config.get('UPLOAD_CHUNK_ROWS', DEFAULT_CHUNK_ROWS)
+    except RuntimeError:
+        return DEFAULT_CHUNK_ROWS
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def _read_sample(source, size):
+    if isinstance(source, (str, os.PathLike)):
+        with open_upload(source) as handle:
+            return handle.read(size)
+    sample = source.read(size)
+    _rewind(source)
+    return sample
+
+
+def sniff_csv_dialect(source):
+    """
+    Deteksi encoding (chardet) dan delimiter (csv.Sniffer) dari beberapa KB pertama file.
+    Returns dict {'encoding', 'delimiter', 'quotechar'} yang bisa disimpan di Dataset.meta_info.
+    """
+    sample = _read_sample(source, CSV_SNIFF_BYTES)
+
+    encoding = (chardet.detect(sample).get('encoding') or 'utf-8').lower()
+    if encoding == 'ascii':
+        encoding = 'utf-8'
+
+    text = sample.decode(encoding, errors='ignore')
+    if len(sample) == CSV_SNIFF_BYTES and '\n' in text:
+        text = text[:text.rindex('\n')]  # drop the partial last line
+
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS)
+        delimiter, quotechar = dialect.delimiter, dialect.quotechar or '"'
+    except csv.Error:
+        delimiter, quotechar = ',', '"'
+
+    return {'encoding': encoding, 'delimiter': delimiter, 'quotechar': quotechar}
+
+
+def _iter_csv_chunks_pyarrow(source, dialect):
+    def open_reader(column_types=None):
+        _rewind(source)
+        return pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(encoding=dialect['encoding'], block_size=CSV_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(
+                delimiter=dialect['delimiter'],
+                quote_char=dialect['quotechar'],
+                newlines_in_values=True
+            ),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+        )
+
+    reader = open_reader()
+    # Keep every column as text (like dtype=str), e.g. so IDs are not turned into floats
+    if any(field.type != pa.string() for field in reader.schema):
+        reader = open_reader({name: pa.string() for name in reader.schema.names})
+
+    yielded = False
+    for batch in reader:
+        yielded = True
+        yield batch.to_pandas()
+    if not yielded:
+        yield pd.DataFrame(columns=reader.schema.names)
+
+
+def _iter_csv_chunks(source, chunksize, dialect=None):
+    dialect = dialect or sniff_csv_dialect(source)
+    if pa_csv is not None:
+        yield from _iter_csv_chunks_pyarrow(source, dialect)
+        return
+
+    yield from pd.read_csv(
+        source,
+        chunksize=chunksize,
+        dtype=str,
+        sep=dialect['delimiter'],
+        quotechar=dialect['quotechar'],
+        encoding=dialect['encoding']
+    )
+
+
+def _memory_budget():
+    try:
+        megabytes = current_app.config.get('UPLOAD_MEMORY_BUDGET_MB', DEFAULT_MEMORY_BUDGET_MB)
+    except RuntimeError:
+        megabytes = DEFAULT_MEMORY_BUDGET_MB
+    return megabytes * 1024 * 1024
+
+
+def _source_size(source):
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    _rewind(source)
+    return size
+
+
+def _xlsx_part_sizes(source):
+    """Ukuran (uncompressed) sheet terbesar dan sharedStrings.xml di dalam file XLSX"""
+    with zipfile.ZipFile(source) as archive:
+        sizes = {info.filename: info.file_size for info in archive.infolist()}
+    _rewind(source)
+    sheet = max((size for name, size in sizes.items() if name.startswith('xl/worksheets/')), default=0)
+    return sheet, sizes.get('xl/sharedStrings.xml', 0)
+
+
+def _rows_to_chunks(rows, chunksize, budget):
+    """
+    Kelompokkan baris (baris pertama = header) menjadi DataFrame per chunk.
+    Jumlah baris per chunk diperkecil jika estimasi ukuran chunk melebihi porsi memory budget.
+    """
+    header = next(rows, None)
+    if header is None:
+        return
+    header = list(header)
+    width = len(header)
+    limit = chunksize
+    estimated = False
+    batch = []
+    yielded = False
+    for row in rows:
+        row = tuple(None if value == '' else value for value in row[:width]) + (None,) * (width - len(row))
+        if all(value is None for value in row):
+            continue
+        batch.append(row)
+        if not estimated and len(batch) == ROW_SIZE_SAMPLE:
+            estimated = True
+            row_bytes = sum(sys.getsizeof(value) for sample in batch for value in sample) / len(batch)
+            fitting = int(budget * CHUNK_BUDGET_SHARE / (row_bytes * DATAFRAME_OVERHEAD))
+            limit = max(ROW_SIZE_SAMPLE, min(chunksize, fitting))
+        if len(batch) >= limit:
+            yield pd.DataFrame(batch, columns=header)
+            batch = []
+            yielded = True
+    if batch or not yielded:
+        yield pd.DataFrame(batch, columns=header)
+
+
+def _iter_calamine_chunks(source, chunksize, budget):
+    workbook = CalamineWorkbook.from_filelike(getattr(source, 'stream', source))
+    yield from _rows_to_chunks(iter(workbook.get_sheet_by_index(0).iter_rows()), chunksize, budget)
+
+
+def _iter_xlsx_chunks(source, chunksize):
+    budget = _memory_budget()
+    sheet_size, shared_strings_size = _xlsx_part_sizes(getattr(source, 'stream', source))
+
+    # calamine is much faster but holds the decoded sheet in memory: only use it when that fits
+    if CalamineWorkbook is not None and sheet_size + shared_strings_size <= budget:
+        yield from _iter_calamine_chunks(source, chunksize, budget)
+        return
+
+    # openpyxl read-only streams the sheet XML, but always loads the shared strings table
+    if shared_strings_size > budget:
+        raise ValueError(
+            f'Excel file needs about {shared_strings_size // (1024 * 1024)} MB for its text table, '
+            f'more than the upload memory budget ({budget // (1024 * 1024)} MB). Please upload it as CSV.'
+        )
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(getattr(source, 'stream', source), read_only=True, data_only=True)
+    try:
+        yield from _rows_to_chunks(workbook.active.iter_rows(values_only=True), chunksize, budget)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_chunks(source, chunksize):
+    budget = _memory_budget()
+    if CalamineWorkbook is not None:
+        yield from _iter_calamine_chunks(source, chunksize, budget)
+        return
+
+    # Legacy .xls tidak didukung openpyxl; xlrd membaca seluruh workbook ke memori
+    if _source_size(source) * XLS_MEMORY_FACTOR > budget:
+        raise ValueError(
+            f'.xls file is too large for the upload memory budget ({budget // (1024 * 1024)} MB). '
+            'Please save it as .xlsx or CSV.'
+        )
+    df = pd.read_excel(source, dtype=str)
+    for start in range(0, max(len(df), 1), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def iter_file_chunks(source, filename, chunksize=None, dialect=None):
+    """
+    Baca file upload (path, direktori sesi chunk, atau file-like) sebagai DataFrame per chunk
+    dengan kolom ternormalisasi. Chunk pertama selalu ada (bisa kosong) sehingga header dapat
+    dibaca tanpa memuat seluruh file.
+    dialect: hasil sniff_csv_dialect untuk CSV; di-sniff ulang jika tidak diberikan.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open_upload(source) as handle:
+            yield from iter_file_chunks(handle, filename, chunksize, dialect)
+        return
+
+    chunksize = chunksize or _chunk_rows()
+    name = filename.lower()
+    if name.endswith('.csv'):
+        chunks = _iter_csv_chunks(source, chunksize, dialect)
+    elif name.endswith('.xlsx'):
+        chunks = _iter_xlsx_chunks(source, chunksize)
+    else:
+        chunks = _iter_xls_chunks(source, chunksize)
+
+    for chunk in chunks:
+        chunk.columns = normalize_columns(chunk.columns)
+        yield chunk
+
+
+def _text_column(chunk, column, mask, default):
+    if not column or column not in chunk.columns:
+        return default
+    values = chunk.loc[mask, column]
+    return values.astype(str).where(values.notna(), default)
+
+
+def build_raw_data_frame(chunk, columns, **constants):
+    """
+    Ekstraksi vectorized satu chunk menjadi kolom-kolom raw_data.
+
+    columns: dict dengan key content/username/platform/url (nama kolom file atau None).
+    constants: nilai tetap per baris (dataset_id, uploaded_by, original_filename, ...).
+    Baris dengan content kosong dilewati.
+    """
+    content = chunk[columns['content']]
+    text = content.astype(str)
+    mask = content.notna() & text.str.strip().ne('')
+
+    frame = pd.DataFrame({'content': text[mask]})
+    frame['username'] = _text_column(chunk, columns.get('username'), mask, 'anonymous')
+    frame['url'] = _text_column(chunk, columns.get('url'), mask, None)
+    platform = _text_column(chunk, columns.get('platform'), mask, 'unknown')
+    frame['platform'] = platform.str.lower() if isinstance(platform, pd.Series) else platform
+    frame['content_hash'] = frame['content'].map(compute_content_hash)
+    frame['source_type'] = 'upload'
+    frame['status'] = 'raw'
+    for key, value in constants.items():
+        frame[key] = value
+    return frame.reset_index(drop=True)
+
+
+def _python_defaults(table, provided):
+    """Nilai default Python (mis. created_at) untuk kolom yang tidak ikut di COPY"""
+    values = {}
+    for column in table.columns:
+        default = column.default
+        if column.name in provided or column.primary_key or default is None:
+            continue
+        if default.is_scalar:
+            values[column.name] = default.arg
+        elif default.is_callable:
+            try:
+                values[column.name] = default.arg(None)
+            except Exception:
+                continue  # default yang butuh context insert
+    return values
+
+
+def _copy_frame(connection, table, frame):
+    frame = frame.assign(**_python_defaults(table, set(frame.columns)))
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def insert_raw_frame(frame, model=RawData):
+    """
+    Insert satu chunk ke tabel model (default raw_data): COPY di PostgreSQL, bulk_insert_mappings
+    di database lain. Caller commits.
+    """
+    if frame.empty:
+        return 0
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        _copy_frame(connection, model.__table__, frame)
+    else:
+        records = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+        db.session.bulk_insert_mappings(model, records)
+    return len(frame)
+
+
+def ingest_chunks(chunks, dataset, user_id, columns, file_size=None, original_filename=None, progress_callback=None):
+    """
+    Masukkan chunk DataFrame ke raw_data untuk sebuah dataset.
+
+    progress_callback(rows_read, rows_inserted) dipanggil setelah setiap chunk.
+    Returns jumlah baris yang dimasukkan. Caller commits.
+    """
+    rows_read = 0
+    inserted = 0
+    for chunk in chunks:
+        frame = build_raw_data_frame(
+            chunk,
+            columns,
+            file_size=file_size,
+            original_filename=original_filename,
+            dataset_id=dataset.id,
+            dataset_name=dataset.name,
+            uploaded_by=user_id
+        )
+        inserted += insert_raw_frame(frame)
+        rows_read += len(chunk)
+        if progress_callback:
+            progress_callback(rows_read, inserted)
+    return inserted
+
+
+def staging_path(file_path):
+    return os.path.splitext(file_path)[0] + '.parquet'
+
+
+def has_staging(file_path):
+    return pq is not None and bool(file_path) and os.path.exists(staging_path(file_path))
+
+
+def remove_staging(file_path):
+    """Hapus file Parquet staging milik file upload (jika ada). Returns True jika dihapus."""
+    if not file_path:
+        return False
+    try:
+        os.remove(staging_path(file_path))
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        current_app.logger.warning(f"Could not remove staging file for {file_path}: {e}")
+        return False
+
+
+def remove_upload_file(file_path):
+    """
+    Hapus file upload milik dataset beserta file Parquet staging-nya. Folder sesi chunk upload
+    (dipakai langsung sebagai file_path) dihapus seluruhnya. Hanya path di dalam UPLOAD_FOLDER
+    yang dihapus. Returns True jika file upload dihapus.
+    """
+    if not file_path:
+        return False
+    remove_staging(file_path)
+
+    upload_folder = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(file_path)
+    if os.path.commonpath([upload_folder, path]) != upload_folder or path == upload_folder:
+        current_app.logger.warning(f"Not removing upload outside UPLOAD_FOLDER: {file_path}")
+        return False
+    try:
+        if os.path.isdir(path):
+            delete_session(path)
+        else:
+            os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        current_app.logger.warning(f"Could not remove uploaded file {file_path}: {e}")
+        return False
+
+
+class ParquetStager:
+    """
+    Tulis chunk DataFrame ke file Parquet staging secara inkremental.
+    Ditulis ke file .tmp unik lalu di-rename, sehingga file staging yang ada selalu lengkap.
+    """
+
+    def __init__(self, file_path):
+        self.path = staging_path(file_path)
+        self.tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self.schema = None
+        self.writer = None
+
+    def write(self, chunk):
+        if self.writer is None:
+            self.schema = pa.schema([(name, pa.string()) for name in chunk.columns])
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        text = chunk.apply(lambda column: column.astype(str).where(column.notna(), None))
+        self.writer.write_table(pa.Table.from_pandas(text, schema=self.schema, preserve_index=False))
+
+    def tee(self, chunks):
+        """Teruskan chunks sambil menulis setiap chunk ke staging"""
+        for chunk in chunks:
+            self.write(chunk)
+            yield chunk
+
+    def close(self, keep=None):
+        """Pasang file staging; jika keep() False (mis. dataset sudah dihapus) file .tmp dibuang"""
+        if self.writer is None:
+            return
+        self.writer.close()
+        if keep is not None and not keep():
+            os.remove(self.tmp_path)
+            return
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def stage_file(file_path, dialect=None, keep=None):
+    """
+    Konversi file upload ke Parquet staging (satu kali baca). keep() dicek sebelum file staging
+    dipasang. Returns path staging atau None.
+    """
+    if pq is None:
+        return None
+    stager = ParquetStager(file_path)
+    try:
+        for _ in stager.tee(iter_file_chunks(file_path, file_path, dialect=dialect)):
+            pass
+    except Exception:
+        stager.abort()
+        raise
+    stager.close(keep)
+    return stager.path if os.path.exists(stager.path) else None
+
+
+def iter_staged_chunks(file_path, columns=None, chunksize=None):
+    """Baca chunk dari Parquet staging, hanya kolom yang diminta"""
+    parquet = pq.ParquetFile(staging_path(file_path))
+    yielded = False
+    for batch in parquet.iter_batches(batch_size=chunksize or _chunk_rows(), columns=columns):
+        yielded = True
+        yield batch.to_pandas()
+    if not yielded:
+        yield pd.DataFrame(columns=columns or parquet.schema_arrow.names)
+
+
+def read_dataset_header(dataset, sample_rows=5):
+    """Header + sample baris dataset: dari Parquet staging jika ada, selain itu dari file asli"""
+    if has_staging(dataset.file_path):
+        chunks = iter_staged_chunks(dataset.file_path, chunksize=sample_rows)
+        try:
+            return next(chunks).head(sample_rows)
+        finally:
+            chunks.close()
+    return read_file_header(dataset.file_path, dataset.file_path, sample_rows, dialect=get_csv_dialect(dataset))
+
+
+def start_staging_job(app, dataset_id):
+    """Konversi file dataset (mis. yang menunggu column mapping) ke Parquet di background"""
+    def still_pending(file_path):
+        # Deleted, or mapped and ingested from the original file, while the file was converted
+        return Dataset.query.filter_by(id=dataset_id, status='Pending Mapping', file_path=file_path).count() > 0
+
+    def run():
+        with app.app_context():
+            try:
+                dataset = Dataset.query.get(dataset_id)
+                if dataset and dataset.file_path and not has_staging(dataset.file_path):
+                    file_path = dataset.file_path
+                    keep = lambda: still_pending(file_path)
+                    # Checked again after the rename: a delete may have run in between
+                    if stage_file(file_path, dialect=get_csv_dialect(dataset), keep=keep) and not keep():
+                        remove_staging(file_path)
+            except Exception as e:
+                app.logger.error(f"Staging dataset {dataset_id} error: {str(e)}")
+            finally:
+                db.session.remove()
+
+    if pq is None:
+        return
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+
+def save_upload_file(file, upload_folder):
+    """Simpan file upload ke UPLOAD_FOLDER/temp dengan nama unik; returns path file"""
+    temp_dir = os.path.join(upload_folder, 'temp')
+    os.makedirs(temp_dir, exist_ok=True)
+    file_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+    file.seek(0)
+    file.save(file_path)
+    return file_path
+
+
+def read_file_header(source, filename, sample_rows=5, dialect=None):
+    """Baca header dan beberapa baris pertama saja (kolom ternormalisasi)"""
+    chunks = iter_file_chunks(source, filename, chunksize=sample_rows, dialect=dialect)
+    try:
+        return next(chunks).head(sample_rows)
+    finally:
+        chunks.close()
+
+
+def detect_file_dialect(file_path):
+    """Dialect CSV untuk file yang baru disimpan; None untuk file Excel"""
+    if not file_path.lower().endswith('.csv'):
+        return None
+    return sniff_csv_dialect(file_path)
+
+
+def get_csv_dialect(dataset):
+    """
+    Dialect CSV tersimpan di dataset.meta_info; di-sniff sekali dan disimpan jika belum ada
+    (caller commits). None untuk file Excel.
+    """
+    if not dataset.file_path:
+        return None
+    dialect = (dataset.meta_info or {}).get('csv_dialect')
+    if not dialect:
+        dialect = detect_file_dialect(dataset.file_path)
+        if dialect:
+            dataset.meta_info = dict(dataset.meta_info or {}, csv_dialect=dialect)
+    return dialect
+
+
+def _prune_upload_progress(app):
+    """Hapus progress job yang sudah selesai lebih dari UPLOAD_PROGRESS_TTL detik"""
+    store = app.config.setdefault('UPLOAD_PROGRESS', {})
+    ttl = app.config.get('UPLOAD_PROGRESS_TTL', DEFAULT_PROGRESS_TTL)
+    now = time.time()
+    for job_id, progress in list(store.items()):
+        finished_at = progress.get('finished_at')
+        if finished_at is not None and now - finished_at > ttl:
+            store.pop(job_id, None)
+    return store
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        return True  # os.kill would terminate the process on Windows; assume it is still running
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return True
+    return True
+
+
+def is_orphaned_upload(app, dataset):
+    """
+    True jika dataset masih 'Processing' tetapi job upload-nya sudah tidak berjalan: proses pemiliknya
+    di host ini sudah mati, atau proses ini pemiliknya dan job-nya tidak ada/sudah selesai.
+    Job di host lain tidak dapat diperiksa dan dianggap masih berjalan.
+    """
+    job = (dataset.meta_info or {}).get('upload_job')
+    if dataset.status != 'Processing' or not job:
+        return False
+    if job.get('host') != socket.gethostname():
+        return False
+    if job.get('pid') == os.getpid():
+        progress = get_upload_progress(app, job.get('job_id'))
+        return progress is None or progress.get('status') in FINISHED_JOB_STATUSES
+    return not _pid_alive(job.get('pid'))
+
+
+def fail_orphaned_uploads(app):
+    """Tandai upload 'Processing' yang job-nya hilang (mis. setelah restart) sebagai 'Failed'. Returns jumlahnya."""
+    with app.app_context():
+        try:
+            failed = 0
+            for dataset in Dataset.query.filter_by(status='Processing').all():
+                if is_orphaned_upload(app, dataset):
+                    dataset.status = 'Failed'
+                    failed += 1
+            if failed:
+                db.session.commit()
+                app.logger.warning(f"Marked {failed} interrupted upload(s) as Failed")
+            return failed
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Checking interrupted uploads failed: {str(e)}")
+            return 0
+        finally:
+            db.session.remove()
+
+
+def start_upload_job(app, dataset, columns, user_id, original_filename, source_label='upload'):
+    """Jalankan ingestion dataset.file_path di thread background; returns job_id"""
+    job_id = str(uuid.uuid4())
+    # Owner of the job, so an upload interrupted by a restart can be recognised later
+    dataset.meta_info = dict(dataset.meta_info or {}, upload_job={
+        'job_id': job_id, 'host': socket.gethostname(), 'pid': os.getpid()
+    })
+    db.session.commit()
+
+    _prune_upload_progress(app)[job_id] = {
+        'status': 'starting',
+        'progress': 0,
+        'current': 0,
+        'rows_read': 0,
+        'dataset_id': dataset.id,
+        'user_id': user_id,
+        'message': 'Starting upload processing...',
+        'errors': []
+    }
+
+    thread = threading.Thread(
+        target=process_upload_job,
+        args=(app, job_id, dataset.id, columns, user_id, original_filename, source_label)
+    )
+    thread.daemon = True
+    thread.start()
+    return job_id
+
+
+def get_upload_progress(app, job_id):
+    return app.config.get('UPLOAD_PROGRESS', {}).get(job_id)
+
+
+def find_upload_job(app, dataset_id):
+    """(job_id, progress) terakhir untuk sebuah dataset, atau (None, None)"""
+    for job_id, progress in reversed(list(_prune_upload_progress(app).items())):
+        if progress.get('dataset_id') == dataset_id:
+            return job_id, progress
+    return None, None
+
+
+def process_upload_job(app, job_id, dataset_id, columns, user_id, original_filename, source_label='upload'):
+    """
+    Background job: stream file dataset ke raw_data dalam satu transaksi.
+    Status dataset menjadi 'Raw' jika berhasil atau 'Failed' jika gagal (data parsial di-rollback).
+    """
+    with app.app_context():
+        progress = app.config['UPLOAD_PROGRESS'][job_id]
+        try:
+            dataset = Dataset.query.get(dataset_id)
+            if not dataset or not dataset.file_path or not os.path.exists(dataset.file_path):
+                raise FileNotFoundError('Uploaded file not found')
+
+            file_size = upload_size(dataset.file_path)
+            progress['status'] = 'processing'
+            progress['message'] = 'Processing uploaded file...'
+
+            if has_staging(dataset.file_path):
+                # Already converted (e.g. while waiting for column mapping): read only mapped columns
+                parquet = pq.ParquetFile(staging_path(dataset.file_path))
+                total_rows = parquet.metadata.num_rows
+                available = set(parquet.schema_arrow.names)
+                needed = [column for column in dict.fromkeys(columns.values()) if column in available]
+
+                def update_progress(rows_read, inserted):
+                    progress['rows_read'] = rows_read
+                    progress['current'] = inserted
+                    if total_rows:
+                        progress['progress'] = min(int(rows_read * 100 / total_rows), 99)
+
+                count = ingest_chunks(
+                    iter_staged_chunks(dataset.file_path, columns=needed),
+                    dataset,
+                    user_id,
+                    columns,
+                    file_size=file_size,
+                    original_filename=original_filename,
+                    progress_callback=update_progress
+                )
+            else:
+                dialect = get_csv_dialect(dataset)
+                with open_upload(dataset.file_path) as handle:
+                    def update_progress(rows_read, inserted):
+                        progress['rows_read'] = rows_read
+                        progress['current'] = inserted
+                        if file_size:
+                            # Byte position of the reader is the best estimate while the row count is unknown
+                            position = int(handle.tell() * 100 / file_size)
+                            progress['progress'] = max(progress['progress'], min(position, 99))
+
+                    count = ingest_chunks(
+                        iter_file_chunks(handle, dataset.file_path, dialect=dialect),
+                        dataset,
+                        user_id,
+                        columns,
+                        file_size=file_size,
+                        original_filename=original_filename,
+                        progress_callback=update_progress
+                    )
+
+            dataset.total_records = count
+            dataset.status = 'Raw'
+            dataset.meta_info = {key: value for key, value in (dataset.meta_info or {}).items() if key != 'upload_job'}
+            db.session.commit()
+            # Rows are in raw_data now; neither the uploaded file nor its staging copy is read again
+            if remove_upload_file(dataset.file_path):
+                dataset.file_path = None
+                db.session.commit()
+
+            suffix = ' via mapping' if source_label == 'mapping' else ''
+            generate_activity_log(
+                action='upload',
+                description=f'Uploaded dataset: {dataset.name} ({count} records){suffix}',
+                user_id=user_id,
+                icon='fa-upload',
+                color='primary'
+            )
+
+            progress['current'] = count
+            progress['progress'] = 100
+            progress['status'] = 'completed'
+            progress['message'] = f'Dataset uploaded successfully. {count} data added.'
+            progress['finished_at'] = time.time()
+
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Upload job {job_id} error: {str(e)}")
+            try:
+                Dataset.query.filter_by(id=dataset_id).update({'status': 'Failed'}, synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+            progress['status'] = 'error'
+            progress['message'] = str(e)
+            progress['errors'].append(str(e))
+            progress['finished_at'] = time.time()
+        finally:
+            db.session.remove()
@@ -0,0 +1,236 @@
+"""
+Deteksi near-duplicate (retweet, quote-tweet, copy-paste) dengan MinHash + LSH.
+
+Signature MinHash dihitung dengan numpy dari shingle karakter konten yang sudah dibersihkan,
+lalu dipecah menjadi band LSH. Bucket setiap dokumen representatif disimpan di tabel
+near_duplicate_buckets sehingga index terbentuk secara inkremental per dataset dan pencarian
+kandidat hanya berupa lookup index (dataset_id, bucket), tetap cepat untuk jutaan dokumen.
+Kandidat dari bucket yang sama diverifikasi dengan perkiraan Jaccard signature MinHash terhadap
+threshold sebelum dianggap near-duplicate.
+"""
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+from flask import current_app
+
+from models.models import db, CleanDataUpload, CleanDataScraper
+from models.models_near_duplicate import NearDuplicateBucket
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHINGLE_BASE = np.uint64(1000003)
+_WHITESPACE_RE = re.compile(r'\s+')
+_LOOKUP_CHUNK_SIZE = 1000
+
+NEAR_DUPLICATE_MODES = ('off', 'ignore', 'cluster')
+CLEAN_MODELS = {'upload': CleanDataUpload, 'scraper': CleanDataScraper}
+
+
+def _integrate(func, start, end, steps=200):
+    xs = np.linspace(start, end, steps)
+    ys = func(xs)
+    return float(np.sum((ys[1:] + ys[:-1]) * np.diff(xs)) / 2)
+
+
+@lru_cache(maxsize=32)
+def optimal_lsh_params(threshold, num_perm, false_positive_weight=0.5, false_negative_weight=0.5):
+    """Pilih (bands, rows) yang meminimalkan bobot false positive/negative untuk threshold Jaccard"""
+    best, best_error = (1, num_perm), float('inf')
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            fp = _integrate(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+            fn = _integrate(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+            error = fp * false_positive_weight + fn * false_negative_weight
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+@lru_cache(maxsize=8)
+def _permutations(num_perm, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def shingle_hashes(text, shingle_size):
+    """Hash 32-bit unik dari shingle karakter (rolling hash numpy, tanpa loop per shingle)"""
+    normalized = _WHITESPACE_RE.sub(' ', (text or '').strip().lower())
+    if not normalized:
+        return np.empty(0, dtype=np.uint64)
+
+    codes = np.frombuffer(normalized.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+    size = min(shingle_size, len(codes))
+    count = len(codes) - size + 1
+
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * _SHINGLE_BASE + codes[offset:offset + count]
+    hashes = (hashes ^ (hashes >> np.uint64(32))) & _MAX_HASH
+    return np.unique(hashes)
+
+
+def minhash_signature(text, num_perm, shingle_size):
+    """Signature MinHash (uint64[num_perm]); None untuk konten kosong"""
+    hashes = shingle_hashes(text, shingle_size)
+    if hashes.size == 0:
+        return None
+    a, b = _permutations(num_perm)
+    permuted = (np.outer(a, hashes) + b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1)
+
+
+def estimated_jaccard(signature, other):
+    """Perkiraan kemiripan Jaccard dari dua signature MinHash (porsi posisi yang sama)"""
+    if signature is None or other is None:
+        return 0.0
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+class NearDuplicateIndex:
+    """
+    Index LSH near-duplicate untuk satu dataset.
+
+    assign() mencocokkan dokumen baru dengan bucket yang sudah tersimpan dan dengan
+    dokumen lain dalam batch yang sama; register_rows() menyimpan bucket dokumen
+    representatif (baris dokumen duplikat tidak perlu disimpan).
+    """
+
+    def __init__(self, dataset_id, threshold=0.8, num_perm=128, shingle_size=5, mode='ignore'):
+        self.dataset_id = dataset_id
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.mode = mode
+        self.bands, self.rows = optimal_lsh_params(threshold, num_perm)
+
+    @classmethod
+    def from_app_config(cls, dataset_id):
+        """Buat index dari konfigurasi aplikasi; None jika NEAR_DUPLICATE_MODE = 'off'"""
+        mode = current_app.config.get('NEAR_DUPLICATE_MODE', 'off')
+        if mode not in NEAR_DUPLICATE_MODES:
+            current_app.logger.warning(f"Unknown NEAR_DUPLICATE_MODE '{mode}', near-duplicate detection disabled")
+            return None
+        if mode == 'off':
+            return None
+        return cls(
+            dataset_id,
+            threshold=current_app.config.get('NEAR_DUPLICATE_THRESHOLD', 0.8),
+            num_perm=current_app.config.get('NEAR_DUPLICATE_NUM_PERM', 128),
+            shingle_size=current_app.config.get('NEAR_DUPLICATE_SHINGLE_SIZE', 5),
+            mode=mode
+        )
+
+    def buckets(self, text):
+        """Bucket LSH (int64, sudah memuat nomor band) untuk sebuah teks"""
+        return self._signature_buckets(minhash_signature(text, self.num_perm, self.shingle_size))
+
+    def _signature_buckets(self, signature):
+        if signature is None:
+            return []
+        result = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(chunk.tobytes(), digest_size=8, person=band.to_bytes(2, 'little')).digest()
+            result.append(int.from_bytes(digest, 'little', signed=True))
+        return result
+
+    def _lookup_existing(self, buckets):
+        """bucket -> daftar "data_type_data_id" dari bucket yang sudah tersimpan untuk dataset ini"""
+        found = {}
+        buckets = list(buckets)
+        for start in range(0, len(buckets), _LOOKUP_CHUNK_SIZE):
+            chunk = buckets[start:start + _LOOKUP_CHUNK_SIZE]
+            rows = db.session.query(
+                NearDuplicateBucket.bucket, NearDuplicateBucket.data_type, NearDuplicateBucket.data_id
+            ).filter(
+                NearDuplicateBucket.dataset_id == self.dataset_id,
+                NearDuplicateBucket.bucket.in_(chunk)
+            ).all()
+            for bucket, data_type, data_id in rows:
+                found.setdefault(bucket, []).append(f"{data_type}_{data_id}")
+        return found
+
+    def _stored_signatures(self, keys):
+        """Signature MinHash dokumen tersimpan, dihitung ulang dari cleaned_content: key -> signature"""
+        ids = {}
+        for key in keys:
+            data_type, data_id = key.rsplit('_', 1)
+            ids.setdefault(data_type, []).append(int(data_id))
+
+        signatures = {}
+        for data_type, data_ids in ids.items():
+            model = CLEAN_MODELS.get(data_type)
+            if model is None:
+                continue
+            for start in range(0, len(data_ids), _LOOKUP_CHUNK_SIZE):
+                rows = db.session.query(model.id, model.cleaned_content).filter(
+                    model.id.in_(data_ids[start:start + _LOOKUP_CHUNK_SIZE])
+                ).all()
+                for data_id, content in rows:
+                    signatures[f"{data_type}_{data_id}"] = minhash_signature(content, self.num_perm, self.shingle_size)
+        return signatures
+
+    def assign(self, texts):
+        """
+        Tentukan representatif untuk setiap teks.
+
+        Kandidat dari bucket LSH yang sama hanya dianggap near-duplicate jika perkiraan Jaccard
+        signature-nya >= threshold (tabrakan band bersifat probabilistik); jika ada beberapa,
+        dipilih yang paling mirip.
+
+        Returns (representatives, buckets): representatives[i] adalah None (dokumen baru/representatif),
+        string "data_type_data_id" (near-duplicate dari dokumen tersimpan), atau int j (near-duplicate
+        dari teks ke-j pada batch ini, yang selalu representatif).
+        """
+        signatures = [minhash_signature(text, self.num_perm, self.shingle_size) for text in texts]
+        all_buckets = [self._signature_buckets(signature) for signature in signatures]
+        existing = self._lookup_existing({bucket for buckets in all_buckets for bucket in buckets})
+        stored = self._stored_signatures({key for keys in existing.values() for key in keys})
+
+        local = {}
+        representatives = []
+        for index, (signature, buckets) in enumerate(zip(signatures, all_buckets)):
+            candidates = {}
+            for bucket in buckets:
+                for key in existing.get(bucket, ()):
+                    candidates.setdefault(key, stored.get(key))
+                for position in local.get(bucket, ()):
+                    candidates.setdefault(position, signatures[position])
+
+            representative, best = None, self.threshold
+            for candidate, candidate_signature in candidates.items():
+                similarity = estimated_jaccard(signature, candidate_signature)
+                if similarity >= best and (representative is None or similarity > best):
+                    representative, best = candidate, similarity
+
+            if representative is None:
+                for bucket in buckets:
+                    local.setdefault(bucket, []).append(index)
+            representatives.append(representative)
+
+        return representatives, all_buckets
+
+    def register_rows(self, documents):
+        """Simpan bucket untuk dokumen representatif: iterable (data_type, data_id, buckets). Caller commits."""
+        rows = [
+            {'dataset_id': self.dataset_id, 'bucket': bucket, 'data_type': data_type, 'data_id': data_id}
+            for data_type, data_id, buckets in documents
+            for bucket in buckets
+        ]
+        if rows:
+            db.session.bulk_insert_mappings(NearDuplicateBucket, rows)
+        return len(rows)
+
+
+def delete_near_duplicate_buckets(data_type, data_ids):
+    """Hapus bucket LSH milik dokumen yang dihapus (caller commits)"""
+    if not data_ids:
+        return 0
+    return NearDuplicateBucket.query.filter(
+        NearDuplicateBucket.data_type == data_type,
+        NearDuplicateBucket.data_id.in_(data_ids)
+    ).delete(synchronize_session=False)
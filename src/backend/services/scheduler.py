@@ -4,7 +4,11 @@ import threading
 import logging
 from datetime import datetime, timedelta
 from flask import current_app
-from models.models import db, RawDataScraper, CleanDataScraper, ClassificationResult
+from models.models import db, RawDataScraper, CleanDataScraper, ClassificationResult, Dataset
+from services.chunk_upload_service import sweep_sessions
+from services.ingestion_service import staging_path
+from services.ensemble_service import delete_ensembles
+from services.near_duplicate_service import delete_near_duplicate_buckets
 from models.models_otp import RegistrationRequest, OTPEmailLog
 from sqlalchemy import text
 
@@ -52,6 +56,8 @@ class DataCleanupScheduler:
                         ClassificationResult.data_type == 'scraper',
                         ClassificationResult.data_id.in_(clean_scraper_ids)
                     ).delete(synchronize_session=False)
+                    delete_ensembles('scraper', clean_scraper_ids)
+                    delete_near_duplicate_buckets('scraper', clean_scraper_ids)
                     logger.info(f"Deleting {len(clean_scraper_ids)} related classification results")
                 
                 # Hapus clean_data_scraper yang terkait dengan raw_data_scraper orphan
@@ -102,6 +108,29 @@ class DataCleanupScheduler:
             db.session.rollback()
             return 0
     
+    def cleanup_temp_chunks(self):
+        """Membersihkan sesi chunk upload yang ditinggalkan (tidak berubah selama CHUNK_SESSION_MAX_AGE)"""
+        try:
+            with self.app.app_context():
+                # Sesi yang dipakai sebagai file_path dataset (mis. menunggu column mapping) tetap disimpan
+                file_paths = [
+                    file_path for (file_path,) in
+                    db.session.query(Dataset.file_path).filter(Dataset.file_path.isnot(None))
+                ]
+                keep_paths = file_paths + [staging_path(file_path) for file_path in file_paths]
+
+                deleted_count = sweep_sessions(
+                    self.app.config['UPLOAD_FOLDER'],
+                    self.app.config.get('CHUNK_SESSION_MAX_AGE', 86400),
+                    keep_paths
+                )
+                logger.info(f"Successfully deleted {deleted_count} abandoned chunk upload sessions")
+                return deleted_count
+
+        except Exception as e:
+            logger.error(f"Error cleaning temp chunks: {str(e)}")
+            return 0
+
     def update_statistics(self):
         """Update statistik dashboard setelah cleanup"""
         try:
@@ -0,0 +1,379 @@
+"""
+Batch scraping: satu job induk untuk banyak keyword x platform.
+
+Setiap kombinasi (platform, keyword) menjadi satu actor run Apify. Run dijalankan bersamaan dengan
+batas max_concurrent_runs (batas concurrency akun Apify), run berikutnya baru dimulai setelah ada
+run yang selesai. Hasil setiap run yang berhasil langsung di-import ke satu dataset gabungan;
+duplikasi antar run dicegah oleh pengecekan content_hash di import_scraped_items.
+Status per run disimpan di Dataset.meta_info['runs'].
+
+Batch dapat dihentikan (abort_batch): dataset ditandai 'Aborted', koordinator melihatnya di putaran
+berikutnya dan meng-abort run Apify yang masih aktif.
+
+Pemilik koordinator (boot id proses + token koordinator) dicatat di meta_info['batch_job'] bersama
+heartbeat yang diperbarui setiap kali status run disimpan. Batch yang pemiliknya hilang (restart)
+diambil alih oleh resume_batch_jobs; koordinator lama yang ternyata masih hidup berhenti saat
+menyimpan karena token-nya tidak lagi cocok.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from models.models import db, Dataset, RawDataScraper
+from services.apify_service import ApifyService
+from services.scraping_service import import_scraped_items, FINAL_RUN_STATUSES
+from services.ingestion_service import _pid_alive
+from utils.utils import get_jakarta_time, generate_activity_log
+
+SUPPORTED_PLATFORMS = ('twitter', 'tiktok', 'facebook')
+DEFAULT_MAX_CONCURRENT_RUNS = 5
+DEFAULT_POLL_INTERVAL = 10
+DEFAULT_MAX_RUNS = 100
+DEFAULT_STALE_AFTER = 900  # seconds without heartbeat before another process takes a batch over
+MAX_START_ATTEMPTS = 3
+
+# Kolom hasil actor default (key sudah di-flatten satu level, seperti di dialog mapping)
+DEFAULT_COLUMN_MAPPINGS = {
+    'twitter': {'content_column': 'text', 'username_column': 'author_userName', 'url_column': 'url'},
+    'tiktok': {'content_column': 'text', 'username_column': 'authorMeta_name', 'url_column': 'webVideoUrl'},
+    'facebook': {'content_column': 'message', 'username_column': 'author_name', 'url_column': 'url'},
+}
+
+# Status run di luar status Apify
+PENDING = 'PENDING'
+START_FAILED = 'START_FAILED'
+IMPORT_FAILED = 'IMPORT_FAILED'
+DONE_STATUSES = FINAL_RUN_STATUSES + (START_FAILED, IMPORT_FAILED)
+
+# Error saat memulai run yang menandakan batas Apify (coba lagi nanti, bukan gagal)
+_LIMIT_ERROR_MARKERS = ('429', 'rate limit', 'concurrent', 'memory limit', 'too many')
+
+
+def create_batch_dataset(user_id, platforms, keywords, max_results, start_date=None, end_date=None,
+                         language='id', max_concurrent_runs=None, column_mappings=None):
+    """Dataset induk (belum di-commit) dengan satu entri run per kombinasi platform x keyword"""
+    mappings = {
+        platform: dict(DEFAULT_COLUMN_MAPPINGS[platform], **((column_mappings or {}).get(platform) or {}))
+        for platform in platforms
+    }
+    runs = [
+        {
+            'platform': platform,
+            'keyword': keyword,
+            'status': PENDING,
+            'run_id': None,
+            'apify_dataset_id': None,
+            'attempts': 0,
+            'imported': 0,
+            'error': None,
+        }
+        for platform in platforms
+        for keyword in keywords
+    ]
+
+    name = f"Scraping Batch - {', '.join(keywords)}"
+    if len(name) > 200:
+        name = name[:197] + '...'
+
+    dataset = Dataset(
+        name=name,
+        description=(f"Batch scraping {len(keywords)} keywords on {', '.join(platforms)} "
+                     f"on {get_jakarta_time().strftime('%Y-%m-%d %H:%M')}"),
+        uploaded_by=user_id,
+        status='Processing',
+        total_records=0,
+        external_id=f"batch-{uuid.uuid4().hex}",
+        meta_info={
+            'batch': True,
+            'start_time': get_jakarta_time().isoformat(),
+            'platforms': platforms,
+            'keywords': keywords,
+            'max_results': max_results,
+            'start_date': start_date,
+            'end_date': end_date,
+            'language': language,
+            'max_concurrent_runs': max_concurrent_runs or DEFAULT_MAX_CONCURRENT_RUNS,
+            'column_mappings': mappings,
+            'runs': runs,
+            'batch_job': _job_owner(),
+        }
+    )
+    db.session.add(dataset)
+    return dataset
+
+
+class BatchTakenOver(Exception):
+    """Koordinator ini bukan lagi pemilik batch (diambil alih oleh resume_batch_jobs)"""
+
+
+_boot = (None, None)  # (pid, boot id) of this process
+
+
+def process_boot_id():
+    """Id acak per proses; dibuat ulang setelah fork sehingga worker gunicorn tidak berbagi id master"""
+    global _boot
+    if _boot[0] != os.getpid():
+        _boot = (os.getpid(), uuid.uuid4().hex)
+    return _boot[1]
+
+
+def _job_owner():
+    return {
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'boot_id': process_boot_id(),
+        'token': uuid.uuid4().hex,
+        'heartbeat': time.time(),
+    }
+
+
+def is_orphaned_batch(dataset, stale_after=DEFAULT_STALE_AFTER):
+    """
+    True jika batch masih 'Processing' tetapi koordinatornya sudah tidak berjalan: pemiliknya proses
+    lain (boot id berbeda) dan prosesnya di host ini sudah mati, atau heartbeat-nya lebih tua dari
+    stale_after detik. pid saja tidak cukup karena pid dipakai ulang setelah container restart.
+    """
+    meta_info = dataset.meta_info or {}
+    job = meta_info.get('batch_job') or {}
+    if dataset.status != 'Processing' or not meta_info.get('batch'):
+        return False
+    if job.get('boot_id') == process_boot_id():
+        return False
+    if job.get('host') == socket.gethostname() and not _pid_alive(job.get('pid')):
+        return True
+    return time.time() - (job.get('heartbeat') or 0) > stale_after
+
+
+def resume_batch_jobs(app):
+    """Lanjutkan batch 'Processing' yang koordinatornya hilang (mis. setelah restart). Returns jumlahnya."""
+    with app.app_context():
+        try:
+            stale_after = app.config.get('SCRAPING_BATCH_STALE_AFTER', DEFAULT_STALE_AFTER)
+            resumed = []
+            for (dataset_id,) in db.session.query(Dataset.id).filter_by(status='Processing').all():
+                # Row lock so only one worker takes over a batch; the owner is switched before the lock is released
+                dataset = Dataset.query.filter_by(id=dataset_id).with_for_update().first()
+                if dataset is None or not is_orphaned_batch(dataset, stale_after):
+                    db.session.rollback()
+                    continue
+                dataset.meta_info = dict(dataset.meta_info, batch_job=_job_owner())
+                db.session.commit()
+                resumed.append(dataset_id)
+            for dataset_id in resumed:
+                start_batch_job(app, dataset_id)
+            if resumed:
+                app.logger.warning(f"Resumed {len(resumed)} interrupted batch scraping job(s)")
+            return len(resumed)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Resuming batch scraping jobs failed: {str(e)}")
+            return 0
+        finally:
+            db.session.remove()
+
+
+def _abort_runs(runs, logger):
+    """Abort run Apify yang masih aktif; run yang belum dimulai ikut ditandai ABORTED"""
+    for run in runs:
+        if run['status'] in DONE_STATUSES:
+            continue
+        if run['run_id']:
+            try:
+                ApifyService.abort_run(run['run_id'])
+            except Exception as e:
+                logger.warning(f"Aborting Apify run {run['run_id']} failed: {e}")
+        run['status'] = 'ABORTED'
+
+
+def abort_batch(dataset):
+    """Hentikan batch: tandai 'Aborted' lalu abort run Apify yang aktif. False jika batch sudah selesai."""
+    if dataset.status != 'Processing':
+        return False
+    dataset.status = 'Aborted'
+    db.session.commit()
+    # The coordinator aborts whatever it starts in the meantime once it sees the status
+    _abort_runs([dict(run) for run in (dataset.meta_info or {}).get('runs', [])], current_app.logger)
+    return True
+
+
+def summarize_batch(dataset):
+    """Ringkasan progress job induk untuk endpoint status"""
+    runs = (dataset.meta_info or {}).get('runs', [])
+    counts = {}
+    for run in runs:
+        counts[run['status']] = counts.get(run['status'], 0) + 1
+    done = sum(1 for run in runs if run['status'] in DONE_STATUSES)
+    return {
+        'dataset_id': dataset.id,
+        'status': dataset.status,
+        'total_runs': len(runs),
+        'completed_runs': done,
+        'progress_percentage': int(done / len(runs) * 100) if runs else 100,
+        'status_counts': counts,
+        'total_records': dataset.total_records,
+        'runs': runs,
+    }
+
+
+def start_batch_job(app, dataset_id):
+    thread = threading.Thread(target=run_batch_job, args=(app, dataset_id))
+    thread.daemon = True
+    thread.start()
+
+
+def _start_run(run, meta_info):
+    run['attempts'] += 1
+    try:
+        apify_run = ApifyService.start_scraping_job(
+            platform=run['platform'],
+            keywords=run['keyword'],
+            max_results=meta_info['max_results'],
+            start_date=meta_info.get('start_date'),
+            end_date=meta_info.get('end_date'),
+            language=meta_info.get('language') or 'id',
+            # The coordinator polls its own runs; webhooks resolve runs via Dataset.external_id
+            webhook=False
+        )
+    except Exception as e:
+        message = str(e)
+        if any(marker in message.lower() for marker in _LIMIT_ERROR_MARKERS) and run['attempts'] < MAX_START_ATTEMPTS:
+            # Apify refused because of account limits; leave it queued for the next round
+            run['error'] = message
+            return False
+        run['status'] = START_FAILED
+        run['error'] = message
+        return False
+
+    run['run_id'] = apify_run.get('id')
+    run['apify_dataset_id'] = apify_run.get('defaultDatasetId')
+    run['status'] = apify_run.get('status') or 'READY'
+    run['error'] = None
+    return True
+
+
+def _import_run(dataset, run, meta_info):
+    mapping = meta_info['column_mappings'][run['platform']]
+    try:
+        count, fetched = import_scraped_items(
+            dataset, run['apify_dataset_id'],
+            mapping.get('content_column'), mapping.get('username_column'), mapping.get('url_column'),
+            dataset.uploaded_by, platform=run['platform'], keyword=run['keyword']
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Batch {dataset.id}: import of run {run['run_id']} failed: {e}")
+        run['status'] = IMPORT_FAILED
+        run['error'] = str(e)
+        return
+    run['imported'] = count
+    run['fetched'] = fetched
+
+
+def _save_runs(dataset, meta_info, runs, token):
+    """Simpan status run dan heartbeat; BatchTakenOver jika batch sudah diambil alih koordinator lain"""
+    # Row lock: the owner check and the write are atomic against a takeover (also refreshes dataset)
+    Dataset.query.filter_by(id=dataset.id).with_for_update().populate_existing().one()
+    job = (dataset.meta_info or {}).get('batch_job') or {}
+    if job.get('token') != token:
+        db.session.rollback()
+        raise BatchTakenOver(f"Batch {dataset.id} is now run by another coordinator")
+    dataset.meta_info = dict(meta_info, runs=[dict(run) for run in runs], batch_job=dict(job, heartbeat=time.time()))
+    dataset.total_records = RawDataScraper.query.filter_by(dataset_id=dataset.id).count()
+    db.session.commit()
+
+
+def run_batch_job(app, dataset_id):
+    """
+    Koordinator batch (thread background): mulai run sampai batas concurrency, poll status run
+    yang aktif, import hasil run yang berhasil, ulangi sampai semua run selesai.
+    """
+    with app.app_context():
+        token = None
+        try:
+            dataset = Dataset.query.get(dataset_id)
+            meta_info = dict(dataset.meta_info or {})
+            # The owner was recorded (and committed) before this thread was started
+            token = (meta_info.get('batch_job') or {}).get('token')
+            runs = [dict(run) for run in meta_info.get('runs', [])]
+            max_concurrent = max(1, int(meta_info.get('max_concurrent_runs') or DEFAULT_MAX_CONCURRENT_RUNS))
+            poll_interval = float(app.config.get('SCRAPING_BATCH_POLL_INTERVAL') or DEFAULT_POLL_INTERVAL)
+
+            while True:
+                db.session.refresh(dataset)
+                if dataset.status == 'Aborted':
+                    _abort_runs(runs, app.logger)
+                    _save_runs(dataset, meta_info, runs, token)
+                    app.logger.info(f"Batch {dataset_id} aborted")
+                    return
+
+                active = [run for run in runs if run['run_id'] and run['status'] not in DONE_STATUSES]
+                pending = [run for run in runs if run['status'] == PENDING]
+                if not active and not pending:
+                    break
+
+                for run in pending[:max(0, max_concurrent - len(active))]:
+                    if not _start_run(run, meta_info):
+                        continue
+                    # Record the run id at once so a coordinator that dies mid-round does not lose the run
+                    try:
+                        _save_runs(dataset, meta_info, runs, token)
+                    except BatchTakenOver:
+                        _abort_runs([run], app.logger)
+                        raise
+
+                for run in runs:
+                    if not run['run_id'] or run['status'] in DONE_STATUSES:
+                        continue
+                    try:
+                        status = ApifyService.get_run_status(run['run_id']).get('status')
+                    except Exception as e:
+                        app.logger.warning(f"Batch {dataset_id}: status of run {run['run_id']} unavailable: {e}")
+                        continue
+                    run['status'] = status or run['status']
+                    if status == 'SUCCEEDED':
+                        _import_run(dataset, run, meta_info)
+
+                _save_runs(dataset, meta_info, runs, token)
+
+                if any(run['status'] not in DONE_STATUSES for run in runs):
+                    time.sleep(poll_interval)
+
+            succeeded = [run for run in runs if run['status'] == 'SUCCEEDED']
+            _save_runs(dataset, meta_info, runs, token)
+            # Conditional, so an abort that arrived after the last poll is not overwritten
+            finished = Dataset.query.filter_by(id=dataset_id, status='Processing').update(
+                {'status': 'Raw' if succeeded else 'Failed'}, synchronize_session=False)
+            db.session.commit()
+            if not finished:
+                return
+
+            generate_activity_log(
+                action='scraping',
+                description=(f'Completed batch scraping: {dataset.name} ({len(succeeded)}/{len(runs)} runs succeeded, '
+                             f'{dataset.total_records} records)'),
+                user_id=dataset.uploaded_by,
+                icon='fa-save',
+                color='success' if succeeded else 'danger'
+            )
+        except BatchTakenOver as e:
+            app.logger.warning(str(e))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Batch scraping job {dataset_id} failed: {e}", exc_info=True)
+            dataset = Dataset.query.filter_by(id=dataset_id).with_for_update().first()
+            # A coordinator that was taken over leaves the runs to the new owner
+            if dataset is not None and ((dataset.meta_info or {}).get('batch_job') or {}).get('token') == token:
+                # Runs left active would keep scraping with nobody to import their results
+                runs = [dict(run) for run in (dataset.meta_info or {}).get('runs', [])]
+                _abort_runs(runs, app.logger)
+                dataset.meta_info = dict(dataset.meta_info, runs=runs)
+                if dataset.status == 'Processing':
+                    dataset.status = 'Failed'
+                db.session.commit()
+        finally:
+            db.session.remove()
@@ -0,0 +1,434 @@
+"""
+Import hasil scraping Apify ke raw_data_scraper.
+
+Item dataset Apify diambil per halaman (offset/limit); setiap halaman di-flatten, dicek duplikasinya
+(content_hash) lalu di-insert secara bulk sebelum halaman berikutnya diambil, sehingga memori
+dibatasi oleh ukuran halaman, bukan oleh jumlah item hasil scraping.
+
+Preview mapping kolom hanya mengambil sampel item pertama; skema kolom yang diturunkan disimpan
+per external_id (run Apify) di Dataset.meta_info['mapping_schema'].
+
+Pemetaan kolom saat import dilakukan per halaman dan per kolom (build_scraped_frame): hanya kolom
+yang dibutuhkan yang diambil dari item, regex username dijalankan lewat Series.str untuk baris yang
+membutuhkannya saja, lalu satu bulk insert per halaman. Pemetaan per item yang menjadi acuannya ada di
+tests/benchmark_scraping_mapping.py (dibandingkan di tests/test_scraping_mapping.py).
+
+Selesainya run Apify dikirim lewat webhook (handle_run_event, start_finished_run_job): status dataset diperbarui dan,
+jika mapping kolom sudah diberikan saat scraping dimulai, import langsung dijalankan di background.
+"""
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+from models.models import db, RawDataScraper
+from services.apify_service import ApifyService
+from services.ingestion_service import insert_raw_frame
+from utils.utils import get_jakarta_time, compute_content_hash, flatten_dict, generate_activity_log
+
+DEFAULT_PAGE_SIZE = 1000
+PREVIEW_ROWS = 5
+SCHEMA_SAMPLE_ITEMS = 50
+SCHEMA_CACHE_SIZE = 256
+FINAL_RUN_STATUSES = ('SUCCEEDED', 'FAILED', 'ABORTED', 'TIMED-OUT')
+# Status dataset untuk status final run Apify
+RUN_STATUS_TO_DATASET_STATUS = {
+    'SUCCEEDED': 'Raw',
+    'FAILED': 'Failed',
+    'TIMED-OUT': 'Failed',
+    'ABORTED': 'Aborted',
+}
+
+# apify_dataset_id -> kolom, untuk request preview tanpa dataset internal
+_schema_cache = {}
+
+TWITTER_USER_RE = re.compile(r'https?://(?:www\.)?(?:twitter|x)\.com/([^/?#]+)')
+TIKTOK_USER_RE = re.compile(r'https?://(?:www\.)?tiktok\.com/@([^/?#]+)')
+FACEBOOK_USER_RE = re.compile(r'facebook\.com/([^/?#]+)')
+FACEBOOK_NON_USER_PATHS = ['groups', 'watch', 'story', 'permalink']
+
+# Kolom metrik (nama kolom setelah flatten) dalam urutan prioritas
+METRIC_COLUMNS = {
+    'likes': ['likes', 'favorite_count', 'likeCount', 'diggCount'],
+    'retweets': ['retweets', 'retweet_count', 'repostCount'],
+    'replies': ['replies', 'reply_count', 'commentCount'],
+    'shares': ['shares', 'shareCount'],
+    'views': ['views', 'view_count', 'playCount'],
+}
+USERNAME_FALLBACK_COLUMNS = [
+    'screen_name', 'user_screen_name', 'user_username',
+    'core_user_results_result_legacy_screen_name',  # Deeply nested Twitter structure
+    'author_userName', 'author_uniqueId', 'authorMeta_name', 'authorMeta_nickName',
+]
+TIKTOK_USERNAME_COLUMNS = ['authorMeta_name', 'authorMeta_nickName', 'author_uniqueId', 'author_nickname', 'author_userName']
+FACEBOOK_USERNAME_COLUMNS = ['author_name', 'user_name', 'user_username', 'userName', 'authorName', 'name']
+URL_FALLBACK_COLUMNS = ['url', 'expanded_url', 'postUrl', 'webUrl', 'webVideoUrl']
+MAPPED_COLUMNS = ['username', 'content', 'url', 'likes', 'retweets', 'replies', 'shares', 'views', 'comments']
+
+
+def parse_dataset_label(dataset):
+    """Platform dan keyword dari nama dataset ("Scraping {Platform} - {Keyword}")"""
+    platform = 'unknown'
+    keyword = 'unknown'
+    if dataset.name.startswith('Scraping '):
+        parts = dataset.name[9:].split(' - ', 1)
+        if len(parts) >= 1:
+            platform = parts[0].lower()
+        if len(parts) >= 2:
+            keyword = parts[1]
+    return platform, keyword
+
+
+def derive_columns(items):
+    """Gabungan key (flattened) dari item sampel, urut sesuai kemunculan pertama"""
+    columns = {}
+    for item in items:
+        for key in flatten_dict(item):
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def _cached_columns(apify_dataset_id, dataset):
+    if dataset is None:
+        return _schema_cache.get(apify_dataset_id)
+    schema = (dataset.meta_info or {}).get('mapping_schema') or {}
+    if schema.get('external_id') == dataset.external_id and schema.get('apify_dataset_id') == apify_dataset_id:
+        return schema.get('columns')
+    return None
+
+
+def _store_columns(apify_dataset_id, dataset, columns, sample_data):
+    if dataset is None:
+        if len(_schema_cache) >= SCHEMA_CACHE_SIZE:
+            _schema_cache.pop(next(iter(_schema_cache)))
+        _schema_cache[apify_dataset_id] = columns
+        return
+    dataset.meta_info = dict(dataset.meta_info or {}, mapping_schema={
+        'external_id': dataset.external_id,
+        'apify_dataset_id': apify_dataset_id,
+        'columns': columns,
+        'sample_data': sample_data,
+    })
+
+
+def get_mapping_preview(apify_dataset_id, dataset=None):
+    """
+    Kolom, baris preview dan total item untuk dialog mapping kolom scraping.
+    Hanya sampel item pertama yang diambil dari Apify (SCHEMA_SAMPLE_ITEMS saat skema belum ada
+    di cache, PREVIEW_ROWS setelahnya) ditambah info dataset untuk total item, sehingga waktunya
+    tidak bergantung pada ukuran hasil scraping. Perubahan meta_info perlu di-commit pemanggil.
+    """
+    columns = _cached_columns(apify_dataset_id, dataset)
+    items = ApifyService.get_dataset_items(apify_dataset_id, limit=PREVIEW_ROWS if columns else SCHEMA_SAMPLE_ITEMS)
+
+    sample_data = [flatten_dict(item) for item in items[:PREVIEW_ROWS]]
+    if not columns:
+        columns = derive_columns(items)
+        if columns:
+            _store_columns(apify_dataset_id, dataset, columns, sample_data)
+
+    info = ApifyService.get_dataset_info(apify_dataset_id) or {}
+    return {
+        'columns': columns,
+        'sample_data': sample_data,
+        'total_items': info.get('itemCount'),
+    }
+
+
+class _PageColumns:
+    """
+    Ekstraksi kolom hasil flatten (sep '_') dari satu halaman item, mis. 'author_userName' ->
+    item['author']['userName']. Hanya cabang yang dibutuhkan yang ditelusuri, sekali per nama kolom.
+    """
+
+    def __init__(self, values):
+        self.values = values  # dict atau None per baris
+        self.keys = set().union(*(value for value in values if value))
+        self._columns = {}
+        self._children = {}
+
+    def _child(self, head):
+        if head not in self._children:
+            children = [value.get(head) if value else None for value in self.values]
+            children = [child if isinstance(child, dict) else None for child in children]
+            self._children[head] = _PageColumns(children) if any(children) else None
+        return self._children[head]
+
+    def __call__(self, name):
+        """Nilai kolom per baris, atau None jika kolom tidak ada di item mana pun"""
+        if not name:
+            return None
+        if name in self._columns:
+            return self._columns[name]
+        column = [value.get(name) if value else None for value in self.values] if name in self.keys else None
+        for position, char in enumerate(name):
+            if char != '_' or name[:position] not in self.keys:
+                continue
+            child = self._child(name[:position])
+            nested = child(name[position + 1:]) if child else None
+            if nested is not None:
+                column = nested if column is None else [
+                    value if value is not None else other for value, other in zip(column, nested)
+                ]
+        self._columns[name] = column
+        return column
+
+    def get(self, name):
+        column = self(name)
+        return list(column) if column is not None else [None] * len(self.values)
+
+    def coalesce(self, names, rows=None):
+        """Nilai truthy pertama dari beberapa kolom (seperti rantai `a or b or c`), untuk baris `rows`"""
+        rows = range(len(self.values)) if rows is None else rows
+        result = [None] * len(rows)
+        for name in names:
+            column = self(name)
+            if column is None:
+                continue
+            result = [value or column[row] for value, row in zip(result, rows)]
+            if all(result):
+                break
+        return [value or None for value in result]
+
+
+def _user_from_url(urls, pattern):
+    """Username dari URL profil/post memakai regex terkompilasi (NaN jika tidak cocok)"""
+    return pd.Series(urls, dtype=object).astype(str).str.extract(pattern, expand=False)
+
+
+def _digit_strings(values):
+    return [isinstance(value, str) and value.isdigit() for value in values]
+
+
+def build_scraped_frame(items, content_col, username_col, url_col, platform):
+    """
+    Pemetaan satu halaman item Apify ke kolom raw_data_scraper (username, content, url, metrik)
+    secara per kolom. Aturan sama dengan pemetaan per item (map_scraped_item di
+    tests/benchmark_scraping_mapping.py); item tanpa konten dilewati.
+    """
+    content = _PageColumns(items).get(content_col)
+    # Skip empty content
+    items = [item for item, value in zip(items, content) if value]
+    content = [value for value in content if value]
+    if not items:
+        return pd.DataFrame(columns=MAPPED_COLUMNS)
+    columns = _PageColumns(items)
+
+    # Handle Twitter object structure (sometimes username is inside 'user' or 'author')
+    username = columns(username_col)
+    username = list(username) if username is not None else ['unknown'] * len(items)
+    is_object = [isinstance(value, dict) for value in username]
+    username = [
+        (value.get('screen_name') or value.get('username') or value.get('name') or 'unknown') if obj else value
+        for value, obj in zip(username, is_object)
+    ]
+    url = [value or '' for value in columns.get(url_col)]
+
+    needs_fallback = [
+        row for row, (value, obj, digits) in enumerate(zip(username, is_object, _digit_strings(username)))
+        if not obj and (not value or value == 'unknown' or digits)
+    ]
+    if needs_fallback:
+        fallback = [value or 'unknown' for value in columns.coalesce(USERNAME_FALLBACK_COLUMNS, needs_fallback)]
+
+        if platform.lower() == 'tiktok':
+            # Prioritize uniqueId or name over numeric IDs
+            tiktok_user = columns.coalesce(TIKTOK_USERNAME_COLUMNS, needs_fallback)
+            numeric = [str(value).isdigit() for value in tiktok_user]
+            fallback = [
+                user if user and not digits else value
+                for value, user, digits in zip(fallback, tiktok_user, numeric)
+            ]
+
+        if platform.lower() == 'facebook':
+            facebook_user = columns.coalesce(FACEBOOK_USERNAME_COLUMNS, needs_fallback)
+            # If still not found, try to extract from a profile URL
+            from_url = _user_from_url([url[row] for row in needs_fallback], FACEBOOK_USER_RE)
+            facebook_user = [
+                user or (None if pd.isna(path) or path in FACEBOOK_NON_USER_PATHS else path)
+                for user, path in zip(facebook_user, from_url)
+            ]
+            fallback = [user or value for value, user in zip(fallback, facebook_user)]
+
+        for row, value in zip(needs_fallback, fallback):
+            username[row] = value
+
+    # Handle URL structure
+    missing_url = [row for row, value in enumerate(url) if not value]
+    if missing_url:
+        for row, value in zip(missing_url, columns.coalesce(URL_FALLBACK_COLUMNS, missing_url)):
+            url[row] = value or ''
+
+    # Extract username from URL if still unknown or looks like a URL (user mapped URL to username)
+    from_url = [
+        row for row, value in enumerate(username)
+        if (not value or value == 'unknown' or value == 'None' or 'http' in str(value)) and url[row]
+    ]
+    if from_url:
+        urls = [url[row] for row in from_url]
+        twitter_user = _user_from_url(urls, TWITTER_USER_RE)
+        tiktok_user = _user_from_url(urls, TIKTOK_USER_RE)
+        for row, twitter, tiktok in zip(from_url, twitter_user, tiktok_user):
+            if not pd.isna(tiktok):
+                username[row] = tiktok
+            elif not pd.isna(twitter):
+                username[row] = twitter
+
+    mapped = {
+        'username': [str(value)[:255] for value in username],
+        'content': [str(value) for value in content],
+        'url': [str(value) for value in url],
+    }
+    for field, names in METRIC_COLUMNS.items():
+        values = pd.to_numeric(np.array(columns.coalesce(names), dtype=object), errors='coerce')
+        mapped[field] = np.nan_to_num(values, nan=0).astype(np.int64)
+    mapped['comments'] = mapped['replies']
+    return pd.DataFrame(mapped, columns=MAPPED_COLUMNS)
+
+
+def _existing_hashes(dataset_id, hashes):
+    """content_hash dari daftar yang sudah ada di dataset (satu query IN per halaman)"""
+    hashes = list(hashes)
+    if not hashes:
+        return set()
+    return set(
+        r[0] for r in db.session.query(RawDataScraper.content_hash).filter(
+            RawDataScraper.dataset_id == dataset_id,
+            RawDataScraper.content_hash.in_(hashes)
+        ).all()
+    )
+
+
+def import_scraped_items(dataset, apify_dataset_id, content_col, username_col, url_col, user_id, page_size=None,
+                         platform=None, keyword=None):
+    """
+    Import item dataset Apify ke raw_data_scraper per halaman tanpa commit.
+    Duplikat (content_hash yang sudah ada di dataset atau di halaman sebelumnya) dilewati.
+    platform/keyword default-nya diambil dari nama dataset (batch scraping memberikannya per run).
+    Returns (jumlah baris baru, jumlah item yang dibaca).
+    """
+    page_size = page_size or current_app.config.get('SCRAPING_IMPORT_PAGE_SIZE') or DEFAULT_PAGE_SIZE
+    label_platform, label_keyword = parse_dataset_label(dataset)
+    platform = platform or label_platform
+    keyword = keyword or label_keyword
+    scrape_date = get_jakarta_time().date()
+
+    inserted = 0
+    fetched = 0
+    for page in ApifyService.iter_dataset_items(apify_dataset_id, page_size=page_size):
+        fetched += len(page)
+
+        frame = build_scraped_frame(page, content_col, username_col, url_col, platform)
+        frame['content_hash'] = frame['content'].map(compute_content_hash)
+        frame = frame[frame['content_hash'].notna()].drop_duplicates('content_hash')
+
+        existing = _existing_hashes(dataset.id, frame['content_hash'])
+        frame = frame[~frame['content_hash'].isin(existing)]
+        frame = frame.assign(
+            platform=platform,
+            keyword=keyword,
+            scrape_date=scrape_date,
+            status='raw',
+            dataset_id=dataset.id,
+            dataset_name=dataset.name,
+            scraped_by=user_id,
+        )
+        inserted += insert_raw_frame(frame, RawDataScraper)
+
+        current_app.logger.info(
+            f"Apify Dataset {apify_dataset_id}: page of {len(page)} items, {len(frame)} new rows (total read {fetched})"
+        )
+
+    return inserted, fetched
+
+
+def handle_run_event(dataset, run):
+    """
+    Terapkan status final run Apify (objek run dari payload webhook) ke dataset.
+    Idempoten: event untuk run yang sudah final diabaikan. Pemanggil harus memuat dataset dengan
+    lock baris (with_for_update) dan commit sebelum start_finished_run_job, agar dua pengiriman
+    event yang bersamaan tidak sama-sama lolos dan job background membaca status yang sudah tersimpan.
+    Returns False jika event diabaikan.
+    """
+    status = run.get('status')
+    meta_info = dict(dataset.meta_info or {})
+    if status not in FINAL_RUN_STATUSES or meta_info.get('apify_status') in FINAL_RUN_STATUSES:
+        return False
+
+    meta_info.update(
+        apify_status=status,
+        apify_finished_at=run.get('finishedAt'),
+        apify_dataset_id=meta_info.get('apify_dataset_id') or run.get('defaultDatasetId'),
+    )
+    dataset.meta_info = meta_info
+    dataset.status = RUN_STATUS_TO_DATASET_STATUS[status]
+    if status == 'SUCCEEDED' and meta_info.get('apify_dataset_id') and meta_info.get('column_mapping'):
+        dataset.status = 'Processing'
+    return True
+
+
+def start_finished_run_job(app, dataset):
+    """
+    Jalankan tindak lanjut run yang berhasil (import atau preview mapping) di background.
+    Dipanggil setelah hasil handle_run_event di-commit. Returns True jika job dijalankan.
+    """
+    meta_info = dataset.meta_info or {}
+    if meta_info.get('apify_status') != 'SUCCEEDED' or not meta_info.get('apify_dataset_id'):
+        return False
+    thread = threading.Thread(target=process_finished_run, args=(app, dataset.id))
+    thread.daemon = True
+    thread.start()
+    return True
+
+
+def process_finished_run(app, dataset_id):
+    """
+    Background job setelah run berhasil: import item jika mapping kolom sudah ada, atau siapkan
+    skema kolom + preview untuk dialog mapping.
+    """
+    with app.app_context():
+        from models.models import Dataset
+
+        dataset = Dataset.query.get(dataset_id)
+        if dataset is None:
+            return
+        meta_info = dataset.meta_info or {}
+        apify_dataset_id = meta_info.get('apify_dataset_id')
+        mapping = meta_info.get('column_mapping')
+
+        try:
+            if not mapping:
+                preview = get_mapping_preview(apify_dataset_id, dataset)
+                if preview['total_items'] is not None:
+                    dataset.total_records = max(dataset.total_records or 0, preview['total_items'])
+                db.session.commit()
+                return
+
+            count, fetched = import_scraped_items(
+                dataset, apify_dataset_id,
+                mapping.get('content_column'), mapping.get('username_column'), mapping.get('url_column'),
+                dataset.uploaded_by
+            )
+            db.session.flush()
+            dataset.total_records = RawDataScraper.query.filter_by(dataset_id=dataset.id).count()
+            dataset.status = 'Raw'
+            db.session.commit()
+
+            generate_activity_log(
+                action='scraping',
+                description=f'Completed scraping data processing: {dataset.name} ({count} new records, total {dataset.total_records})',
+                user_id=dataset.uploaded_by,
+                icon='fa-save',
+                color='success'
+            )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Processing finished Apify run for dataset {dataset_id} failed: {e}", exc_info=True)
+            dataset = Dataset.query.get(dataset_id)
+            if dataset is not None and mapping:
+                dataset.status = 'Failed'
+                db.session.commit()
+        finally:
+            db.session.remove()
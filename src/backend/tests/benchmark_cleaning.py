@@ -0,0 +1,131 @@
+"""
+Benchmark cleaning service: waktu dan jumlah statement SQL untuk membersihkan dataset besar.
+
+Membuat dataset sementara berisi N baris raw_data (default 100.000, ~10% duplikat),
+menjalankan _clean_dataset + commit sambil menghitung statement SQL, lalu menghapus
+semua data benchmark. Membutuhkan DATABASE_URL (PostgreSQL) seperti validate_pipeline.py.
+
+    python src/backend/tests/benchmark_cleaning.py --rows 100000
+"""
+import os
+import sys
+import time
+import argparse
+from flask import Flask
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+# Load Env
+load_dotenv()
+
+# Setup paths
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.config import config
+from models.models import db, User, Dataset, RawData, CleanDataUpload
+import models.models_content_hash  # noqa: F401
+import models.models_near_duplicate  # noqa: F401
+from utils.utils import load_text_processing_resources
+from services.cleaning_service import _clean_dataset
+
+SAMPLE_TEXTS = [
+    "Pemerintah mengumumkan program baru untuk pendidikan di daerah terpencil #{i}",
+    "RT @akun{i} kajian rutin malam ini di masjid agung, semua diundang hadir",
+    "Harga bahan pokok naik lagi minggu ini, warga mengeluh di pasar {i}",
+    "Nonton bola bareng di alun-alun nanti malam, jangan lupa bawa jas hujan {i}",
+]
+
+
+def seed_dataset(user_id, rows, duplicate_ratio):
+    dataset = Dataset(name=f'Benchmark Cleaning {int(time.time())}', uploaded_by=user_id, status='Raw', total_records=rows)
+    db.session.add(dataset)
+    db.session.flush()
+
+    unique_rows = max(1, int(rows * (1 - duplicate_ratio)))
+    batch = []
+    for i in range(rows):
+        seed = i % unique_rows
+        batch.append({
+            'username': f'user{seed % 5000}',
+            'content': SAMPLE_TEXTS[seed % len(SAMPLE_TEXTS)].format(i=seed),
+            'url': f'https://example.com/post/{i}',
+            'platform': 'twitter',
+            'status': 'raw',
+            'dataset_id': dataset.id,
+            'dataset_name': dataset.name,
+            'uploaded_by': user_id
+        })
+        if len(batch) >= 10000:
+            db.session.bulk_insert_mappings(RawData, batch)
+            batch = []
+    if batch:
+        db.session.bulk_insert_mappings(RawData, batch)
+    db.session.commit()
+    return dataset
+
+
+def cleanup_dataset(dataset_id):
+    CleanDataUpload.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+    RawData.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+    Dataset.query.filter_by(id=dataset_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def benchmark_cleaning(rows, duplicate_ratio):
+    print("=" * 80)
+    print("BENCHMARK CLEANING SERVICE".center(80))
+    print("=" * 80)
+
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    db.init_app(app)
+
+    with app.app_context():
+        load_text_processing_resources()
+
+        user = User.query.filter_by(role='admin').first() or User.query.first()
+        if not user:
+            print("[!] Tidak ada user di database; jalankan init admin terlebih dahulu.")
+            return
+
+        print(f"\n[1] Menyiapkan {rows:,} baris raw_data (duplikat ~{int(duplicate_ratio * 100)}%)...")
+        start = time.perf_counter()
+        dataset = seed_dataset(user.id, rows, duplicate_ratio)
+        dataset_id = dataset.id
+        print(f"    Selesai dalam {time.perf_counter() - start:.2f}s (dataset id {dataset_id})")
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split(None, 1)[0].upper())
+
+        try:
+            print("\n[2] Menjalankan cleaning...")
+            event.listen(db.engine, 'before_cursor_execute', count_statement)
+            start = time.perf_counter()
+            cleaned, ignored, errors = _clean_dataset(dataset, user.id)
+            db.session.commit()
+            elapsed = time.perf_counter() - start
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+            print(f"    Cleaned : {cleaned:,}")
+            print(f"    Ignored : {ignored:,}")
+            print(f"    Errors  : {len(errors)}")
+            print(f"    Waktu   : {elapsed:.2f}s ({rows / elapsed:,.0f} baris/detik)")
+            print(f"    Statement SQL: {len(statements)}")
+            for verb in sorted(set(statements)):
+                print(f"      {verb:<8} {statements.count(verb)}")
+        finally:
+            print("\n[3] Menghapus data benchmark...")
+            db.session.rollback()
+            cleanup_dataset(dataset_id)
+
+    print("\n" + "=" * 80)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark cleaning service')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+    benchmark_cleaning(args.rows, args.duplicate_ratio)
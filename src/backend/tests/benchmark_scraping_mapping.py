@@ -0,0 +1,240 @@
+"""
+Benchmark pemetaan item scraping: loop per item (map_scraped_item, acuan) vs per kolom (build_scraped_frame).
+
+Membuat N tweet sintetis berbentuk output actor Twitter Apify (default 100.000, sebagian tanpa
+author sehingga username diambil dari URL), memetakan keduanya per halaman seperti import, lalu
+mencetak waktu dan memastikan hasil keduanya sama. Tidak membutuhkan database.
+
+    python src/backend/tests/benchmark_scraping_mapping.py --rows 100000
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+# Setup paths
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.scraping_service import (
+    build_scraped_frame, TWITTER_USER_RE, TIKTOK_USER_RE, FACEBOOK_USER_RE, FACEBOOK_NON_USER_PATHS
+)
+
+SAMPLE_TEXTS = [
+    "Pemerintah mengumumkan program baru untuk pendidikan di daerah terpencil #{i}",
+    "RT @akun{i} kajian rutin malam ini di masjid agung, semua diundang hadir",
+    "Harga bahan pokok naik lagi minggu ini, warga mengeluh di pasar {i}",
+    "Nonton bola bareng di alun-alun nanti malam, jangan lupa bawa jas hujan {i}",
+]
+MAPPING = ('text', 'author_userName', 'url')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def map_scraped_item(raw_item, content_col, username_col, url_col, platform):
+    """
+    Pemetaan per item (implementasi import sebelum build_scraped_frame), dipakai sebagai acuan.
+    Petakan satu item Apify ke field RawDataScraper; None jika item tidak memiliki konten.
+    """
+    # Flatten item first to handle nested objects in columns
+    item = {}
+    for k, v in raw_item.items():
+        if isinstance(v, dict):
+            for sub_k, sub_v in v.items():
+                item[f"{k}_{sub_k}"] = sub_v
+            # Keep original for fallback logic
+            item[k] = v
+        else:
+            item[k] = v
+
+    # Map item keys to our model
+    content = item.get(content_col, '')
+    # Try to get content from original raw item if flattened key failed or empty
+    if not content and content_col in raw_item:
+        content = raw_item[content_col]
+
+    # Skip empty content
+    if not content:
+        return None
+
+    username = item.get(username_col, 'unknown')
+    if username == 'unknown' and username_col in raw_item:
+        username = raw_item[username_col]
+
+    url = item.get(url_col, '')
+    if not url and url_col in raw_item:
+        url = raw_item[url_col]
+
+    # Additional fields (best effort mapping for social media metrics)
+    likes = _to_int(item.get('likes') or item.get('favorite_count') or item.get('likeCount') or item.get('diggCount') or 0)
+    retweets = _to_int(item.get('retweets') or item.get('retweet_count') or item.get('repostCount') or 0)
+    replies = _to_int(item.get('replies') or item.get('reply_count') or item.get('commentCount') or 0)
+    shares = _to_int(item.get('shares') or item.get('shareCount') or 0)
+    views = _to_int(item.get('views') or item.get('view_count') or item.get('playCount') or 0)
+
+    # Handle Twitter object structure (sometimes username is inside 'user' or 'author')
+    if isinstance(username, dict):
+        username = username.get('screen_name') or username.get('username') or username.get('name') or 'unknown'
+    elif not username or username == 'unknown' or (isinstance(username, str) and username.isdigit()):
+        # Try fallback fields for username
+        # Twitter: user.screen_name, author.userName
+        # TikTok: authorMeta.name, authorMeta.nickName, author.uniqueId
+        username = (item.get('screen_name') or
+                    item.get('user', {}).get('screen_name') or
+                    item.get('user', {}).get('username') or
+                    item.get('core', {}).get('user_results', {}).get('result', {}).get('legacy', {}).get('screen_name') or # Deeply nested Twitter structure
+                    item.get('author', {}).get('userName') or
+                    item.get('author', {}).get('uniqueId') or
+                    item.get('authorMeta', {}).get('name') or
+                    item.get('authorMeta', {}).get('nickName') or
+                    'unknown')
+
+        # Special check for TikTok structure which is often nested or flattened
+        if platform.lower() == 'tiktok':
+            # Prioritize uniqueId or name over numeric IDs
+            tiktok_user = (item.get('authorMeta', {}).get('name') or
+                           item.get('authorMeta', {}).get('nickName') or
+                           item.get('author_uniqueId') or
+                           item.get('author_nickname') or
+                           item.get('author_userName'))
+
+            if tiktok_user and not str(tiktok_user).isdigit():
+                username = tiktok_user
+
+        # Special check for Facebook structure
+        if platform.lower() == 'facebook':
+            # Check for author_name in top level or inside user object
+            facebook_user = (item.get('author_name') or
+                             item.get('user', {}).get('name') or
+                             item.get('user', {}).get('username') or
+                             item.get('userName') or
+                             item.get('authorName') or # Common in some scrapers
+                             item.get('user_name') or
+                             item.get('name')) # Sometimes just name
+
+            # If still not found, try to extract from URL if it's a profile URL
+            if not facebook_user and url:
+                # Try to extract from facebook.com/username/posts/...
+                fb_match = FACEBOOK_USER_RE.search(url)
+                if fb_match:
+                    potential_user = fb_match.group(1)
+                    # Avoid 'groups', 'pages', 'story' etc if possible, but better than nothing
+                    if potential_user not in FACEBOOK_NON_USER_PATHS:
+                        facebook_user = potential_user
+
+            if facebook_user:
+                username = facebook_user
+
+    # Handle URL structure
+    if not url:
+        url = (item.get('url') or
+               item.get('expanded_url') or
+               item.get('postUrl') or
+               item.get('webUrl') or
+               item.get('webVideoUrl') or
+               '')
+
+    # Extract username from URL if still unknown or looks like a URL (user mapped URL to username)
+    if (not username or username == 'unknown' or username == 'None' or 'http' in str(username)) and url:
+        # Pattern for Twitter: twitter.com/username/status/... or x.com/username/...
+        twitter_match = TWITTER_USER_RE.search(url)
+        if twitter_match:
+            username = twitter_match.group(1)
+
+        # Pattern for TikTok: tiktok.com/@username/...
+        tiktok_match = TIKTOK_USER_RE.search(url)
+        if tiktok_match:
+            username = tiktok_match.group(1)
+
+    return {
+        'username': str(username)[:255],
+        'content': str(content),
+        'url': str(url),
+        'likes': likes,
+        'retweets': retweets,
+        'replies': replies,
+        'shares': shares,
+        'comments': replies,
+        'views': views,
+    }
+
+
+def synthetic_tweets(rows):
+    items = []
+    for i in range(rows):
+        item = {
+            'id': str(1700000000000000000 + i),
+            'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)].format(i=i),
+            'url': f'https://x.com/user{i % 5000}/status/{i}',
+            'likeCount': i % 97,
+            'retweetCount': i % 13,
+            'replyCount': str(i % 7),
+            'viewCount': None if i % 11 == 0 else i * 3,
+            'createdAt': 'Mon Oct 19 10:00:00 +0000 2026',
+            'entities': {'hashtags': [{'text': f'tag{i % 50}'}]},
+        }
+        if i % 10:
+            # Sebagian item tanpa author: username diambil dari URL
+            item['author'] = {'userName': f'user{i % 5000}', 'name': f'User {i % 5000}', 'followers': i % 1000}
+        if i % 50 == 0:
+            item['text'] = ''
+        items.append(item)
+    return items
+
+
+def pages(items, page_size):
+    for start in range(0, len(items), page_size):
+        yield items[start:start + page_size]
+
+
+def run_loop(items, page_size):
+    rows = []
+    for page in pages(items, page_size):
+        for item in page:
+            mapped = map_scraped_item(item, *MAPPING, 'twitter')
+            if mapped is not None:
+                rows.append(mapped)
+    return rows
+
+
+def run_vectorized(items, page_size):
+    frames = [build_scraped_frame(page, *MAPPING, 'twitter') for page in pages(items, page_size)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def timed(label, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {elapsed:8.2f}s  {len(result)} rows")
+    return result, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark scraped item mapping')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    items = synthetic_tweets(args.rows)
+    print(f"Mapping {len(items)} synthetic tweets in pages of {args.page_size}")
+
+    loop_rows, loop_time = timed('per-item', run_loop, items, args.page_size)
+    vector_rows, vector_time = timed('vectorized', run_vectorized, items, args.page_size)
+
+    columns = ['username', 'content', 'url', 'likes', 'retweets', 'replies', 'shares', 'views', 'comments']
+    vector_rows = vector_rows.to_dict(orient='records')
+    mismatches = sum(
+        1 for expected, actual in zip(loop_rows, vector_rows)
+        if any(expected[column] != actual[column] for column in columns)
+    )
+    if len(loop_rows) != len(vector_rows) or mismatches:
+        print(f"MISMATCH: {len(loop_rows)} vs {len(vector_rows)} rows, {mismatches} differing rows")
+        sys.exit(1)
+    print(f"Speedup: {loop_time / vector_time:.1f}x")
@@ -0,0 +1,385 @@
+"""
+Server Apify API v2 palsu untuk load test dan integration test tanpa kredensial maupun jaringan.
+
+Endpoint yang didukung (subset yang dipakai ApifyService):
+    POST /v2/acts/<actorId>/runs          mulai run (termasuk webhook ad-hoc lewat ?webhooks=)
+    GET  /v2/actor-runs/<runId>            status run
+    POST /v2/actor-runs/<runId>/abort      batalkan run
+    GET  /v2/datasets/<datasetId>          info dataset (itemCount)
+    GET  /v2/datasets/<datasetId>/items    item dengan offset/limit
+
+Item dibuat secara deterministik saat diminta (tidak disimpan) dengan bentuk output actor
+Twitter/TikTok/Facebook (platform ditebak dari actor ID), sehingga volume besar tidak memakan
+memori. Jumlah item per run diambil dari --items atau dari input actor (maxItems/postNumber/
+maxResults); item "ter-scrape" dengan laju --items-per-second lalu run selesai dan webhook dikirim.
+
+    python src/backend/tests/fake_apify_server.py --port 8765 --items 100000 --latency-ms 50
+    APIFY_BASE_URL=http://127.0.0.1:8765/v2 APIFY_API_TOKEN=fake flask run
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_apify_webhook import build_payload, EVENT_TYPES
+
+DEFAULT_ITEMS = 100
+MAX_ITEMS_PER_REQUEST = 250000
+
+SAMPLE_TEXTS = [
+    "Pemerintah mengumumkan program baru soal {keyword} untuk daerah terpencil #{i}",
+    "RT @akun{i} kajian rutin malam ini membahas {keyword}, semua diundang hadir",
+    "Harga bahan pokok naik lagi, warga mengeluh soal {keyword} di pasar {i}",
+    "Nonton bola bareng di alun-alun nanti malam, jangan lupa {keyword} {i}",
+    "Menurut saya {keyword} perlu dibahas lebih serius oleh semua pihak ({i})",
+]
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def detect_platform(actor_id):
+    actor = actor_id.lower()
+    if 'tiktok' in actor:
+        return 'tiktok'
+    if 'facebook' in actor:
+        return 'facebook'
+    return 'twitter'
+
+
+def requested_items(input_data):
+    for key in ('maxItems', 'postNumber', 'resultsPerPage', 'maxResults'):
+        if input_data.get(key):
+            return int(input_data[key])
+    return None
+
+
+def input_keyword(input_data):
+    for key in ('searchTerms', 'hashtags', 'searchQueries', 'profiles'):
+        if input_data.get(key):
+            return str(input_data[key][0]).split(' lang:')[0]
+    return str(input_data.get('query') or 'berita')
+
+
+def synthetic_item(platform, dataset_id, index, keyword):
+    """Satu item hasil scraping sintetis; sama untuk (dataset_id, index) yang sama"""
+    rng = random.Random(f"{dataset_id}:{index}")
+    user = f"user{rng.randrange(5000)}"
+    text = rng.choice(SAMPLE_TEXTS).format(keyword=keyword, i=index)
+    post_id = str(1700000000000000000 + rng.randrange(10 ** 15))
+
+    if platform == 'tiktok':
+        return {
+            'id': post_id,
+            'text': text,
+            'createTimeISO': _now_iso(),
+            'authorMeta': {'id': str(rng.randrange(10 ** 12)), 'name': user, 'nickName': user.title()},
+            'webVideoUrl': f"https://www.tiktok.com/@{user}/video/{post_id}",
+            'diggCount': rng.randrange(10000),
+            'shareCount': rng.randrange(500),
+            'playCount': rng.randrange(100000),
+            'commentCount': rng.randrange(1000),
+            'hashtags': [{'name': keyword.lstrip('#')}],
+        }
+    if platform == 'facebook':
+        return {
+            'post_id': post_id,
+            'message': text,
+            'timestamp': int(time.time()),
+            'author': {'id': str(rng.randrange(10 ** 12)), 'name': user},
+            'url': f"https://www.facebook.com/{user}/posts/{post_id}",
+            'reactions_count': rng.randrange(5000),
+            'comments_count': rng.randrange(500),
+            'reshare_count': rng.randrange(200),
+        }
+    return {
+        'type': 'tweet',
+        'id': post_id,
+        'text': text,
+        'url': f"https://x.com/{user}/status/{post_id}",
+        'createdAt': datetime.now(timezone.utc).strftime('%a %b %d %H:%M:%S +0000 %Y'),
+        'lang': 'in',
+        'author': {'userName': user, 'name': user.title(), 'followers': rng.randrange(100000)},
+        'likeCount': rng.randrange(10000),
+        'retweetCount': rng.randrange(1000),
+        'replyCount': rng.randrange(500),
+        'viewCount': rng.randrange(100000),
+    }
+
+
+class FakeApify:
+    """
+    State run dan dataset palsu.
+
+    items: jumlah item per run (None = ikuti input actor); items_per_second: laju scraping
+    (0 = langsung selesai); latency: detik per request; error_rate: peluang jawaban 503 sementara;
+    final_status: status akhir run yang selesai; token: jika diisi, request harus memakai token ini.
+    """
+
+    def __init__(self, items=None, items_per_second=500.0, latency=0.0, error_rate=0.0,
+                 final_status='SUCCEEDED', token=None):
+        self.items = items
+        self.items_per_second = items_per_second
+        self.latency = latency
+        self.error_rate = error_rate
+        self.final_status = final_status
+        self.token = token
+        self.runs = {}
+        self.datasets = {}
+        self._lock = threading.Lock()
+
+    def start_run(self, actor_id, input_data, webhooks=None):
+        total = self.items if self.items is not None else (requested_items(input_data) or DEFAULT_ITEMS)
+        run = {
+            'id': uuid.uuid4().hex[:17],
+            'actor_id': actor_id,
+            'platform': detect_platform(actor_id),
+            'keyword': input_keyword(input_data),
+            'dataset_id': uuid.uuid4().hex[:17],
+            'total': total,
+            'started': time.monotonic(),
+            'started_at': _now_iso(),
+            'finished_at': None,
+            'aborted': False,
+            'webhooks': webhooks or [],
+            'notified': False,
+        }
+        with self._lock:
+            self.runs[run['id']] = run
+            self.datasets[run['dataset_id']] = run
+
+        duration = total / self.items_per_second if self.items_per_second else 0
+        timer = threading.Timer(duration, self._finish, args=(run,))
+        timer.daemon = True
+        timer.start()
+        return run
+
+    def item_count(self, run):
+        if not self.items_per_second:
+            return run['total']
+        scraped = int((time.monotonic() - run['started']) * self.items_per_second)
+        if run['aborted']:
+            scraped = min(scraped, run['aborted_at_count'])
+        return min(run['total'], scraped)
+
+    def status(self, run):
+        if run['aborted']:
+            return 'ABORTED'
+        if self.item_count(run) >= run['total']:
+            return self.final_status
+        return 'RUNNING'
+
+    def abort(self, run):
+        if self.status(run) == 'RUNNING':
+            run['aborted_at_count'] = self.item_count(run)
+            run['aborted'] = True
+            self._finish(run)
+        return run
+
+    def _finish(self, run):
+        with self._lock:
+            if run['notified']:
+                return
+            run['notified'] = True
+            run['finished_at'] = _now_iso()
+        status = self.status(run)
+        for webhook in run['webhooks']:
+            if EVENT_TYPES.get(status) in webhook.get('eventTypes', []):
+                self._send_webhook(webhook, run, status)
+
+    def _send_webhook(self, webhook, run, status):
+        payload = build_payload(run['id'], status, run['dataset_id'], run['actor_id'])
+        headers = {'Content-Type': 'application/json'}
+        headers.update(json.loads(webhook.get('headersTemplate') or '{}'))
+        request = urllib.request.Request(webhook['requestUrl'], data=json.dumps(payload).encode('utf-8'),
+                                         headers=headers, method='POST')
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except Exception as e:
+            print(f"Webhook for run {run['id']} to {webhook['requestUrl']} failed: {e}", file=sys.stderr)
+
+    def run_data(self, run):
+        status = self.status(run)
+        count = self.item_count(run)
+        return {
+            'id': run['id'],
+            'actId': run['actor_id'],
+            'status': status,
+            'startedAt': run['started_at'],
+            'finishedAt': run['finished_at'] if status != 'RUNNING' else None,
+            'defaultDatasetId': run['dataset_id'],
+            'stats': {'requestsFinished': count, 'requestsTotal': run['total']},
+        }
+
+    def dataset_data(self, run):
+        count = self.item_count(run)
+        return {
+            'id': run['dataset_id'],
+            'actId': run['actor_id'],
+            'actRunId': run['id'],
+            'itemCount': count,
+            'cleanItemCount': count,
+            'createdAt': run['started_at'],
+            'modifiedAt': _now_iso(),
+        }
+
+    def dataset_items(self, run, offset, limit):
+        count = self.item_count(run)
+        end = min(count, offset + min(limit, MAX_ITEMS_PER_REQUEST))
+        return count, [
+            synthetic_item(run['platform'], run['dataset_id'], index, run['keyword'])
+            for index in range(offset, end)
+        ]
+
+
+def _decode_webhooks(value):
+    if not value:
+        return []
+    return json.loads(base64.b64decode(value).decode('utf-8'))
+
+
+class FakeApifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None  # FakeApify, diisi oleh make_server
+
+    routes = [
+        ('POST', re.compile(r'^/v2/acts/([^/]+)/runs$'), 'start_run'),
+        ('GET', re.compile(r'^/v2/actor-runs/([^/]+)$'), 'get_run'),
+        ('POST', re.compile(r'^/v2/actor-runs/([^/]+)/abort$'), 'abort_run'),
+        ('GET', re.compile(r'^/v2/datasets/([^/]+)$'), 'get_dataset'),
+        ('GET', re.compile(r'^/v2/datasets/([^/]+)/items$'), 'get_items'),
+    ]
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status, error_type, message):
+        self._send(status, {'error': {'type': error_type, 'message': message}})
+
+    def _dispatch(self):
+        fake = type(self).fake
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if fake.latency:
+            time.sleep(fake.latency * random.uniform(0.5, 1.5))
+        if fake.error_rate and random.random() < fake.error_rate:
+            return self._error(503, 'server-error', 'Injected temporary error')
+        if fake.token and query.get('token') != fake.token:
+            return self._error(401, 'token-not-valid', 'Authentication token is not valid.')
+
+        for method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if method == self.command and match:
+                return getattr(self, handler)(match.group(1), query, body)
+        return self._error(404, 'page-not-found', f"{self.command} {url.path} is not supported by the fake server")
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+    def _lookup(self, table, key):
+        record = table.get(key)
+        if record is None:
+            self._error(404, 'record-not-found', f"Record {key} was not found")
+        return record
+
+    def start_run(self, actor_id, query, body):
+        input_data = json.loads(body or b'{}')
+        run = type(self).fake.start_run(actor_id.replace('~', '/'), input_data, _decode_webhooks(query.get('webhooks')))
+        self._send(201, {'data': type(self).fake.run_data(run)})
+
+    def get_run(self, run_id, query, body):
+        run = self._lookup(type(self).fake.runs, run_id)
+        if run:
+            self._send(200, {'data': type(self).fake.run_data(run)})
+
+    def abort_run(self, run_id, query, body):
+        run = self._lookup(type(self).fake.runs, run_id)
+        if run:
+            self._send(200, {'data': type(self).fake.run_data(type(self).fake.abort(run))})
+
+    def get_dataset(self, dataset_id, query, body):
+        run = self._lookup(type(self).fake.datasets, dataset_id)
+        if run:
+            self._send(200, {'data': type(self).fake.dataset_data(run)})
+
+    def get_items(self, dataset_id, query, body):
+        run = self._lookup(type(self).fake.datasets, dataset_id)
+        if not run:
+            return
+        offset = int(query.get('offset') or 0)
+        limit = int(query.get('limit') or MAX_ITEMS_PER_REQUEST)
+        total, items = type(self).fake.dataset_items(run, offset, limit)
+        self._send(200, items, headers={
+            'X-Apify-Pagination-Offset': offset,
+            'X-Apify-Pagination-Limit': limit,
+            'X-Apify-Pagination-Count': len(items),
+            'X-Apify-Pagination-Total': total,
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(fake=None, host='127.0.0.1', port=0):
+    """ThreadingHTTPServer yang menjawab sebagai Apify; base URL API ada di server.base_url"""
+    handler = type('BoundFakeApifyHandler', (FakeApifyHandler,), {'fake': fake or FakeApify()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.fake = handler.fake
+    server.base_url = f"http://{host}:{server.server_address[1]}/v2"
+    return server
+
+
+def start_server(fake=None, host='127.0.0.1', port=0):
+    """Jalankan server di thread background (untuk test); hentikan dengan server.shutdown()"""
+    server = make_server(fake, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a fake Apify API v2 server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--items', type=int, help='Items per run (default: maxItems/postNumber/maxResults from the actor input)')
+    parser.add_argument('--items-per-second', type=float, default=500.0, help='Scraping speed per run; 0 finishes runs immediately')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Average latency added to every request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a temporary 503')
+    parser.add_argument('--final-status', default='SUCCEEDED', choices=['SUCCEEDED', 'FAILED', 'TIMED-OUT'])
+    parser.add_argument('--token', help='Require this API token (any token is accepted by default)')
+    args = parser.parse_args()
+
+    fake = FakeApify(items=args.items, items_per_second=args.items_per_second, latency=args.latency_ms / 1000,
+                     error_rate=args.error_rate, final_status=args.final_status, token=args.token)
+    server = make_server(fake, args.host, args.port)
+    print(f"Fake Apify API listening on {server.base_url} (set APIFY_BASE_URL to this URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
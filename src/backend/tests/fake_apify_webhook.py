@@ -0,0 +1,71 @@
+"""
+Pengirim webhook Apify palsu untuk pengujian lokal receiver /api/scraping/webhook/apify.
+
+Payload mengikuti format default webhook Apify (eventType, eventData, resource = objek run).
+Token diambil dari APIFY_WEBHOOK_SECRET kecuali diberikan lewat --secret.
+
+    python src/backend/tests/fake_apify_webhook.py --run-id <external_id> --status SUCCEEDED \\
+        --dataset-id <apify_dataset_id> --url http://localhost:5000/api/scraping/webhook/apify
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+WEBHOOK_TOKEN_HEADER = 'X-Apify-Webhook-Token'
+EVENT_TYPES = {
+    'SUCCEEDED': 'ACTOR.RUN.SUCCEEDED',
+    'FAILED': 'ACTOR.RUN.FAILED',
+    'ABORTED': 'ACTOR.RUN.ABORTED',
+    'TIMED-OUT': 'ACTOR.RUN.TIMED_OUT',
+}
+
+
+def build_payload(run_id, status='SUCCEEDED', dataset_id=None, actor_id='fake-actor'):
+    now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    return {
+        'userId': 'fake-user',
+        'createdAt': now,
+        'eventType': EVENT_TYPES[status],
+        'eventData': {'actorId': actor_id, 'actorRunId': run_id},
+        'resource': {
+            'id': run_id,
+            'actId': actor_id,
+            'status': status,
+            'startedAt': now,
+            'finishedAt': now,
+            'defaultDatasetId': dataset_id or f"{run_id}-dataset",
+        },
+    }
+
+
+def send_webhook(url, secret, payload, timeout=10):
+    """POST payload ke receiver; returns (status_code, body dict)"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json', WEBHOOK_TOKEN_HEADER: secret},
+        method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b'{}')
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Send a fake Apify run webhook')
+    parser.add_argument('--url', default='http://localhost:5000/api/scraping/webhook/apify')
+    parser.add_argument('--run-id', required=True, help='Apify run ID (Dataset.external_id)')
+    parser.add_argument('--status', default='SUCCEEDED', choices=sorted(EVENT_TYPES))
+    parser.add_argument('--dataset-id', help='Apify default dataset ID')
+    parser.add_argument('--secret', default=os.environ.get('APIFY_WEBHOOK_SECRET', ''))
+    args = parser.parse_args()
+
+    status_code, body = send_webhook(args.url, args.secret, build_payload(args.run_id, args.status, args.dataset_id))
+    print(status_code, json.dumps(body))
+    sys.exit(0 if status_code == 200 else 1)
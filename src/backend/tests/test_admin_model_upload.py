@@ -0,0 +1,159 @@
+"""Chunked admin model upload: whole-file checksum, missing chunks and reading the IndoBERT ZIP from its parts."""
+import hashlib
+import io
+import os
+import sys
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('flask_login')
+
+from flask import Flask
+
+import utils.utils
+from blueprints import admin
+from services.chunk_upload_service import save_chunk
+
+UPLOAD_ID = 'e2c1b9a4-6f0d-4c55-9d7e-3b8a1f2c4d5e'
+
+
+class ActivitySession:
+    def __init__(self):
+        self.added = []
+
+    def add(self, activity):
+        self.added.append(activity)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def remove(self):
+        pass
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    app.config['MODEL_SVM_PATH'] = str(tmp_path / 'models' / 'svm_model.joblib')
+    app.config['MODEL_INDOBERT_PATH'] = str(tmp_path / 'models' / 'indobert')
+    app.config['LOGIN_DISABLED'] = True
+    app.register_blueprint(admin.admin_bp)
+
+    session = ActivitySession()
+    monkeypatch.setattr(admin, 'db', SimpleNamespace(session=session))
+    monkeypatch.setattr(admin, 'UserActivity', lambda **fields: fields)
+    monkeypatch.setattr(utils.utils, 'current_user', SimpleNamespace(is_authenticated=True, is_admin=lambda: True))
+    monkeypatch.setattr(admin, 'upload_tasks', {})
+    app.activities = session.added
+
+    with app.app_context():
+        yield app
+
+
+def _start_upload(app, parts):
+    """Session directory as upload_init creates it, with the given chunks stored"""
+    temp_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'temp_chunks', UPLOAD_ID)
+    os.makedirs(temp_dir)
+    for index, data in parts.items():
+        save_chunk(temp_dir, index, io.BytesIO(data))
+    admin.upload_tasks[UPLOAD_ID] = {'status': 'uploading', 'progress': 0, 'temp_dir': temp_dir}
+    return temp_dir
+
+
+def _split(data, size):
+    return {index: data[start:start + size] for index, start in enumerate(range(0, len(data), size))}
+
+
+def test_model_is_installed_from_its_chunks(app):
+    data = os.urandom(3000)
+    temp_dir = _start_upload(app, _split(data, 1024))
+
+    admin.process_generic_model_upload(UPLOAD_ID, temp_dir, 'svm.joblib', 'svm', 1,
+                                       hashlib.sha256(data).hexdigest())
+
+    target = app.config['MODEL_SVM_PATH']
+    assert admin.upload_tasks[UPLOAD_ID]['status'] == 'completed'
+    with open(target, 'rb') as handle:
+        assert handle.read() == data
+    assert not os.path.exists(f'{target}.{UPLOAD_ID}.upload') and not os.path.exists(temp_dir)
+    assert app.activities[0]['details'] == 'Filename: svm.joblib'
+
+
+def test_checksum_mismatch_is_rejected(app):
+    temp_dir = _start_upload(app, _split(os.urandom(3000), 1024))
+
+    admin.process_generic_model_upload(UPLOAD_ID, temp_dir, 'svm.joblib', 'svm', 1, 'ab' * 32)
+
+    task = admin.upload_tasks[UPLOAD_ID]
+    target = app.config['MODEL_SVM_PATH']
+    assert task['status'] == 'failed' and 'checksum' in task['error'].lower()
+    assert not os.path.exists(target) and not os.path.exists(f'{target}.{UPLOAD_ID}.upload')
+    assert app.activities == []
+
+
+def test_missing_chunk_is_rejected(app):
+    temp_dir = _start_upload(app, {0: b'a' * 10, 2: b'c' * 10})
+
+    admin.process_generic_model_upload(UPLOAD_ID, temp_dir, 'svm.joblib', 'svm', 1)
+
+    task = admin.upload_tasks[UPLOAD_ID]
+    target = app.config['MODEL_SVM_PATH']
+    assert task['status'] == 'failed' and 'Missing file chunks: [1]' in task['error']
+    assert not os.path.exists(target) and not os.path.exists(f'{target}.{UPLOAD_ID}.upload')
+
+
+def test_indobert_zip_is_read_from_the_parts(app, monkeypatch):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('indobert-base/config.json', '{"hidden_size": 768}')
+        zip_file.writestr('indobert-base/vocab.txt', 'kata\n' * 2000)
+    data = archive.getvalue()
+    temp_dir = _start_upload(app, _split(data, 1000))
+
+    def assemble_chunks(*args, **kwargs):
+        raise AssertionError('IndoBERT uploads must not be assembled to disk')
+
+    monkeypatch.setattr(admin, 'assemble_chunks', assemble_chunks)
+    admin.process_indobert_upload(UPLOAD_ID, temp_dir, 'indobert.zip', 1, hashlib.sha256(data).hexdigest())
+
+    indobert_path = app.config['MODEL_INDOBERT_PATH']
+    assert admin.upload_tasks[UPLOAD_ID]['status'] == 'completed'
+    assert sorted(os.listdir(indobert_path)) == ['config.json', 'vocab.txt']  # root folder stripped
+    with open(os.path.join(indobert_path, 'vocab.txt')) as handle:
+        assert handle.read() == 'kata\n' * 2000
+    assert not os.path.exists(temp_dir)
+
+
+def test_indobert_checksum_mismatch_keeps_the_installed_model(app):
+    indobert_path = app.config['MODEL_INDOBERT_PATH']
+    os.makedirs(indobert_path)
+    with open(os.path.join(indobert_path, 'config.json'), 'w') as handle:
+        handle.write('{}')
+    temp_dir = _start_upload(app, {0: b'PK not really a zip'})
+
+    admin.process_indobert_upload(UPLOAD_ID, temp_dir, 'indobert.zip', 1, 'ab' * 32)
+
+    assert admin.upload_tasks[UPLOAD_ID]['status'] == 'failed'
+    assert os.listdir(indobert_path) == ['config.json']
+
+
+def test_stored_chunks_are_listed_for_resume(app):
+    parts = {0: b'first', 1: b'second'}
+    _start_upload(app, parts)
+    client = app.test_client()
+
+    response = client.get(f'/admin/upload/{UPLOAD_ID}/chunks')
+    assert response.status_code == 200
+    assert response.get_json()['received'] == {
+        str(index): hashlib.sha256(data).hexdigest() for index, data in parts.items()
+    }
+    assert client.get('/admin/upload/unknown/chunks').status_code == 404
@@ -0,0 +1,152 @@
+"""Retry, timeout and connection reuse of the shared Apify client against a local stub server."""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('flask')
+
+from flask import Flask
+
+from services import apify_client
+from services.apify_client import ApifyClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # path -> list of (status, body, delay) answered in order; the last one repeats
+    script = {}
+    calls = []
+    peers = set()
+
+    def _answer(self):
+        type(self).calls.append((self.command, self.path.split('?')[0]))
+        type(self).peers.add(self.client_address)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        responses = type(self).script[self.path.split('?')[0]]
+        status, body, delay = responses.pop(0) if len(responses) > 1 else responses[0]
+        if delay:
+            threading.Event().wait(delay)
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _answer
+    do_POST = _answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    StubHandler.script = {}
+    StubHandler.calls = []
+    StubHandler.peers = set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield StubHandler, f"http://127.0.0.1:{server.server_address[1]}/v2"
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(base_url, **kwargs):
+    kwargs.setdefault('backoff_factor', 0.01)
+    return ApifyClient(base_url=base_url, **kwargs)
+
+
+def test_retries_get_on_5xx_and_429(stub):
+    handler, base_url = stub
+    handler.script['/v2/actor-runs/abc'] = [
+        (503, {}, 0), (429, {}, 0), (200, {'data': {'status': 'RUNNING'}}, 0)
+    ]
+    client = make_client(base_url)
+
+    response = client.get('actor-runs/abc')
+
+    assert response.status_code == 200
+    assert response.json()['data']['status'] == 'RUNNING'
+    assert len(handler.calls) == 3
+
+
+def test_retries_are_bounded(stub):
+    handler, base_url = stub
+    handler.script['/v2/actor-runs/abc'] = [(500, {}, 0)]
+    client = make_client(base_url, max_retries=2)
+
+    response = client.get('actor-runs/abc')
+
+    assert response.status_code == 500
+    assert len(handler.calls) == 3
+
+
+def test_post_is_not_retried_on_500(stub):
+    handler, base_url = stub
+    handler.script['/v2/acts/actor/runs'] = [(500, {}, 0), (201, {'data': {'id': 'run'}}, 0)]
+    client = make_client(base_url)
+
+    response = client.post('acts/actor/runs', json={})
+
+    assert response.status_code == 500
+    assert len(handler.calls) == 1
+
+
+def test_read_timeout(stub):
+    handler, base_url = stub
+    handler.script['/v2/datasets/slow'] = [(200, {}, 1)]
+    client = make_client(base_url, read_timeout=0.2, max_retries=0)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.get('datasets/slow')
+
+
+def test_connections_are_reused(stub):
+    handler, base_url = stub
+    handler.script['/v2/actor-runs/abc'] = [(200, {'data': {}}, 0)]
+    client = make_client(base_url)
+
+    for _ in range(5):
+        client.get('actor-runs/abc').json()
+
+    assert len(handler.calls) == 5
+    assert len(handler.peers) == 1
+
+
+@pytest.fixture
+def shared_client():
+    apify_client.reset_client()
+    yield
+    apify_client.reset_client()
+
+
+def test_shared_client_follows_app_config(shared_client, monkeypatch):
+    monkeypatch.delenv('APIFY_BASE_URL', raising=False)
+    app = Flask(__name__)
+    app.config['APIFY_BASE_URL'] = 'http://127.0.0.1:9/v2'
+    app.config['APIFY_TIMEOUT'] = 2
+
+    # Callers without an app context get the environment defaults
+    assert apify_client.get_client().base_url == apify_client.DEFAULT_BASE_URL
+
+    with app.app_context():
+        client = apify_client.get_client()
+        assert client.base_url == 'http://127.0.0.1:9/v2' and client.timeout[1] == 2.0
+        assert apify_client.get_client(app.config) is client
+
+        app.config['APIFY_TIMEOUT'] = 5
+        rebuilt = apify_client.get_client()
+        assert rebuilt is not client and rebuilt.timeout[1] == 5.0
@@ -0,0 +1,147 @@
+"""Apify run webhook receiver, driven by the fake webhook sender payloads."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('flask_sqlalchemy')
+
+from flask import Flask
+
+from models.models import db, User, Dataset
+from blueprints.api import api_bp
+import services.scraping_service as scraping_service
+from fake_apify_webhook import build_payload, WEBHOOK_TOKEN_HEADER
+
+SECRET = 'test-webhook-secret'
+URL = '/api/scraping/webhook/apify'
+
+
+class RecordingThread(threading.Thread):
+    """Real thread that is remembered so the test can wait for the follow-up job"""
+    started = []
+
+    def start(self):
+        type(self).started.append(self)
+        super().start()
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    app = Flask(__name__)
+    # File database: the follow-up thread uses its own connection and only sees committed rows
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'webhook.db'}"
+    app.config['TESTING'] = True
+    app.config['APIFY_WEBHOOK_URL'] = 'https://example.com/api/scraping/webhook/apify'
+    app.config['APIFY_WEBHOOK_SECRET'] = SECRET
+    db.init_app(app)
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    followups = []
+
+    def record_followup(app, dataset_id):
+        # What process_finished_run would read when it starts
+        with app.app_context():
+            dataset = db.session.get(Dataset, dataset_id)
+            followups.append((dataset_id, dict(dataset.meta_info)))
+            db.session.remove()
+
+    RecordingThread.started = []
+    monkeypatch.setattr(scraping_service.threading, 'Thread', RecordingThread)
+    monkeypatch.setattr(scraping_service, 'process_finished_run', record_followup)
+    app.followups = followups
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _wait_followups():
+    for thread in RecordingThread.started:
+        thread.join(5)
+
+
+def _seed_scraping_dataset(run_id='run-1'):
+    user = User(username='tester', email='tester@example.com', password_hash='x', role='admin')
+    db.session.add(user)
+    db.session.flush()
+    dataset = Dataset(name='Scraping Twitter - uji', uploaded_by=user.id, status='Raw', total_records=0,
+                      external_id=run_id, meta_info={'apify_run_id': run_id, 'apify_dataset_id': 'ds-1'})
+    db.session.add(dataset)
+    db.session.commit()
+    return dataset.id
+
+
+def _post(client, payload, secret=SECRET):
+    return client.post(URL, json=payload, headers={WEBHOOK_TOKEN_HEADER: secret})
+
+
+def test_rejects_invalid_token(app):
+    _seed_scraping_dataset()
+    response = _post(app.test_client(), build_payload('run-1', 'SUCCEEDED', 'ds-1'), secret='wrong')
+    assert response.status_code == 403
+    assert app.followups == []
+
+
+def test_rejected_while_webhooks_disabled(app):
+    _seed_scraping_dataset()
+    app.config['APIFY_WEBHOOK_URL'] = None
+    response = _post(app.test_client(), build_payload('run-1', 'SUCCEEDED', 'ds-1'))
+    assert response.status_code == 404
+    assert app.followups == []
+
+
+def test_succeeded_run_updates_dataset_once(app):
+    dataset_id = _seed_scraping_dataset()
+    client = app.test_client()
+
+    response = _post(client, build_payload('run-1', 'SUCCEEDED', 'ds-1'))
+    assert response.status_code == 200
+    assert response.get_json()['handled'] is True
+    _wait_followups()
+
+    dataset = db.session.get(Dataset, dataset_id)
+    assert dataset.status == 'Raw'
+    assert dataset.meta_info['apify_status'] == 'SUCCEEDED'
+    assert [dataset_id for dataset_id, _ in app.followups] == [dataset_id]
+
+    # Apify retries deliveries; a repeated event must not start a second import
+    response = _post(client, build_payload('run-1', 'SUCCEEDED', 'ds-1'))
+    assert response.get_json()['handled'] is False
+    _wait_followups()
+    assert len(app.followups) == 1
+
+
+def test_followup_starts_after_commit(app):
+    dataset_id = _seed_scraping_dataset()
+    db.session.get(Dataset, dataset_id).meta_info = {'apify_run_id': 'run-1'}
+    db.session.commit()
+
+    _post(app.test_client(), build_payload('run-1', 'SUCCEEDED', 'ds-2'))
+    _wait_followups()
+
+    # The job sees the committed final status and the dataset id taken from the event
+    (followup_id, meta_info), = app.followups
+    assert followup_id == dataset_id
+    assert meta_info['apify_status'] == 'SUCCEEDED'
+    assert meta_info['apify_dataset_id'] == 'ds-2'
+
+
+def test_failed_run_marks_dataset_failed(app):
+    dataset_id = _seed_scraping_dataset()
+    response = _post(app.test_client(), build_payload('run-1', 'TIMED-OUT', 'ds-1'))
+    assert response.status_code == 200
+    assert db.session.get(Dataset, dataset_id).status == 'Failed'
+    assert app.followups == []
+
+
+def test_unknown_run_is_acknowledged(app):
+    response = _post(app.test_client(), build_payload('missing-run', 'SUCCEEDED'))
+    assert response.status_code == 200
+    assert response.get_json()['handled'] is False
@@ -0,0 +1,47 @@
+"""Single-flight cache lock handling against an in-memory stand-in for the Redis client."""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils import cache_utils
+
+
+class FakeRedis:
+    """get/set NX and the compare-and-delete release script, enough for _redis_get_or_compute"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, nx=False, ex=None, px=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        assert script == cache_utils._RELEASE_LOCK_SCRIPT
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+
+
+def test_lock_is_released_by_its_owner():
+    client = FakeRedis()
+    assert cache_utils._redis_get_or_compute(client, 'k', 5, lambda: {'n': 1}) == {'n': 1}
+    assert 'k:lock' not in client.store
+    assert cache_utils._redis_get_or_compute(client, 'k', 5, lambda: {'n': 2}) == {'n': 1}
+
+
+def test_lock_of_another_worker_is_kept_after_deadline(monkeypatch):
+    monkeypatch.setattr(cache_utils, 'LOCK_TIMEOUT', 0)
+    monkeypatch.setattr(cache_utils, 'WAIT_INTERVAL', 0)
+    client = FakeRedis()
+    client.store['k:lock'] = 'other-worker'
+
+    assert cache_utils._redis_get_or_compute(client, 'k', 0, lambda: 'fresh') == 'fresh'
+    assert client.store['k:lock'] == 'other-worker'
@@ -0,0 +1,145 @@
+"""Chunked upload sessions: stored chunks, missing chunks and reading a session as one file."""
+import hashlib
+import io
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('werkzeug')
+
+from services.chunk_upload_service import (
+    save_chunk, missing_chunks, chunk_paths, open_upload, received_chunks, assemble_chunks, upload_checksum,
+    upload_size, ChunkedFileReader, ChunkChecksumError, create_session, find_session, delete_session, sweep_sessions,
+    chunk_root
+)
+
+PARTS = {0: b'content,username\n', 1: b'', 2: b'banjir di kota,andi\nharga naik,budi\n', 3: b'x' * 70}
+DATA = b''.join(PARTS[index] for index in sorted(PARTS))
+
+
+def _save(session_dir, chunks):
+    for index, data in chunks.items():
+        save_chunk(str(session_dir), index, io.BytesIO(data))
+
+
+def test_gaps_are_missing_without_total(tmp_path):
+    _save(tmp_path, {0: b'a,b\n', 2: b'3,4\n'})
+
+    assert missing_chunks(str(tmp_path)) == [1]
+    assert missing_chunks(str(tmp_path), 4) == [1, 3]
+    with pytest.raises(ValueError):
+        chunk_paths(str(tmp_path))
+    with pytest.raises(ValueError):
+        open_upload(str(tmp_path))
+
+
+def test_missing_chunks_with_total(tmp_path):
+    assert missing_chunks(str(tmp_path)) == []
+    assert missing_chunks(str(tmp_path), 3) == [0, 1, 2]
+    _save(tmp_path, {1: b'b', 0: b'a'})
+    assert missing_chunks(str(tmp_path), 3) == [2]
+    assert missing_chunks(str(tmp_path), 2) == []
+    assert missing_chunks(str(tmp_path)) == []
+
+
+def test_chunks_are_stored_with_checksums(tmp_path):
+    checksum = save_chunk(str(tmp_path), 0, io.BytesIO(b'abc'), hashlib.sha256(b'abc').hexdigest().upper())
+    assert received_chunks(str(tmp_path)) == {0: checksum}
+
+    with pytest.raises(ChunkChecksumError):
+        save_chunk(str(tmp_path), 1, io.BytesIO(b'abc'), hashlib.sha256(b'other').hexdigest())
+    with pytest.raises(ValueError):
+        save_chunk(str(tmp_path), -1, io.BytesIO(b'abc'))
+    assert missing_chunks(str(tmp_path), 2) == [1]
+    assert sorted(os.listdir(tmp_path)) == ['checksum_0', 'part_0']  # no temp files left behind
+
+
+def test_reader_reads_parts_as_one_file(tmp_path):
+    _save(tmp_path, PARTS)
+
+    with open_upload(str(tmp_path)) as handle:
+        assert handle.read() == DATA
+    assert upload_size(str(tmp_path)) == len(DATA)
+    assert upload_checksum(str(tmp_path)) == hashlib.sha256(DATA).hexdigest()
+
+
+def test_reader_seeks_across_part_boundaries(tmp_path):
+    _save(tmp_path, PARTS)
+    # Raw reads stop at part boundaries; buffered like in open_upload, reads span parts
+    reader = io.BufferedReader(ChunkedFileReader(chunk_paths(str(tmp_path))), buffer_size=8)
+    try:
+        for offset in (0, 5, len(PARTS[0]) - 1, len(PARTS[0]), len(DATA) - 3):
+            reader.seek(offset)
+            assert reader.read(10) == DATA[offset:offset + 10]
+            assert reader.tell() == min(offset + 10, len(DATA))
+
+        assert reader.seek(-4, io.SEEK_END) == len(DATA) - 4
+        assert reader.read() == DATA[-4:]
+        assert reader.read(1) == b''
+        reader.seek(2)
+        assert reader.seek(3, io.SEEK_CUR) == 5
+        with pytest.raises(ValueError):
+            reader.seek(-1)
+    finally:
+        reader.close()
+
+
+def test_assembled_file_matches_the_parts(tmp_path):
+    session_dir, target = tmp_path / 'session', tmp_path / 'data.csv'
+    session_dir.mkdir()
+    _save(session_dir, PARTS)
+    progress = []
+
+    assemble_chunks(str(session_dir), str(target), hashlib.sha256(DATA).hexdigest(),
+                    progress_callback=lambda done, total: progress.append((done, total)))
+    assert target.read_bytes() == DATA
+    assert progress[-1] == (4, 4)
+
+    assemble_chunks(str(session_dir), str(target))  # without checksum (os.sendfile where available)
+    assert target.read_bytes() == DATA
+
+    with pytest.raises(ChunkChecksumError):
+        assemble_chunks(str(session_dir), str(target), hashlib.sha256(b'other').hexdigest())
+    assert not target.exists()
+
+
+def test_sessions_are_found_by_upload_id(tmp_path):
+    upload_id, session_dir = create_session(str(tmp_path), 'data set.csv', 7, total_chunks=2, dataset_name='Uji')
+    _save(session_dir, {0: b'a,b\n'})
+
+    session = find_session(str(tmp_path), upload_id)
+    assert session['path'] == session_dir and session_dir.endswith('data_set.csv')
+    assert (session['user_id'], session['total_chunks'], session['dataset_name']) == (7, 2, 'Uji')
+    assert find_session(str(tmp_path), '0' * 32) is None
+    assert find_session(str(tmp_path), '../etc') is None
+
+    delete_session(session_dir)
+    assert os.listdir(chunk_root(str(tmp_path))) == []
+
+
+def _age(path, seconds):
+    stamp = time.time() - seconds
+    for directory, _, files in os.walk(path):
+        for entry in [directory] + [os.path.join(directory, name) for name in files]:
+            os.utime(entry, (stamp, stamp))
+
+
+def test_abandoned_sessions_are_swept(tmp_path):
+    upload_folder = str(tmp_path)
+    _, abandoned = create_session(upload_folder, 'lama.csv', 1)
+    _, pending_mapping = create_session(upload_folder, 'mapping.csv', 1)
+    _, active = create_session(upload_folder, 'aktif.csv', 1)
+    model_upload = os.path.join(chunk_root(upload_folder), 'f' * 32)  # admin model uploads have no session.json
+    os.makedirs(model_upload)
+    for path in (abandoned, pending_mapping, active, model_upload):
+        _save(path, {0: b'a,b\n'})
+    _age(chunk_root(upload_folder), 7200)
+    _save(active, {1: b'1,2\n'})  # still receiving chunks
+
+    assert sweep_sessions(upload_folder, 3600, keep_paths=[pending_mapping]) == 2
+    assert not os.path.exists(abandoned) and not os.path.exists(model_upload)
+    assert os.path.exists(pending_mapping) and os.path.exists(active)
@@ -0,0 +1,108 @@
+"""Query-count guard for the classification results page preview."""
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('flask_sqlalchemy')
+
+from flask import Flask
+from sqlalchemy import event
+
+from models.models import (
+    db, User, Dataset, RawData, RawDataScraper, CleanDataUpload, CleanDataScraper, ClassificationResult
+)
+from models.models_ensemble import ClassificationEnsemble
+from blueprints.classification import _build_dataset_preview
+
+MODELS = ['naive_bayes', 'svm', 'random_forest']
+ITEMS_PER_TYPE = 30
+
+# uploads, scrapers, selectin raw_data_scraper, results IN query, ensembles IN query
+MAX_PREVIEW_QUERIES = 5
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['TESTING'] = True
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _seed_dataset():
+    user = User(username='tester', email='tester@example.com', password_hash='x', role='admin')
+    db.session.add(user)
+    db.session.flush()
+
+    dataset = Dataset(name='Preview', uploaded_by=user.id, status='Classified', classified_records=ITEMS_PER_TYPE * 2)
+    db.session.add(dataset)
+    db.session.flush()
+
+    for i in range(ITEMS_PER_TYPE):
+        raw = RawData(username=f'u{i}', content=f'konten {i}', platform='twitter',
+                      dataset_id=dataset.id, uploaded_by=user.id)
+        raw_scraper = RawDataScraper(username=f's{i}', content=f'scrape {i}', platform='twitter',
+                                     keyword='uji', scrape_date=date.today(),
+                                     dataset_id=dataset.id, scraped_by=user.id)
+        db.session.add_all([raw, raw_scraper])
+        db.session.flush()
+
+        clean = CleanDataUpload(raw_data_id=raw.id, username=raw.username, content=raw.content,
+                                cleaned_content=raw.content, platform='twitter',
+                                dataset_id=dataset.id, cleaned_by=user.id)
+        clean_scraper = CleanDataScraper(raw_data_scraper_id=raw_scraper.id, username=raw_scraper.username,
+                                         content=raw_scraper.content, cleaned_content=raw_scraper.content,
+                                         platform='twitter', keyword='uji',
+                                         dataset_id=dataset.id, cleaned_by=user.id)
+        db.session.add_all([clean, clean_scraper])
+        db.session.flush()
+
+        for data_type, item in (('upload', clean), ('scraper', clean_scraper)):
+            for model_name in MODELS:
+                db.session.add(ClassificationResult(
+                    data_type=data_type, data_id=item.id, model_name=model_name,
+                    prediction='Radikal', probability_radikal=0.9, probability_non_radikal=0.1,
+                    classified_by=user.id
+                ))
+            db.session.add(ClassificationEnsemble(
+                data_type=data_type, data_id=item.id, dataset_id=dataset.id,
+                radikal_votes=len(MODELS), non_radikal_votes=0,
+                mean_probability_radikal=0.9, final_label='Radikal', classified_by=user.id
+            ))
+
+    db.session.commit()
+    return dataset.id
+
+
+def test_results_preview_query_count_is_constant(app):
+    dataset_id = _seed_dataset()
+    # Start from a clean identity map so relationships are not already loaded
+    db.session.expire_all()
+    dataset = db.session.get(Dataset, dataset_id)
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        preview = _build_dataset_preview(dataset, MODELS)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+    assert len(preview['data_items']) == ITEMS_PER_TYPE * 2
+    assert all(set(item['models']) == set(MODELS) for item in preview['data_items'])
+    assert all(item['consensus']['label'] == 'Radikal' for item in preview['data_items'])
+    assert len(statements) <= MAX_PREVIEW_QUERIES, (
+        f"results preview issued {len(statements)} SQL statements (limit {MAX_PREVIEW_QUERIES})"
+    )
@@ -0,0 +1,213 @@
+"""Cleaning service logic that needs no database (in-memory dedupe, parallel cleaning workers)."""
+import os
+import sys
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('pandas')
+pytest.importorskip('flask_sqlalchemy')
+
+from flask import Flask
+
+from services import cleaning_service
+from utils.utils import compute_content_hash
+
+RawRow = namedtuple('RawRow', 'id username content url platform dataset_id keyword')
+RAW_COLUMNS = RawRow._fields
+
+
+def _model(name):
+    """Stand-in model: class attributes for the queried columns and a query that counts nothing"""
+    attributes = {column: f'{name}.{column}' for column in RAW_COLUMNS + ('status',)}
+    attributes['query'] = SimpleNamespace(filter_by=lambda **criteria: SimpleNamespace(count=lambda: 0))
+    return type(name, (), attributes)
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def yield_per(self, count):
+        return iter(self.rows)
+
+
+class FakeSession:
+    def __init__(self, rows_by_id_column):
+        self.rows_by_id_column = rows_by_id_column
+
+    def query(self, *columns):
+        return FakeQuery(self.rows_by_id_column[columns[0]])
+
+    def flush(self):
+        pass
+
+
+def _row(row_id, content, keyword=None):
+    return RawRow(row_id, f'user{row_id}', content, f'https://example.com/{row_id}', 'twitter', 1, keyword)
+
+
+@pytest.fixture
+def cleaning(monkeypatch):
+    """Runs _clean_dataset over given raw rows; records inserted clean rows (per batch) and status updates"""
+    raw_upload, raw_scraper = _model('RawUpload'), _model('RawScraper')
+    recorded = {'inserted': [], 'batches': [], 'status': {}}
+
+    def insert_clean_rows(candidates):
+        recorded['batches'].append([raw_id for _, raw_id, _ in candidates])
+        recorded['inserted'].extend(candidates)
+
+    def run(uploads, scrapers, stored=(), clean_text=lambda text: (text or '').lower()):
+        session = FakeSession({raw_upload.id: uploads, raw_scraper.id: scrapers})
+        monkeypatch.setattr(cleaning_service, 'db', SimpleNamespace(session=session))
+        monkeypatch.setattr(cleaning_service, 'RAW_SOURCES', (
+            ('upload', raw_upload, _model('CleanUpload')),
+            ('scraper', raw_scraper, _model('CleanScraper')),
+        ))
+        monkeypatch.setattr(cleaning_service, 'CleanDataUpload', _model('CleanUpload'))
+        monkeypatch.setattr(cleaning_service, 'CleanDataScraper', _model('CleanScraper'))
+        monkeypatch.setattr(cleaning_service, 'clean_text', clean_text)
+        monkeypatch.setattr(cleaning_service, 'NearDuplicateIndex', SimpleNamespace(from_app_config=lambda dataset_id: None))
+        monkeypatch.setattr(cleaning_service, '_load_cleaned_content_keys',
+                            lambda dataset_id: {compute_content_hash(text) for text in stored})
+        monkeypatch.setattr(cleaning_service, '_insert_clean_rows', insert_clean_rows)
+        monkeypatch.setattr(cleaning_service, '_bulk_update_status',
+                            lambda model, ids, status: recorded['status'].setdefault((model.__name__, status), []).extend(ids))
+
+        dataset = SimpleNamespace(id=1, status='Raw', cleaned_records=0)
+        progress = []
+        result = cleaning_service._clean_dataset(dataset, 9, lambda *counts: progress.append(counts))
+        return result, dataset, progress
+
+    return run, recorded
+
+
+def test_duplicates_are_ignored_in_memory(cleaning):
+    run, recorded = cleaning
+    uploads = [
+        _row(1, 'Banjir di Jakarta'),
+        _row(2, ' banjir  di   JAKARTA '),  # same text once cleaned and normalized
+        _row(3, 'sudah dibersihkan sebelumnya'),  # stored clean content of this dataset
+        _row(4, ''),
+        _row(5, '   '),  # empty content is never a duplicate
+    ]
+    scrapers = [
+        _row(10, 'banjir di jakarta', keyword='banjir'),  # duplicate across sources
+        _row(11, 'Harga beras naik', keyword='harga'),
+    ]
+
+    (cleaned, ignored, errors), dataset, progress = run(uploads, scrapers, stored=['sudah dibersihkan sebelumnya'])
+
+    assert (cleaned, ignored, errors) == (4, 3, [])
+    assert progress[-1] == (4, 3) and len(progress) == len(uploads) + len(scrapers)
+    assert dataset.status == 'Cleaned'
+    assert recorded['status'] == {
+        ('RawUpload', 'cleaned'): [1, 4, 5],
+        ('RawUpload', 'ignored'): [2, 3],
+        ('RawScraper', 'cleaned'): [11],
+        ('RawScraper', 'ignored'): [10],
+    }
+
+    inserted = {(data_type, raw_id): row for data_type, raw_id, row in recorded['inserted']}
+    assert inserted[('upload', 1)]['content_hash'] == compute_content_hash('banjir di jakarta')
+    assert inserted[('upload', 1)]['raw_data_id'] == 1 and inserted[('upload', 1)]['cleaned_by'] == 9
+    assert inserted[('upload', 4)]['content_hash'] is None
+    assert inserted[('scraper', 11)]['raw_data_scraper_id'] == 11
+    assert inserted[('scraper', 11)]['keyword'] == 'harga'
+
+
+def test_rows_are_written_in_batches(cleaning, monkeypatch):
+    run, recorded = cleaning
+    monkeypatch.setattr(cleaning_service, 'CLEAN_FLUSH_ROWS', 2)
+
+    uploads = [_row(1, 'satu'), _row(2, 'dua'), _row(3, 'satu'), _row(4, 'tiga'), _row(5, 'dua')]
+    (cleaned, ignored, errors), _, _ = run(uploads, [])
+
+    assert (cleaned, ignored, errors) == (3, 2, [])
+    # Keys seen in earlier batches still mark later rows as duplicates
+    assert recorded['batches'] == [[1, 2], [4], [], []]
+    assert recorded['status'][('RawUpload', 'cleaned')] == [1, 2, 4]
+    assert recorded['status'][('RawUpload', 'ignored')] == [3, 5]
+
+
+def test_rows_that_fail_to_clean_are_reported(cleaning):
+    run, recorded = cleaning
+
+    def clean_text(text):
+        if text == 'rusak':
+            raise ValueError('cannot clean')
+        return text
+
+    (cleaned, ignored, errors), _, _ = run([_row(1, 'teks biasa'), _row(2, 'rusak')], [], clean_text=clean_text)
+
+    assert (cleaned, ignored) == (1, 0)
+    assert len(errors) == 1 and 'upload 2' in errors[0]
+    assert recorded['status'][('RawUpload', 'cleaned')] == [1]
+    assert recorded['status'][('RawUpload', 'ignored')] == []
+
+
+class WorkerSession:
+    def __init__(self, datasets):
+        self.datasets = datasets
+        self.calls = []
+
+    def get(self, model, dataset_id):
+        return self.datasets.get(dataset_id)
+
+    def commit(self):
+        self.calls.append('commit')
+
+    def rollback(self):
+        self.calls.append('rollback')
+
+    def remove(self):
+        self.calls.append('remove')
+
+
+class ProgressQueue(list):
+    put = list.append
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    session = WorkerSession({1: SimpleNamespace(id=1)})
+    monkeypatch.setattr(cleaning_service, '_worker_app', Flask(__name__))
+    monkeypatch.setattr(cleaning_service, 'db', SimpleNamespace(session=session))
+    return session
+
+
+def test_worker_throttles_progress_and_commits(worker, monkeypatch):
+    def clean_dataset(dataset, user_id, progress_callback):
+        for done in range(1, 1201):
+            progress_callback(done - done // 4, done // 4)
+        return 900, 300, ['Error cleaning upload 7: bad row']
+
+    monkeypatch.setattr(cleaning_service, '_clean_dataset', clean_dataset)
+    progress = ProgressQueue()
+
+    result = cleaning_service._clean_dataset_worker(1, 9, progress)
+
+    assert result == (1, 900, 300, ['Error cleaning upload 7: bad row'])
+    interval = cleaning_service.WORKER_PROGRESS_INTERVAL
+    assert [cleaned + ignored for _, cleaned, ignored in progress] == list(range(interval, 1201, interval))
+    assert worker.calls == ['commit', 'remove']
+
+
+def test_worker_reports_failures_instead_of_raising(worker, monkeypatch):
+    def clean_dataset(dataset, user_id, progress_callback):
+        raise RuntimeError('connection lost')
+
+    monkeypatch.setattr(cleaning_service, '_clean_dataset', clean_dataset)
+
+    dataset_id, cleaned, ignored, errors = cleaning_service._clean_dataset_worker(1, 9, ProgressQueue())
+    assert (dataset_id, cleaned, ignored) == (1, 0, 0)
+    assert errors == ['Error cleaning dataset 1: connection lost']
+    assert worker.calls == ['rollback', 'remove']
+
+    assert cleaning_service._clean_dataset_worker(2, 9, ProgressQueue())[3] == ['Dataset 2 not found']
@@ -0,0 +1,44 @@
+"""compute_content_hash: normalization shared by the content_hash columns, duplicate checks and the migration backfill."""
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('pandas')
+pytest.importorskip('flask_login')
+
+from utils.utils import compute_content_hash
+
+
+def test_hash_is_sha256_of_normalized_text():
+    expected = hashlib.sha256('banjir di jakarta'.encode('utf-8')).hexdigest()
+    assert compute_content_hash('banjir di jakarta') == expected
+    assert len(expected) == 64
+
+
+@pytest.mark.parametrize('variant', [
+    '  banjir di jakarta',
+    'banjir di jakarta \n',
+    'banjir   di\tjakarta',
+    'banjir\r\ndi   jakarta',
+])
+def test_whitespace_variants_share_a_hash(variant):
+    assert compute_content_hash(variant) == compute_content_hash('banjir di jakarta')
+
+
+def test_case_and_punctuation_are_significant():
+    assert compute_content_hash('Banjir di Jakarta') != compute_content_hash('banjir di jakarta')
+    assert compute_content_hash('banjir di jakarta!') != compute_content_hash('banjir di jakarta')
+
+
+@pytest.mark.parametrize('empty', [None, '', '   ', '\n\t'])
+def test_empty_content_has_no_hash(empty):
+    assert compute_content_hash(empty) is None
+
+
+def test_non_string_values_are_hashed_as_text():
+    assert compute_content_hash(12345) == compute_content_hash('12345')
+    assert compute_content_hash('kota 😊 ramai') == hashlib.sha256('kota 😊 ramai'.encode('utf-8')).hexdigest()
@@ -0,0 +1,123 @@
+"""ApifyService against the bundled fake Apify server (runs, status, paged items, abort, webhooks)."""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('requests')
+pytest.importorskip('flask')
+
+from flask import Flask
+
+from services.apify_client import reset_client
+from services.apify_service import ApifyService, WEBHOOK_TOKEN_HEADER
+from fake_apify_server import FakeApify, start_server
+
+
+@pytest.fixture
+def fake_apify():
+    servers = []
+
+    def start(**kwargs):
+        server = start_server(FakeApify(**kwargs))
+        servers.append(server)
+        app = Flask(__name__)
+        app.config.update(
+            APIFY_BASE_URL=server.base_url,
+            APIFY_API_TOKEN='fake-token',
+            APIFY_TWITTER_ACTOR='kaitoeasyapi/twitter-x-data-tweet-scraper-pay-per-result-cheapest',
+            APIFY_TIKTOK_ACTOR='clockworks/free-tiktok-scraper',
+            APIFY_BACKOFF_FACTOR=0.01,
+        )
+        reset_client()
+        return app, server.fake
+
+    yield start
+    reset_client()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_run_lifecycle_and_paged_items(fake_apify):
+    app, fake = fake_apify(items=2500, items_per_second=0)
+    with app.app_context():
+        run = ApifyService.start_scraping_job('twitter', 'banjir', max_results=10)
+        assert ApifyService.get_run_status(run['id'])['status'] == 'SUCCEEDED'
+        assert ApifyService.get_dataset_info(run['defaultDatasetId'])['itemCount'] == 2500
+
+        pages = list(ApifyService.iter_dataset_items(run['defaultDatasetId'], page_size=1000))
+
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    items = [item for page in pages for item in page]
+    assert len({item['id'] for item in items}) == 2500
+    assert all('banjir' in item['text'] and item['author']['userName'] for item in items)
+
+
+def test_volume_follows_actor_input(fake_apify):
+    app, fake = fake_apify(items_per_second=0)
+    with app.app_context():
+        run = ApifyService.start_scraping_job('tiktok', '#kuliner', max_results=42)
+        items = ApifyService.get_dataset_items(run['defaultDatasetId'])
+
+    assert len(items) == 42
+    assert items[0]['webVideoUrl'].startswith('https://www.tiktok.com/@')
+
+
+def test_abort_stops_running_run(fake_apify):
+    app, fake = fake_apify(items=100000, items_per_second=10)
+    with app.app_context():
+        run = ApifyService.start_scraping_job('twitter', 'pemilu')
+        assert ApifyService.get_run_status(run['id'])['status'] == 'RUNNING'
+        assert ApifyService.abort_run(run['id'])['status'] == 'ABORTED'
+        assert ApifyService.get_run_status(run['id'])['status'] == 'ABORTED'
+
+
+def test_transient_errors_are_retried(fake_apify):
+    app, fake = fake_apify(items=10, items_per_second=0, error_rate=0.1)
+    with app.app_context():
+        run = ApifyService.start_scraping_job('twitter', 'harga beras')
+        for _ in range(20):
+            assert ApifyService.get_run_status(run['id'])['status'] == 'SUCCEEDED'
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        type(self).received.append((self.headers.get(WEBHOOK_TOKEN_HEADER), body))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_sends_ad_hoc_webhook_on_completion(fake_apify):
+    WebhookReceiver.received = []
+    receiver = ThreadingHTTPServer(('127.0.0.1', 0), WebhookReceiver)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+    try:
+        app, fake = fake_apify(items=5, items_per_second=0)
+        app.config['APIFY_WEBHOOK_URL'] = f"http://127.0.0.1:{receiver.server_address[1]}/api/scraping/webhook/apify"
+        app.config['APIFY_WEBHOOK_SECRET'] = 'secret'
+        with app.app_context():
+            run = ApifyService.start_scraping_job('twitter', 'cuaca')
+
+        for _ in range(100):
+            if WebhookReceiver.received:
+                break
+            threading.Event().wait(0.02)
+        token, body = WebhookReceiver.received[0]
+        assert token == 'secret'
+        assert run['id'].encode() in body and b'ACTOR.RUN.SUCCEEDED' in body
+    finally:
+        receiver.shutdown()
+        receiver.server_close()
@@ -0,0 +1,67 @@
+"""Feature matrix cache used by TrainingPipeline.prepare_data (keys, row reuse, eviction)."""
+import gc
+import os
+import sys
+import weakref
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from utils.feature_cache import FeatureCache, text_hashes, dataset_fingerprint, model_version
+
+
+class FakeKeyedVectors:
+    def __init__(self, seed):
+        self.index_to_key = ['banjir', 'pemilu', 'harga']
+        self.vectors = np.random.default_rng(seed).normal(size=(3, 4)).astype('float32')
+
+
+def test_keys_follow_texts_and_model():
+    hashes = text_hashes(['a', None, 'b'])
+    assert (hashes == text_hashes(['a', '', 'b'])).all()
+    assert dataset_fingerprint(hashes) != dataset_fingerprint(text_hashes(['b', '', 'a']))
+
+    model = FakeKeyedVectors(1)
+    assert model_version(model) == model_version(FakeKeyedVectors(1))
+    assert model_version(model) != model_version(FakeKeyedVectors(2))
+
+
+def test_version_memo_does_not_keep_models_alive():
+    model = FakeKeyedVectors(3)
+    model_version(model)
+    ref = weakref.ref(model)
+    del model
+    gc.collect()
+    assert ref() is None
+
+
+def test_load_and_reuse_rows(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    hashes = text_hashes(['a', 'b', 'a', 'c'])
+    X = np.arange(16, dtype=float).reshape(4, 4)
+    cache.save('v1-x-data', X, hashes)
+
+    assert cache.load('v1-x-missing') is None
+    assert (cache.load('v1-x-data') == X).all()
+
+    cached_X, rows = cache.reusable_rows('v1-x', text_hashes(['c', 'new', 'a']))
+    assert rows.tolist() == [3, -1, 0]
+    assert (cached_X[rows[0]] == X[3]).all()
+    assert cache.reusable_rows('v1-other', hashes) == (None, None)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_entries=2)
+    hashes = text_hashes(['a'])
+    for i, key in enumerate(['v1-x-1', 'v1-x-2', 'v1-x-3']):
+        cache.save(key, np.zeros((1, 2)), hashes)
+        for path in cache._paths(key):
+            os.utime(path, (i, i))
+
+    assert cache._entries() == ['v1-x-2', 'v1-x-3']
+    assert sorted(os.listdir(tmp_path)) == [
+        'v1-x-2.hashes.npy', 'v1-x-2.npy', 'v1-x-3.hashes.npy', 'v1-x-3.npy']
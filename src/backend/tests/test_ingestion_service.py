@@ -0,0 +1,263 @@
+"""Upload ingestion helpers that need no database (job bookkeeping, CSV sniffing, chunked reading)."""
+import io
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('flask_sqlalchemy')
+
+from flask import Flask
+
+from services import ingestion_service
+from utils.utils import compute_content_hash
+from services.ingestion_service import (
+    is_orphaned_upload, iter_file_chunks, build_raw_data_frame, detect_columns, normalize_columns, sniff_csv_dialect
+)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['UPLOAD_PROGRESS_TTL'] = 60
+    return app
+
+
+def _dataset(job, status='Processing'):
+    return SimpleNamespace(status=status, meta_info={'upload_job': job} if job else {})
+
+
+def test_finished_jobs_are_pruned_after_ttl(app):
+    now = time.time()
+    app.config['UPLOAD_PROGRESS'] = {
+        'old': {'dataset_id': 1, 'status': 'completed', 'finished_at': now - 120},
+        'recent': {'dataset_id': 1, 'status': 'error', 'finished_at': now - 10},
+        'running': {'dataset_id': 2, 'status': 'processing'},
+    }
+    assert ingestion_service.find_upload_job(app, 1)[0] == 'recent'
+    assert set(app.config['UPLOAD_PROGRESS']) == {'recent', 'running'}
+
+
+def test_orphaned_upload_detection(app, monkeypatch):
+    host, pid = ingestion_service.socket.gethostname(), os.getpid()
+    app.config['UPLOAD_PROGRESS'] = {'live': {'status': 'processing'}, 'done': {'status': 'completed'}}
+
+    # Job owned by this process
+    assert not is_orphaned_upload(app, _dataset({'job_id': 'live', 'host': host, 'pid': pid}))
+    assert is_orphaned_upload(app, _dataset({'job_id': 'done', 'host': host, 'pid': pid}))
+    assert is_orphaned_upload(app, _dataset({'job_id': 'lost', 'host': host, 'pid': pid}))
+
+    # Job owned by another process on this host
+    monkeypatch.setattr(ingestion_service, '_pid_alive', lambda pid: False)
+    assert is_orphaned_upload(app, _dataset({'job_id': 'x', 'host': host, 'pid': pid + 1}))
+    monkeypatch.setattr(ingestion_service, '_pid_alive', lambda pid: True)
+    assert not is_orphaned_upload(app, _dataset({'job_id': 'x', 'host': host, 'pid': pid + 1}))
+
+    # Other hosts, finished datasets and datasets without an upload job are left alone
+    assert not is_orphaned_upload(app, _dataset({'job_id': 'x', 'host': 'other-host', 'pid': pid}))
+    assert not is_orphaned_upload(app, _dataset({'job_id': 'lost', 'host': host, 'pid': pid}, status='Raw'))
+    assert not is_orphaned_upload(app, _dataset(None))
+
+
+def _write_csv(tmp_path, rows, name='data.csv', encoding='utf-8'):
+    path = tmp_path / name
+    path.write_bytes('\n'.join(rows).encode(encoding) + b'\n')
+    return str(path)
+
+
+CSV_ROWS = ['ID,Text,User,Platform'] + [f'00{i},tweet nomor {i},user{i},Twitter' for i in range(25)]
+
+
+@pytest.mark.parametrize('use_pyarrow', [True, False])
+def test_csv_is_streamed_as_text_chunks(tmp_path, monkeypatch, use_pyarrow):
+    if not use_pyarrow:
+        monkeypatch.setattr(ingestion_service, 'pa_csv', None)
+    elif ingestion_service.pa_csv is None:
+        pytest.skip('pyarrow is not installed')
+    path = _write_csv(tmp_path, CSV_ROWS)
+
+    chunks = list(iter_file_chunks(path, 'data.csv', chunksize=10))
+
+    if not use_pyarrow:
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert all(list(chunk.columns) == ['id', 'text', 'user', 'platform'] for chunk in chunks)
+    ids = [value for chunk in chunks for value in chunk['id']]
+    assert ids == [f'00{i}' for i in range(25)]  # kept as text, leading zeros intact
+
+
+def test_header_only_csv_yields_an_empty_first_chunk(tmp_path):
+    chunks = list(iter_file_chunks(_write_csv(tmp_path, ['Content,Username']), 'data.csv'))
+    assert len(chunks) == 1
+    assert list(chunks[0].columns) == ['content', 'username'] and chunks[0].empty
+
+
+def test_columns_are_normalized_and_detected():
+    columns = normalize_columns([' Text ', 'USER', 'text', 'Sumber'])
+    assert columns == ['text', 'user', 'text.1', 'sumber']
+    assert detect_columns(columns) == {'content': 'text', 'username': 'user', 'platform': 'sumber', 'url': None}
+
+
+def test_raw_data_frame_skips_empty_content():
+    chunk = pd.DataFrame({
+        'text': ['Banjir di kota', None, '   ', 'Harga naik'],
+        'user': ['andi', 'budi', 'citra', None],
+        'platform': ['Twitter', 'TikTok', 'Twitter', 'FACEBOOK'],
+    })
+    columns = {'content': 'text', 'username': 'user', 'platform': 'platform', 'url': None}
+
+    frame = build_raw_data_frame(chunk, columns, dataset_id=3, uploaded_by=9)
+
+    assert frame['content'].tolist() == ['Banjir di kota', 'Harga naik']
+    assert frame['username'].tolist() == ['andi', 'anonymous']
+    assert frame['platform'].tolist() == ['twitter', 'facebook']
+    assert frame['url'].isna().all()
+    assert frame['content_hash'].tolist() == [compute_content_hash('Banjir di kota'), compute_content_hash('Harga naik')]
+    assert (frame['dataset_id'] == 3).all() and (frame['status'] == 'raw').all()
+
+
+@pytest.mark.parametrize('delimiter', [',', ';', '\t', '|'])
+def test_sniffs_delimiter(tmp_path, delimiter):
+    rows = [delimiter.join(['content', 'username', 'url'])] + [
+        delimiter.join([f'"komentar {i}, panjang"', f'user{i}', f'https://x.com/{i}']) for i in range(20)
+    ]
+    dialect = sniff_csv_dialect(_write_csv(tmp_path, rows))
+    assert dialect == {'encoding': 'utf-8', 'delimiter': delimiter, 'quotechar': '"'}
+
+
+def test_sniffs_legacy_encoding_and_reads_with_it(tmp_path):
+    rows = ['content;username'] + [f'café à São Paulo número {i};usuário{i}' for i in range(40)]
+    path = _write_csv(tmp_path, rows, encoding='latin-1')
+
+    dialect = sniff_csv_dialect(path)
+    assert dialect['delimiter'] == ';'
+    assert dialect['encoding'] != 'utf-8'
+
+    chunk = next(iter_file_chunks(path, 'data.csv', dialect=dialect))
+    assert chunk['content'].iloc[0] == 'café à São Paulo número 0'
+
+
+def test_sniffing_file_objects_rewinds_them(tmp_path):
+    with open(_write_csv(tmp_path, CSV_ROWS), 'rb') as handle:
+        assert sniff_csv_dialect(handle)['delimiter'] == ','
+        assert handle.tell() == 0
+
+
+def test_unsniffable_sample_falls_back_to_comma(tmp_path):
+    assert sniff_csv_dialect(_write_csv(tmp_path, ['satu kolom saja']))['delimiter'] == ','
+
+
+def test_only_the_sample_is_sniffed(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_service, 'CSV_SNIFF_BYTES', 64)
+    # The sample ends inside a row; only complete lines are given to the sniffer
+    rows = ['a;b;c'] + ['1;2;3'] * 10 + ['x,y,z'] * 10
+    assert sniff_csv_dialect(_write_csv(tmp_path, rows))['delimiter'] == ';'
+
+
+def _sheet_rows(count, width=3):
+    yield tuple(f'kolom{i}' for i in range(width))
+    for i in range(count):
+        yield tuple(f'nilai {i}-{j}' for j in range(width))
+
+
+def test_rows_are_chunked_by_chunksize_within_budget():
+    chunks = list(ingestion_service._rows_to_chunks(_sheet_rows(1000), 300, 512 * 1024 * 1024))
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    assert list(chunks[0].columns) == ['kolom0', 'kolom1', 'kolom2']
+
+
+def test_chunks_shrink_to_fit_the_memory_budget():
+    sample = ingestion_service.ROW_SIZE_SAMPLE
+    # Budget far too small for even one sample: chunks never go below the sample size
+    chunks = list(ingestion_service._rows_to_chunks(_sheet_rows(1000), 10000, 1))
+    assert [len(chunk) for chunk in chunks] == [sample] * 5
+
+    # Room for roughly two samples' worth of wide rows per chunk
+    rows = list(_sheet_rows(3000, width=20))
+    row_bytes = sum(sys.getsizeof(value) for value in rows[1])
+    budget = int(2 * sample * row_bytes * ingestion_service.DATAFRAME_OVERHEAD / ingestion_service.CHUNK_BUDGET_SHARE)
+    sizes = [len(chunk) for chunk in ingestion_service._rows_to_chunks(iter(rows), 10000, budget)]
+    assert sum(sizes) == 3000
+    assert sample <= max(sizes) <= 3 * sample
+
+
+def test_sheet_rows_are_padded_and_blank_rows_skipped():
+    rows = iter([('a', 'b', 'c'), ('1', ''), (None, '', None), ('4', '5', '6', 'extra')])
+    chunk, = ingestion_service._rows_to_chunks(rows, 100, 512 * 1024 * 1024)
+    assert list(chunk.columns) == ['a', 'b', 'c']
+    assert chunk.fillna('-').values.tolist() == [['1', '-', '-'], ['4', '5', '6']]
+
+    header_only, = ingestion_service._rows_to_chunks(iter([('a', 'b')]), 100, 1)
+    assert header_only.empty and list(header_only.columns) == ['a', 'b']
+    assert list(ingestion_service._rows_to_chunks(iter([]), 100, 1)) == []
+
+
+def _xlsx(rows):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_xlsx_is_streamed_without_calamine(monkeypatch):
+    monkeypatch.setattr(ingestion_service, 'CalamineWorkbook', None)
+    source = _xlsx(_sheet_rows(50))
+
+    chunks = list(iter_file_chunks(source, 'data.xlsx', chunksize=20))
+    assert [len(chunk) for chunk in chunks] == [20, 20, 10]
+    assert chunks[-1]['kolom2'].iloc[-1] == 'nilai 49-2'
+
+
+def test_workbooks_over_the_budget_are_rejected(monkeypatch):
+    monkeypatch.setattr(ingestion_service, 'CalamineWorkbook', None)
+    monkeypatch.setattr(ingestion_service, '_memory_budget', lambda: 1024)
+    # openpyxl itself writes inline strings; report a shared strings table larger than the budget
+    monkeypatch.setattr(ingestion_service, '_xlsx_part_sizes', lambda source: (100, 4096))
+
+    with pytest.raises(ValueError, match='text table'):
+        list(iter_file_chunks(_xlsx(_sheet_rows(50)), 'data.xlsx'))
+    with pytest.raises(ValueError, match='.xls file is too large'):
+        list(iter_file_chunks(io.BytesIO(b'x' * 1024), 'data.xls'))
+
+
+def test_uploaded_files_and_chunk_sessions_are_removed(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    upload = tmp_path / 'uploads' / 'temp' / 'abc_data.csv'
+    session = tmp_path / 'uploads' / 'temp_chunks' / 'def_big.csv'
+    outside = tmp_path / 'elsewhere.csv'
+    session.mkdir(parents=True)
+    upload.parent.mkdir()
+    (session / '00000000.part').write_bytes(b'a,b\n')
+    for path in (upload, upload.with_suffix('.parquet'), outside):
+        path.write_text('content\n')
+
+    with app.app_context():
+        assert ingestion_service.remove_upload_file(str(upload))
+        assert ingestion_service.remove_upload_file(str(session))
+        assert not ingestion_service.remove_upload_file(str(upload))  # already gone
+        assert not ingestion_service.remove_upload_file(str(outside))
+        assert not ingestion_service.remove_upload_file(None)
+
+    assert not upload.exists() and not upload.with_suffix('.parquet').exists()
+    assert not session.exists() and outside.exists()
+
+
+def test_staging_is_discarded_when_no_longer_needed(tmp_path):
+    pytest.importorskip('pyarrow')
+    upload = tmp_path / 'abc_data.csv'
+    upload.write_text('teks,nama\nbanjir,andi\n')
+
+    assert ingestion_service.stage_file(str(upload), keep=lambda: False) is None
+    assert os.listdir(tmp_path) == ['abc_data.csv']  # no staging file and no leftover .tmp
+
+    staged = ingestion_service.stage_file(str(upload), keep=lambda: True)
+    assert staged == ingestion_service.staging_path(str(upload))
+    assert next(ingestion_service.iter_staged_chunks(str(upload)))['teks'].tolist() == ['banjir']
@@ -0,0 +1,85 @@
+"""MinHash/LSH near-duplicate detection (signatures, LSH parameters, bucketing, assignment) without a database."""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('flask_sqlalchemy')
+
+from services.near_duplicate_service import (
+    NearDuplicateIndex, minhash_signature, estimated_jaccard, optimal_lsh_params, shingle_hashes
+)
+
+BASE = "pemerintah mengumumkan program baru untuk pendidikan di daerah terpencil minggu ini"
+SIMILAR = "kajian rutin malam ini di masjid agung semua jamaah diundang hadir tepat waktu"
+LESS_SIMILAR = "kajian rutin malam ini di masjid agung semua warga diundang datang bersama keluarga"
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = NearDuplicateIndex(1, threshold=0.8, num_perm=128, shingle_size=5)
+    # Empty dataset: no stored buckets
+    monkeypatch.setattr(index, '_lookup_existing', lambda buckets: {})
+    return index
+
+
+@pytest.mark.parametrize('threshold', [0.5, 0.7, 0.8, 0.9])
+def test_lsh_params_fit_the_threshold(threshold):
+    bands, rows = optimal_lsh_params(threshold, 128)
+    assert bands * rows <= 128
+    # The S-curve of the chosen banding rises close to the requested threshold
+    assert abs((1 / bands) ** (1 / rows) - threshold) < 0.1
+
+
+def test_stricter_threshold_uses_longer_bands():
+    params = [optimal_lsh_params(threshold, 128) for threshold in (0.5, 0.7, 0.8, 0.9)]
+    rows = [r for _, r in params]
+    assert rows == sorted(rows) and rows[0] < rows[-1]
+
+
+def test_shingles_ignore_case_and_whitespace():
+    assert (shingle_hashes('  Banjir   DI jakarta ', 5) == shingle_hashes('banjir di jakarta', 5)).all()
+    assert len(shingle_hashes('ab', 5)) == 1  # shorter than a shingle: the whole text is one shingle
+    assert shingle_hashes('   ', 5).size == 0
+    assert minhash_signature('', 128, 5) is None
+
+
+def test_buckets_are_one_per_band_and_stable(index):
+    buckets = index.buckets(BASE)
+    assert len(buckets) == index.bands
+    assert buckets == NearDuplicateIndex(2, threshold=0.8, num_perm=128, shingle_size=5).buckets(BASE)
+    assert index.buckets('') == []
+
+    # The band number is part of the bucket, so equal rows in different bands do not collide
+    constant = np.zeros(index.num_perm, dtype=np.uint64)
+    assert len(set(index._signature_buckets(constant))) == index.bands
+
+
+def test_assign_links_near_duplicates_in_batch(index):
+    texts = [BASE, BASE + ' !', 'RT ' + BASE, 'harga bahan pokok naik lagi minggu ini', '']
+    representatives, buckets = index.assign(texts)
+    assert representatives == [None, 0, 0, None, None]
+    assert buckets[-1] == []
+
+
+def test_bucket_collision_below_threshold_is_not_a_duplicate(index):
+    # One band per hash value: any shared minimum puts both texts in the same bucket
+    index.bands, index.rows = index.num_perm, 1
+    assert set(index.buckets(SIMILAR)) & set(index.buckets(LESS_SIMILAR))
+    signatures = [minhash_signature(text, 128, 5) for text in (SIMILAR, LESS_SIMILAR)]
+    assert estimated_jaccard(*signatures) < index.threshold
+
+    representatives, _ = index.assign([SIMILAR, LESS_SIMILAR, SIMILAR + '.'])
+    assert representatives == [None, None, 0]
+
+
+def test_stored_candidates_are_verified(index, monkeypatch):
+    stored_buckets = index.buckets(BASE)
+    monkeypatch.setattr(index, '_lookup_existing', lambda buckets: {stored_buckets[0]: ['upload_7']})
+    monkeypatch.setattr(index, '_stored_signatures', lambda keys: {'upload_7': minhash_signature(BASE, 128, 5)})
+
+    representatives, _ = index.assign([BASE + ' !'])
+    assert representatives == ['upload_7']
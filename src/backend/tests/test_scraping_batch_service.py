@@ -0,0 +1,70 @@
+"""Batch scraping coordinator helpers that need no database (restart detection, aborting runs)."""
+import logging
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('flask_sqlalchemy')
+
+from services import scraping_batch_service
+from services.scraping_batch_service import is_orphaned_batch, _abort_runs, PENDING, START_FAILED
+
+
+def _dataset(job, status='Processing', batch=True):
+    return SimpleNamespace(status=status, meta_info={'batch': batch, 'batch_job': job})
+
+
+def _owner(**changes):
+    owner = scraping_batch_service._job_owner()
+    owner.update(changes)
+    return owner
+
+
+def test_orphaned_batch_detection(monkeypatch):
+    host, pid = scraping_batch_service.socket.gethostname(), os.getpid()
+    monkeypatch.setattr(scraping_batch_service, '_pid_alive', lambda pid: True)
+
+    # Coordinators of this process are never taken over
+    assert not is_orphaned_batch(_dataset(_owner(heartbeat=0)))
+
+    # Same pid after a container restart, but another boot: the heartbeat decides
+    assert not is_orphaned_batch(_dataset(_owner(boot_id='old-boot')))
+    assert is_orphaned_batch(_dataset(_owner(boot_id='old-boot', heartbeat=time.time() - 1000)))
+    assert is_orphaned_batch(_dataset(_owner(boot_id='old-boot', heartbeat=time.time() - 60)), stale_after=30)
+    assert is_orphaned_batch(_dataset({'host': host, 'pid': pid}))  # recorded before boot ids and heartbeats
+
+    # A dead owner on this host is taken over at once, one on another host only once stale
+    monkeypatch.setattr(scraping_batch_service, '_pid_alive', lambda pid: False)
+    assert is_orphaned_batch(_dataset(_owner(boot_id='old-boot')))
+    assert not is_orphaned_batch(_dataset(_owner(boot_id='old-boot', host='other-host')))
+
+    # Finished datasets and non-batch datasets are left alone
+    assert not is_orphaned_batch(_dataset(_owner(boot_id='old-boot'), status='Aborted'))
+    assert not is_orphaned_batch(_dataset(_owner(boot_id='old-boot'), batch=False))
+
+
+def test_boot_id_changes_in_forked_processes(monkeypatch):
+    boot_id = scraping_batch_service.process_boot_id()
+    assert scraping_batch_service.process_boot_id() == boot_id
+    monkeypatch.setattr(scraping_batch_service.os, 'getpid', lambda: -1)
+    assert scraping_batch_service.process_boot_id() != boot_id
+
+
+def test_abort_runs_stops_active_and_queued_runs(monkeypatch):
+    aborted = []
+    monkeypatch.setattr(scraping_batch_service.ApifyService, 'abort_run', staticmethod(aborted.append))
+    runs = [
+        {'run_id': 'r1', 'status': 'RUNNING'},
+        {'run_id': None, 'status': PENDING},
+        {'run_id': 'r2', 'status': 'SUCCEEDED'},
+        {'run_id': None, 'status': START_FAILED},
+    ]
+    _abort_runs(runs, logging.getLogger(__name__))
+
+    assert aborted == ['r1']
+    assert [run['status'] for run in runs] == ['ABORTED', 'ABORTED', 'SUCCEEDED', START_FAILED]
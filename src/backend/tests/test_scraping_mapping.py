@@ -0,0 +1,87 @@
+"""build_scraped_frame (column-wise import mapping) against the per-item reference mapper, no database needed."""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('pandas')
+pytest.importorskip('flask_sqlalchemy')
+
+from services.scraping_service import build_scraped_frame, MAPPED_COLUMNS
+from benchmark_scraping_mapping import map_scraped_item, synthetic_tweets
+
+
+def twitter_items(count, rng):
+    items = synthetic_tweets(count)
+    for i, item in enumerate(items):
+        if i % 7 == 0:
+            item['author'] = {'userName': str(i)}  # numeric username: fallback fields, then the URL
+        if i % 9 == 0:
+            item['user'] = {'screen_name': f'screen{i}'}
+        if i % 13 == 0:
+            item['url'] = f'https://twitter.com/legacy{i}/status/{i}'
+        if i % 17 == 0:
+            item.pop('url')
+            item['expanded_url'] = f'https://x.com/expanded{i}/status/{i}'
+        item['likeCount'] = rng.choice([i, str(i), None, 'n/a'])
+    return items
+
+
+def tiktok_items(count, rng):
+    items = []
+    for i in range(count):
+        item = {
+            'text': '' if i % 25 == 0 else f'video kuliner nomor {i} #kuliner',
+            'webVideoUrl': f'https://www.tiktok.com/@creator{i % 40}/video/{i}',
+            'diggCount': rng.randint(0, 1000),
+            'shareCount': str(rng.randint(0, 50)),
+            'playCount': rng.choice([rng.randint(0, 10 ** 6), None]),
+            'commentCount': rng.randint(0, 100),
+        }
+        if i % 3 == 0:
+            item['authorMeta'] = {'name': f'creator{i % 40}', 'nickName': f'Creator {i % 40}'}
+        elif i % 3 == 1:
+            item['author'] = {'uniqueId': str(7000 + i)}  # numeric id must not win over the URL
+        items.append(item)
+    return items
+
+
+def facebook_items(count, rng):
+    urls = ['https://www.facebook.com/halaman{i}/posts/{i}', 'https://www.facebook.com/groups/{i}/permalink/1',
+            'https://www.facebook.com/watch/?v={i}']
+    items = []
+    for i in range(count):
+        item = {
+            'text': f'postingan warga tentang harga beras {i}',
+            'url': rng.choice(urls).format(i=i),
+            'likes': rng.choice([i, None]),
+            'shares': i % 11,
+        }
+        if i % 4 == 0:
+            item['author_name'] = f'Penulis {i}'
+        elif i % 4 == 1:
+            item['user'] = {'name': f'Pengguna {i}'}
+        items.append(item)
+    return items
+
+
+@pytest.mark.parametrize('platform, make_items, mapping', [
+    ('twitter', twitter_items, ('text', 'author_userName', 'url')),
+    ('twitter', twitter_items, ('text', 'user', 'url')),
+    ('tiktok', tiktok_items, ('text', 'authorMeta_name', 'webVideoUrl')),
+    ('facebook', facebook_items, ('text', 'author_name', 'url')),
+])
+def test_frame_matches_per_item_mapping(platform, make_items, mapping):
+    items = make_items(300, random.Random(42))
+
+    expected = [row for row in (map_scraped_item(item, *mapping, platform) for item in items) if row is not None]
+    frame = build_scraped_frame(items, *mapping, platform)
+
+    assert len(frame) == len(expected)
+    actual = frame[MAPPED_COLUMNS].to_dict(orient='records')
+    for expected_row, actual_row in zip(expected, actual):
+        assert {column: expected_row[column] for column in MAPPED_COLUMNS} == actual_row
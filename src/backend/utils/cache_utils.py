@@ -0,0 +1,153 @@
+"""
+Cache TTL kecil dengan single-flight untuk hasil pemanggilan upstream yang mahal (mis. progress Apify).
+
+Jika USE_REDIS=true cache disimpan di Redis (REDIS_URL) sehingga dipakai bersama oleh semua worker
+gunicorn, dan single-flight memakai lock SET NX. Tanpa Redis, cache dan lock berlaku per proses.
+Nilai harus dapat di-serialize ke JSON.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+LOCK_TIMEOUT = 15  # detik; batas atas satu pemanggilan upstream
+WAIT_INTERVAL = 0.05
+
+# Hapus lock hanya jika masih milik pemanggil ini (token sama); lock yang sudah expired dan diambil
+# worker lain tidak ikut terhapus
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_redis_client = None
+_redis_checked = False
+_memory_cache = {}  # key -> (expires_at, value)
+_inflight = {}  # key -> threading.Event
+_lock = threading.Lock()
+
+
+def _get_redis():
+    global _redis_client, _redis_checked
+    if not _redis_checked:
+        _redis_checked = True
+        if redis is not None and os.getenv('USE_REDIS', 'False').lower() == 'true':
+            try:
+                client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+                                              socket_timeout=2, socket_connect_timeout=2)
+                client.ping()
+                _redis_client = client
+            except redis.RedisError:
+                _redis_client = None
+    return _redis_client
+
+
+def _memory_get(key):
+    entry = _memory_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _memory_get_or_compute(key, ttl, compute):
+    while True:
+        with _lock:
+            value = _memory_get(key)
+            if value is not None:
+                return value
+            event = _inflight.get(key)
+            if event is None:
+                event = _inflight[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # Another thread is already calling upstream for this key; reuse its result
+            event.wait(LOCK_TIMEOUT)
+            with _lock:
+                value = _memory_get(key)
+            if value is not None:
+                return value
+            continue
+
+        try:
+            value = compute()
+            ttl_seconds = ttl(value) if callable(ttl) else ttl
+            with _lock:
+                if value is not None and ttl_seconds > 0:
+                    _memory_cache[key] = (time.monotonic() + ttl_seconds, value)
+                # Drop expired entries so the cache stays small
+                now = time.monotonic()
+                for stale in [k for k, (expires_at, _) in _memory_cache.items() if expires_at <= now]:
+                    del _memory_cache[stale]
+            return value
+        finally:
+            with _lock:
+                _inflight.pop(key, None)
+            event.set()
+
+
+def _redis_get_or_compute(client, key, ttl, compute):
+    cached = client.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    acquired = bool(client.set(lock_key, token, nx=True, ex=LOCK_TIMEOUT))
+    while not acquired:
+        # Another worker is fetching this key; wait for its result
+        time.sleep(WAIT_INTERVAL)
+        cached = client.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        if time.monotonic() > deadline:
+            # The holder is stuck; compute without the lock rather than fail, but leave its lock alone
+            break
+        acquired = bool(client.set(lock_key, token, nx=True, ex=LOCK_TIMEOUT))
+
+    try:
+        value = compute()
+        ttl_seconds = ttl(value) if callable(ttl) else ttl
+        if value is not None and ttl_seconds > 0:
+            client.set(key, json.dumps(value), px=int(ttl_seconds * 1000))
+        return value
+    finally:
+        if acquired:
+            client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+
+def get_or_compute(key, ttl, compute):
+    """
+    Kembalikan nilai cache untuk key, atau panggil compute() sekali (single-flight) dan simpan
+    hasilnya selama ttl detik. ttl boleh berupa fungsi value -> detik (mis. TTL lebih lama untuk
+    status final). Hasil None tidak disimpan.
+    """
+    client = _get_redis()
+    if client is not None:
+        try:
+            return _redis_get_or_compute(client, key, ttl, compute)
+        except redis.RedisError:
+            pass
+    return _memory_get_or_compute(key, ttl, compute)
+
+
+def invalidate(key):
+    with _lock:
+        _memory_cache.pop(key, None)
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.delete(key)
+        except redis.RedisError:
+            pass
@@ -0,0 +1,144 @@
+"""
+On-disk cache of Word2Vec feature matrices for TrainingPipeline.prepare_data.
+
+A matrix is stored as <model version>-<dataset fingerprint>.npy next to a .hashes.npy file with one
+64-bit hash per row text, and loaded back memory-mapped. The model version fingerprints the loaded
+Word2Vec vectors (not the file path), the dataset fingerprint is the ordered row hashes, so labels,
+column names and hyperparameters can change without invalidating the cache. When there is no exact
+match, rows whose text already appears in the newest matrix of the same model version are copied
+instead of vectorized again.
+"""
+import hashlib
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# Bump when preprocessing/vectorization changes so old matrices are not reused
+FEATURE_VERSION = 1
+
+_model_versions = weakref.WeakKeyDictionary()  # model -> version; entries go away with the model
+
+
+def text_hashes(texts):
+    """Returns one uint64 hash per text (NaN is treated as the empty string, as in prepare_data)"""
+    texts = pd.Series(texts, dtype=object).fillna('').astype(str)
+    return pd.util.hash_pandas_object(texts, index=False).to_numpy(dtype=np.uint64)
+
+
+def dataset_fingerprint(hashes):
+    return hashlib.sha256(np.ascontiguousarray(hashes).tobytes()).hexdigest()[:32]
+
+
+def model_version(word2vec_model):
+    """Fingerprint of the vocabulary and vectors of a loaded Word2Vec/KeyedVectors model"""
+    if word2vec_model is None:
+        return f"v{FEATURE_VERSION}-none"
+    try:
+        cached = _model_versions.get(word2vec_model)
+    except TypeError:  # Not weak-referenceable: hashed on every call
+        cached = None
+    if cached is not None:
+        return cached
+
+    kv = getattr(word2vec_model, 'wv', word2vec_model)
+    digest = hashlib.sha256(f"v{FEATURE_VERSION}".encode())
+    keys = getattr(kv, 'index_to_key', None)
+    vectors = getattr(kv, 'vectors', None)
+    if keys is None or vectors is None:
+        # Unknown model type: only valid for this object in this process
+        digest.update(f"{type(word2vec_model).__name__}-{id(word2vec_model)}-{os.getpid()}".encode())
+    else:
+        digest.update('\n'.join(map(str, keys)).encode('utf-8', 'surrogatepass'))
+        digest.update(np.ascontiguousarray(vectors).tobytes())
+    version = f"v{FEATURE_VERSION}-{digest.hexdigest()[:16]}"
+    try:
+        _model_versions[word2vec_model] = version
+    except TypeError:
+        pass
+    return version
+
+
+class FeatureCache:
+    def __init__(self, directory, max_entries=5, logger=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.logger = logger
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return f"{base}.npy", f"{base}.hashes.npy"
+
+    def load(self, key):
+        """Returns the cached matrix (memory-mapped, read-only) or None"""
+        matrix_path, _ = self._paths(key)
+        try:
+            X = np.load(matrix_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        os.utime(matrix_path)  # Mark as recently used
+        return X
+
+    def reusable_rows(self, version, hashes):
+        """
+        Looks up rows in the newest matrix of the same model version.
+        Returns (matrix, source row per hash or -1) or (None, None).
+        """
+        candidates = self._entries(prefix=f"{version}-")
+        if not candidates:
+            return None, None
+        key = candidates[-1]
+        matrix_path, hashes_path = self._paths(key)
+        try:
+            X = np.load(matrix_path, mmap_mode='r')
+            cached_hashes = np.load(hashes_path)
+        except (OSError, ValueError):
+            return None, None
+        if len(cached_hashes) != len(X):
+            return None, None
+        if not len(cached_hashes):
+            return None, None
+        unique_hashes, first_rows = np.unique(cached_hashes, return_index=True)
+        positions = np.minimum(np.searchsorted(unique_hashes, hashes), len(unique_hashes) - 1)
+        rows = np.where(unique_hashes[positions] == hashes, first_rows[positions], -1)
+        return X, rows
+
+    def save(self, key, X, hashes):
+        """Writes the matrix atomically and evicts the least recently used entries"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            matrix_path, hashes_path = self._paths(key)
+            for path, array in ((hashes_path, hashes), (matrix_path, X)):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Could not write feature cache {key}: {e}")
+
+    def _entries(self, prefix=''):
+        """Cache keys, least recently used first"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if name.startswith(prefix) and name.endswith('.npy') and not name.endswith('.hashes.npy'):
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.directory, name)), name[:-4]))
+                except OSError:
+                    continue
+        return [key for _, key in sorted(entries)]
+
+    def _evict(self):
+        entries = self._entries()
+        for key in entries[:max(0, len(entries) - self.max_entries)]:
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
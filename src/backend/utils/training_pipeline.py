@@ -3,10 +3,12 @@ import pandas as pd
 import numpy as np
 import joblib
 import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from flask import current_app
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
 from sklearn.naive_bayes import GaussianNB
 from sklearn.svm import SVC
 from sklearn.neighbors import KNeighborsClassifier
@@ -17,8 +19,17 @@ from sklearn.calibration import CalibratedClassifierCV
 from sklearn.preprocessing import LabelEncoder
 
 from utils.utils import vectorize_text, preprocess_for_model
+from utils.training_workers import init_worker, fit_and_evaluate, fit_only, plan_workers, mp_context
+from utils.feature_cache import FeatureCache, text_hashes, dataset_fingerprint, model_version
 from models.models import db, TrainingRun, TrainingMetric
 
+# What gets deployed when models are saved (TRAINING_FINAL_FIT):
+#   'split'      - the models trained on the 80% split, i.e. exactly the models the metrics describe
+#   'background' - metrics are returned first, then the models are refit on the full dataset in a
+#                  background thread and replace the saved files; the loaded models keep serving
+FINAL_FIT_SPLIT = 'split'
+FINAL_FIT_BACKGROUND = 'background'
+
 class ActiveLearningManager:
     """
     Manages active learning processes including sample selection and incremental updates.
@@ -70,7 +81,8 @@ class ActiveLearningManager:
         return unlabeled_df.loc[selected_indices]
 
 class TrainingPipeline:
-    def __init__(self, df, word2vec_model, user_id=None, filename=None, col_text='normalisasi_kalimat', col_label='label', progress_callback=None):
+    def __init__(self, df, word2vec_model, user_id=None, filename=None, col_text='normalisasi_kalimat', col_label='label', progress_callback=None,
+                 model_progress_callback=None):
         self.df = df
         self.word2vec_model = word2vec_model
         self.user_id = user_id
@@ -81,6 +93,7 @@ class TrainingPipeline:
         self.results = {}
         self.logger = current_app.logger
         self.progress_callback = progress_callback
+        self.model_progress_callback = model_progress_callback
 
     def _update_progress(self, message, percent):
         if self.progress_callback:
@@ -89,6 +102,14 @@ class TrainingPipeline:
             except Exception as e:
                 self.logger.warning(f"Progress callback failed: {e}")
 
+    def _update_model_progress(self, name, status, **details):
+        """Status per model: queued -> training -> completed/error"""
+        if self.model_progress_callback:
+            try:
+                self.model_progress_callback(name, dict(details, status=status))
+            except Exception as e:
+                self.logger.warning(f"Model progress callback failed: {e}")
+
     def validate_and_clean_dataset(self):
         """
         Validates input dataframe and cleans it.
@@ -161,16 +182,40 @@ class TrainingPipeline:
     def prepare_data(self):
         """
         Vectorizes text and prepares X, y.
+        The matrix is cached per dataset and Word2Vec model (see utils.feature_cache), so retraining
+        on the same data skips vectorization and only new or changed texts are vectorized.
         """
+        y = self.df['label_normalized'].values
+        texts = self.df[self.col_text]
+        hashes = text_hashes(texts)
+
+        cache = self._feature_cache()
+        cached_X, rows = None, None
+        if cache is not None:
+            version = model_version(self.word2vec_model)
+            key = f"{version}-{dataset_fingerprint(hashes)}"
+            X = cache.load(key)
+            if X is not None:
+                self.logger.info(f"Using cached feature matrix {key}")
+                self._update_progress("Using cached text vectors...", 50)
+                return X, y
+            cached_X, rows = cache.reusable_rows(version, hashes)
+
+        missing = np.ones(len(hashes), dtype=bool) if rows is None else rows < 0
+        missing_rows = np.flatnonzero(missing)
+        # Identical texts have identical vectors: vectorize each distinct text once
+        _, first, inverse = np.unique(hashes[missing_rows], return_index=True, return_inverse=True)
+        if cached_X is not None:
+            self.logger.info(f"Reusing {len(hashes) - len(missing_rows)} cached vectors, "
+                             f"vectorizing {len(first)} texts")
+
         self._update_progress("Vectorizing text data (this may take a moment)...", 20)
         self.logger.info("Vectorizing text data...")
-        X = []
-        y = self.df['label_normalized'].values
-        
-        total_rows = len(self.df)
+        vectors = []
+        total_rows = len(first)
         update_interval = max(1, total_rows // 20) # Update every 5%
-        
-        for i, text in enumerate(self.df[self.col_text]):
+
+        for i, text in enumerate(texts.iloc[missing_rows[first]]):
             # Ensure text is string
             if pd.isna(text):
                 text = ""
@@ -179,14 +224,29 @@ class TrainingPipeline:
                 
             # Note: vectorize_text handles preprocessing internally
             vector = vectorize_text(text, self.word2vec_model)
-            X.append(vector)
+            vectors.append(vector)
             
             # Detailed progress update for vectorization
             if i % update_interval == 0:
                 percent = 20 + int((i / total_rows) * 30) # 20% to 50%
                 self._update_progress(f"Vectorizing row {i+1}/{total_rows}...", percent)
-            
-        return np.array(X), y
+
+        dim = len(vectors[0]) if vectors else cached_X.shape[1]
+        X = np.empty((len(hashes), dim))
+        if len(missing_rows) < len(hashes):
+            X[~missing] = cached_X[rows[~missing]]
+        if vectors:
+            X[missing_rows] = np.array(vectors)[inverse.ravel()]
+
+        if cache is not None:
+            cache.save(key, X, hashes)
+        return X, y
+
+    def _feature_cache(self):
+        directory = current_app.config.get('TRAINING_FEATURE_CACHE_DIR')
+        if not directory:
+            return None
+        return FeatureCache(directory, current_app.config.get('TRAINING_FEATURE_CACHE_MAX_ENTRIES') or 5, self.logger)
 
     def train(self, save_models=False):
         """
@@ -242,76 +302,135 @@ class TrainingPipeline:
 
         # Train and Evaluate
         self.logger.info(f"Training models: {list(self.models.keys())}")
-        
-        total_models = len(self.models)
-        
-        for idx, (name, model) in enumerate(self.models.items()):
-            try:
-                # 50% to 90%
-                percent = 50 + int((idx / total_models) * 40)
-                self._update_progress(f"Training model {name} ({idx+1}/{total_models})...", percent)
-                
-                self.logger.info(f"Training {name}...")
-                model.fit(X_train, y_train)
-                
-                y_pred = model.predict(X_test)
-                accuracy = accuracy_score(y_test, y_pred)
-                report = classification_report(y_test, y_pred, output_dict=True)
-                cm = confusion_matrix(y_test, y_pred).tolist()
-                
-                # Fix for classification report keys (0/1 to non-radikal/radikal)
-                # Ensure keys match what frontend expects
-                mapped_report = {}
-                for key, value in report.items():
-                    if key == '0':
-                        mapped_report['non-radikal'] = value
-                    elif key == '1':
-                        mapped_report['radikal'] = value
-                    else:
-                        mapped_report[key] = value
-                
-                self.results[name] = {
-                    'accuracy': accuracy,
-                    'precision': report['weighted avg']['precision'],
-                    'recall': report['weighted avg']['recall'],
-                    'f1': report['weighted avg']['f1-score'],
-                    'report': mapped_report,
-                    'confusion_matrix': cm
-                }
-                
-                if save_models:
-                    self._update_progress(f"Saving model {name}...", percent + 2)
-                    self._save_model(name, model, X, y)
-                    
-            except Exception as e:
-                self.logger.error(f"Error training {name}: {e}")
-                self.results[name] = {'error': str(e)}
+
+        names = list(self.models)
+        total_models = len(names)
+        workers, n_jobs = plan_workers(total_models, current_app.config.get('TRAINING_MAX_WORKERS'))
+        self.logger.info(f"Training with {workers} worker process(es), n_jobs={n_jobs} per model")
+        for name in names:
+            self._update_model_progress(name, 'queued')
+        self._update_progress(f"Training {total_models} models ({workers} in parallel)...", 50)
+
+        final_fit = self._final_fit_mode()
+        data = (X_train, y_train, X_test, y_test)
+        outcomes = self._fit_models(self.models, data, workers, n_jobs, fit_and_evaluate)
+        for done, (name, outcome) in enumerate(outcomes, start=1):
+            if isinstance(outcome, Exception):
+                self.logger.error(f"Error training {name}: {outcome}")
+                self.results[name] = {'error': str(outcome)}
+                self._update_model_progress(name, 'error', error=str(outcome))
+            else:
+                model, metrics, seconds = outcome
+                self.models[name] = model
+                self.results[name] = metrics
+                self.logger.info(f"Trained {name} in {seconds:.1f}s")
+
+                if save_models and final_fit == FINAL_FIT_SPLIT:
+                    self._save_model(name, model)
+                self._update_model_progress(name, 'completed', accuracy=metrics['accuracy'], seconds=round(seconds, 1))
+
+            # 50% to 90%
+            self._update_progress(f"Model {name} finished ({done}/{total_models})", 50 + int((done / total_models) * 40))
+
+        # Keep the configured model order regardless of completion order
+        self.results = {name: self.results[name] for name in names if name in self.results}
 
         if save_models and self.user_id:
             self._update_progress("Saving training history...", 95)
             self._save_history()
+
+        if save_models and final_fit == FINAL_FIT_BACKGROUND:
+            self._start_background_refit(X, y, [name for name in names if 'error' not in self.results[name]])
             
         self._update_progress("Training completed!", 100)
         return self.results
 
-    def _save_model(self, name, model, X_full, y_full):
+    def _final_fit_mode(self):
+        mode = (current_app.config.get('TRAINING_FINAL_FIT') or FINAL_FIT_SPLIT).lower()
+        if mode not in (FINAL_FIT_SPLIT, FINAL_FIT_BACKGROUND):
+            self.logger.warning(f"Unknown TRAINING_FINAL_FIT '{mode}', using '{FINAL_FIT_SPLIT}'")
+            mode = FINAL_FIT_SPLIT
+        return mode
+
+    def _start_background_refit(self, X, y, names):
+        """Starts the full-data refit without blocking the caller"""
+        if not names:
+            return
+        app = current_app._get_current_object()
+        models = {name: clone(self.models[name]) for name in names}
+        thread = threading.Thread(target=self._refit_full, args=(app, models, X, y))
+        thread.daemon = True
+        thread.start()
+        self.logger.info(f"Full-data refit of {names} started in background")
+
+    def _refit_full(self, app, models, X, y):
         """
-        Retrains on full dataset and saves the model.
+        Retrains models on the full dataset and replaces their saved files one by one.
+        Until a model file is replaced (and models are reloaded), the previous model keeps serving.
+        """
+        with app.app_context():
+            workers, n_jobs = plan_workers(len(models), app.config.get('TRAINING_MAX_WORKERS'))
+            for name, outcome in self._fit_models(models, (X, y), workers, n_jobs, fit_only, report=False):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Full-data refit of {name} failed, keeping the previous model: {outcome}")
+                    continue
+                model, _, seconds = outcome
+                self.logger.info(f"Full-data refit of {name} finished in {seconds:.1f}s")
+                self._save_model(name, model)
+
+    def _fit_models(self, models, data, workers, n_jobs, task, report=True):
+        """
+        Runs task (fit_and_evaluate or fit_only) for every model, in a process pool when workers > 1.
+        Yields (name, (model, metrics, seconds) or Exception) in completion order.
+        """
+        names = list(models)
+        progress = self._update_model_progress if report else (lambda name, status: None)
+        if workers == 1:
+            init_worker(*data)
+            try:
+                for name in names:
+                    progress(name, 'training')
+                    try:
+                        yield name, task(name, models[name], n_jobs)[1:]
+                    except Exception as e:
+                        yield name, e
+            finally:
+                init_worker(None, None)
+            return
+
+        # Each worker receives the arrays once through the initializer, not once per model
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context(),
+                                 initializer=init_worker, initargs=data) as executor:
+            futures = {executor.submit(task, name, models[name], n_jobs): name for name in names}
+            queued = names[workers:]
+            for name in names[:workers]:
+                progress(name, 'training')
+            for future in as_completed(futures):
+                if queued:
+                    progress(queued.pop(0), 'training')
+                try:
+                    yield futures[future], future.result()[1:]
+                except Exception as e:
+                    yield futures[future], e
+
+    def _save_model(self, name, model):
+        """
+        Saves a trained model. The file is written next to the target and then swapped in, so a
+        model reload never reads a half-written file.
         """
         try:
-            # Retrain on full data
-            model.fit(X_full, y_full)
-            
             config_key = f'MODEL_{name.upper()}_PATH'
             model_path = current_app.config.get(config_key)
             
             if model_path:
                 os.makedirs(os.path.dirname(model_path), exist_ok=True)
+                tmp_path = f"{model_path}.tmp"
                 if model_path.endswith('.joblib'):
-                    joblib.dump(model, model_path)
+                    joblib.dump(model, tmp_path)
                 else:
-                    with open(model_path, 'wb') as f:
+                    with open(tmp_path, 'wb') as f:
                         pickle.dump(model, f)
+                os.replace(tmp_path, model_path)
                 self.logger.info(f"Saved {name} to {model_path}")
             else:
                 # Save to temp
@@ -345,7 +464,7 @@ class TrainingPipeline:
                 col_label=self.col_label,
                 is_applied=True, # Since this is called only when save_models=True
                 word2vec_model_path=current_app.config.get('WORD2VEC_MODEL_PATH'),
-                notes="Retrained via Admin Panel (Robust Pipeline)"
+                notes=f"Retrained via Admin Panel (Robust Pipeline, final fit: {self._final_fit_mode()})"
             )
             db.session.add(run)
             db.session.flush()
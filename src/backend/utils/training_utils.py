@@ -20,7 +20,8 @@ from utils.utils import clean_text, vectorize_text, preprocess_for_model, prepro
 
 from utils.training_pipeline import TrainingPipeline
 
-def train_models(df, word2vec_model, save_models=False, user_id=None, filename=None, col_text=None, col_label=None, progress_callback=None):
+def train_models(df, word2vec_model, save_models=False, user_id=None, filename=None, col_text=None, col_label=None, progress_callback=None,
+                 model_progress_callback=None):
     """
     Melatih ulang model klasifikasi menggunakan TrainingPipeline yang lebih robust.
     """
@@ -31,7 +32,8 @@ def train_models(df, word2vec_model, save_models=False, user_id=None, filename=N
         filename=filename,
         col_text=col_text if col_text else 'normalisasi_kalimat',
         col_label=col_label if col_label else 'label',
-        progress_callback=progress_callback
+        progress_callback=progress_callback,
+        model_progress_callback=model_progress_callback
     )
     
     return pipeline.train(save_models=save_models)
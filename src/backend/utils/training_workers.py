@@ -0,0 +1,103 @@
+"""
+Worker functions for training classification models in a process pool (used by TrainingPipeline.train).
+
+This module only depends on scikit-learn/joblib (no Flask, database or Word2Vec model) so worker
+processes can import it cheaply, including with the 'spawn' start method.
+"""
+import multiprocessing
+import os
+import time
+
+from joblib import parallel_backend
+from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # pragma: no cover - threadpoolctl ships with scikit-learn
+    threadpool_limits = None
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on Windows/macOS
+        return os.cpu_count() or 1
+
+
+def plan_workers(model_count, max_workers=None):
+    """
+    Returns (processes, n_jobs per model) without oversubscription: processes x n_jobs <= CPUs.
+    max_workers caps the number of processes (TRAINING_MAX_WORKERS).
+    """
+    cpus = available_cpus()
+    workers = max(1, min(model_count, cpus, max_workers or cpus))
+    return workers, max(1, cpus // workers)
+
+
+def mp_context():
+    # spawn: never fork a request/training thread's process holding the parent's engine, locks and
+    # Word2Vec model; workers only import this module
+    return multiprocessing.get_context('spawn')
+
+
+def map_report_labels(report):
+    """Maps classification report keys 0/1 to non-radikal/radikal as the frontend expects"""
+    mapped_report = {}
+    for key, value in report.items():
+        if key == '0':
+            mapped_report['non-radikal'] = value
+        elif key == '1':
+            mapped_report['radikal'] = value
+        else:
+            mapped_report[key] = value
+    return mapped_report
+
+
+# Training arrays for this process, set once per worker by init_worker (not once per model)
+_data = {}
+
+
+def init_worker(X_train, y_train, X_test=None, y_test=None):
+    _data.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
+
+
+def _fit(model, X, y, n_jobs):
+    # Estimators with n_jobs=None (RF trees, calibration folds, KNN) take n_jobs threads from the
+    # joblib context; BLAS is capped to the same budget
+    with parallel_backend('threading', n_jobs=n_jobs):
+        if threadpool_limits is not None:
+            with threadpool_limits(limits=n_jobs):
+                model.fit(X, y)
+        else:
+            model.fit(X, y)
+
+
+def fit_and_evaluate(name, model, n_jobs=1):
+    """
+    Fits one model on the train split and evaluates it on the test split.
+    Returns (name, fitted model, metrics, seconds).
+    """
+    started = time.monotonic()
+    _fit(model, _data['X_train'], _data['y_train'], n_jobs)
+    X_test, y_test = _data['X_test'], _data['y_test']
+    y_pred = model.predict(X_test)
+    report = classification_report(y_test, y_pred, output_dict=True)
+    metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': report['weighted avg']['precision'],
+        'recall': report['weighted avg']['recall'],
+        'f1': report['weighted avg']['f1-score'],
+        'report': map_report_labels(report),
+        'confusion_matrix': confusion_matrix(y_test, y_pred).tolist()
+    }
+    return name, model, metrics, time.monotonic() - started
+
+
+def fit_only(name, model, n_jobs=1):
+    """
+    Fits one model on the worker's training arrays without evaluation (full-data refit).
+    Returns (name, fitted model, None, seconds).
+    """
+    started = time.monotonic()
+    _fit(model, _data['X_train'], _data['y_train'], n_jobs)
+    return name, model, None, time.monotonic() - started
@@ -1,6 +1,7 @@
 from functools import wraps
 import re
 import string
+import hashlib
 import secrets
 import numpy as np
 import pandas as pd
@@ -14,6 +15,7 @@ import time
 import pytz
 from flask import flash, redirect, url_for
 from flask_login import current_user
+from services.apify_client import get_client
 
 # Timezone constants
 JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
@@ -304,38 +306,43 @@ def clean_text(text):
     
     return text
 
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def compute_content_hash(text):
+    """
+    Hash SHA-256 (hex, 64 karakter) dari teks yang dinormalisasi (trim + spasi digabung).
+    Dipakai untuk kolom content_hash agar pengecekan duplikasi bisa memakai index.
+    Mengembalikan None untuk konten kosong (tidak pernah dianggap duplikat).
+    Normalisasi harus sama dengan backfill SQL di migrasi content_hash.
+    """
+    if text is None:
+        return None
+    normalized = _WHITESPACE_RE.sub(' ', str(text).strip())
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
 def check_content_duplicate(content, dataset_id=None):
     """
     Memeriksa apakah konten sudah ada dalam database untuk mencegah duplikasi
     """
     try:
-        from models import RawData, RawDataScraper
+        from models.models import RawData, RawDataScraper
         
-        if not content or not str(content).strip():
+        content_hash = compute_content_hash(content)
+        if content_hash is None:
             return False
         
-        # Normalisasi konten untuk perbandingan yang lebih akurat
-        normalized_content = str(content).strip()
-        
-        # Cek duplikasi di RawData berdasarkan konten yang sama persis
+        # Cek duplikasi berdasarkan content_hash (terindeks) alih-alih kolom TEXT
+        upload_query = RawData.query.filter(RawData.content_hash == content_hash)
+        scraper_query = RawDataScraper.query.filter(RawDataScraper.content_hash == content_hash)
         if dataset_id:
-            existing_upload = RawData.query.filter_by(
-                dataset_id=dataset_id,
-                content=normalized_content
-            ).first()
-            existing_scraper = RawDataScraper.query.filter_by(
-                dataset_id=dataset_id,
-                content=normalized_content
-            ).first()
-        else:
-            existing_upload = RawData.query.filter_by(
-                content=normalized_content
-            ).first()
-            existing_scraper = RawDataScraper.query.filter_by(
-                content=normalized_content
-            ).first()
+            upload_query = upload_query.filter(RawData.dataset_id == dataset_id)
+            scraper_query = scraper_query.filter(RawDataScraper.dataset_id == dataset_id)
         
-        return existing_upload is not None or existing_scraper is not None
+        return (
+            db_exists(upload_query) or db_exists(scraper_query)
+        )
         
     except Exception as e:
         return False
@@ -346,22 +353,17 @@ def check_cleaned_content_duplicate(cleaned_content):
     untuk mencegah duplikasi di tabel clean data
     """
     try:
-        from models import CleanDataUpload, CleanDataScraper
+        from models.models import CleanDataUpload, CleanDataScraper
         
-        if not cleaned_content:
+        content_hash = compute_content_hash(cleaned_content)
+        if content_hash is None:
             return False
         
-        # Cek duplikasi di CleanDataUpload
-        existing_clean_upload = CleanDataUpload.query.filter(
-            CleanDataUpload.cleaned_content == cleaned_content
-        ).first()
-        
-        # Cek duplikasi di CleanDataScraper
-        existing_clean_scraper = CleanDataScraper.query.filter(
-            CleanDataScraper.cleaned_content == cleaned_content
-        ).first()
-        
-        return existing_clean_upload is not None or existing_clean_scraper is not None
+        # Cek duplikasi di CleanDataUpload dan CleanDataScraper berdasarkan content_hash
+        return (
+            db_exists(CleanDataUpload.query.filter(CleanDataUpload.content_hash == content_hash)) or
+            db_exists(CleanDataScraper.query.filter(CleanDataScraper.content_hash == content_hash))
+        )
         
     except Exception as e:
         return False
@@ -372,32 +374,23 @@ def check_cleaned_content_duplicate_by_dataset(cleaned_content, dataset_id):
     untuk dataset tertentu untuk mencegah duplikasi di tabel clean data
     """
     try:
-        from models.models import CleanDataUpload, CleanDataScraper, RawDataScraper
+        from models.models import CleanDataUpload, CleanDataScraper
         
-        if not cleaned_content or not cleaned_content.strip():
+        content_hash = compute_content_hash(cleaned_content)
+        if content_hash is None:
             return False
         
-        # Normalisasi konten untuk perbandingan yang lebih akurat
-        normalized_content = cleaned_content.strip()
-        
-        # Cek duplikasi di CleanDataUpload untuk dataset tertentu
-        existing_clean_upload = CleanDataUpload.query.filter_by(
-            dataset_id=dataset_id,
-            cleaned_content=normalized_content
-        ).first()
-        
-        if existing_clean_upload:
-            return True
-        
-        # Cek duplikasi di CleanDataScraper untuk dataset tertentu
-        existing_clean_scraper = CleanDataScraper.query.join(
-            RawDataScraper, CleanDataScraper.raw_data_scraper_id == RawDataScraper.id
-        ).filter(
-            RawDataScraper.dataset_id == dataset_id,
-            CleanDataScraper.cleaned_content == normalized_content
-        ).first()
-        
-        return existing_clean_scraper is not None
+        # Memakai index (dataset_id, content_hash) di kedua tabel clean data
+        return (
+            db_exists(CleanDataUpload.query.filter(
+                CleanDataUpload.dataset_id == dataset_id,
+                CleanDataUpload.content_hash == content_hash
+            )) or
+            db_exists(CleanDataScraper.query.filter(
+                CleanDataScraper.dataset_id == dataset_id,
+                CleanDataScraper.content_hash == content_hash
+            ))
+        )
         
     except Exception as e:
         # Log error untuk debugging
@@ -405,6 +398,11 @@ def check_cleaned_content_duplicate_by_dataset(cleaned_content, dataset_id):
         logging.error(f"Error in check_cleaned_content_duplicate_by_dataset: {str(e)}")
         return False
 
+def db_exists(query):
+    """SELECT EXISTS(...) untuk query SQLAlchemy (lebih murah daripada .first())"""
+    from models.models import db
+    return db.session.query(query.exists()).scalar()
+
 def preprocess_for_model(text):
     """
     Preprocessing consistent with Training Notebook (3. Dataset Preprocessing.ipynb):
@@ -1113,9 +1111,7 @@ def get_apify_config():
             'instagram': os.getenv('APIFY_INSTAGRAM_ACTOR', 'apify/instagram-scraper'),
             'tiktok': os.getenv('APIFY_TIKTOK_ACTOR', 'clockworks/free-tiktok-scraper')
         },
-        'timeout': int(os.getenv('APIFY_TIMEOUT', '30')),  # Default 30 seconds
-        'max_retries': int(os.getenv('APIFY_MAX_RETRIES', '3')),  # Default 3 retries
-        'retry_delay': int(os.getenv('APIFY_RETRY_DELAY', '5'))  # Default 5 seconds delay
+        'timeout': int(os.getenv('APIFY_TIMEOUT', '30'))  # Default 30 seconds (read timeout)
     }
     
     # Validate configuration
@@ -1145,61 +1141,33 @@ def start_apify_actor(platform, keyword, date_from=None, date_to=None, max_resul
         'Content-Type': 'application/json'
     }
     
-    last_error = None
-    for attempt in range(config['max_retries']):
-        try:
-            response = requests.post(
-                url, 
-                json=input_data, 
-                headers=headers, 
-                timeout=config['timeout']
-            )
-            
-            if response.status_code == 201:
-                run_data = response.json()['data']
-                return run_data['id'], run_data['status']
-            else:
-                error_text = response.text
-                
-                # Handle specific Apify errors with user-friendly messages
-                if "actor-is-not-rented" in error_text.lower():
-                    raise Exception("Apify Actor tidak tersedia. Free trial telah berakhir dan memerlukan subscription berbayar. Silakan hubungi administrator untuk mengaktifkan akun Apify berbayar.")
-                elif "insufficient-credit" in error_text.lower() or "not enough credit" in error_text.lower():
-                    raise Exception("Kredit Apify tidak mencukupi. Silakan hubungi administrator untuk menambah kredit Apify.")
-                elif "invalid-token" in error_text.lower() or "unauthorized" in error_text.lower():
-                    raise Exception("Token Apify tidak valid atau tidak memiliki akses. Silakan hubungi administrator untuk memeriksa konfigurasi API.")
-                elif "actor-not-found" in error_text.lower():
-                    raise Exception(f"Actor Apify untuk platform {platform} tidak ditemukan. Silakan hubungi administrator untuk memeriksa konfigurasi actor.")
-                elif "rate limit" in error_text.lower():
-                    if attempt < config['max_retries'] - 1:
-                        time.sleep(config['retry_delay'] * (attempt + 1))  # Exponential backoff
-                        continue
-                    else:
-                        raise Exception("Rate limit Apify tercapai. Silakan tunggu beberapa menit sebelum mencoba lagi.")
-                else:
-                    raise Exception(f"Gagal memulai scraping (HTTP {response.status_code}): {error_text}. Silakan coba lagi atau hubungi administrator jika masalah berlanjut.")
-                    
-        except requests.exceptions.Timeout:
-            last_error = f"Timeout saat menghubungi Apify API (attempt {attempt + 1}/{config['max_retries']})"
-            if attempt < config['max_retries'] - 1:
-                time.sleep(config['retry_delay'])
-                continue
-        except requests.exceptions.ConnectionError:
-            last_error = f"Gagal terhubung ke Apify API (attempt {attempt + 1}/{config['max_retries']})"
-            if attempt < config['max_retries'] - 1:
-                time.sleep(config['retry_delay'])
-                continue
-        except Exception as e:
-            # Don't retry for configuration errors
-            if "tidak dikonfigurasi" in str(e) or "tidak tersedia" in str(e) or "tidak mencukupi" in str(e):
-                raise e
-            last_error = str(e)
-            if attempt < config['max_retries'] - 1:
-                time.sleep(config['retry_delay'])
-                continue
-    
-    # If we get here, all retries failed
-    raise Exception(f"Gagal memulai scraping setelah {config['max_retries']} percobaan. Error terakhir: {last_error}")
+    # Retry with jittered backoff on 429/5xx and connect errors is handled by the shared client
+    try:
+        response = get_client().post(url, json=input_data, headers=headers)
+    except requests.exceptions.Timeout:
+        raise Exception("Timeout saat menghubungi Apify API. Silakan coba lagi.")
+    except requests.exceptions.ConnectionError:
+        raise Exception("Gagal terhubung ke Apify API. Periksa koneksi internet Anda.")
+
+    if response.status_code == 201:
+        run_data = response.json()['data']
+        return run_data['id'], run_data['status']
+
+    error_text = response.text
+
+    # Handle specific Apify errors with user-friendly messages
+    if "actor-is-not-rented" in error_text.lower():
+        raise Exception("Apify Actor tidak tersedia. Free trial telah berakhir dan memerlukan subscription berbayar. Silakan hubungi administrator untuk mengaktifkan akun Apify berbayar.")
+    elif "insufficient-credit" in error_text.lower() or "not enough credit" in error_text.lower():
+        raise Exception("Kredit Apify tidak mencukupi. Silakan hubungi administrator untuk menambah kredit Apify.")
+    elif "invalid-token" in error_text.lower() or "unauthorized" in error_text.lower():
+        raise Exception("Token Apify tidak valid atau tidak memiliki akses. Silakan hubungi administrator untuk memeriksa konfigurasi API.")
+    elif "actor-not-found" in error_text.lower():
+        raise Exception(f"Actor Apify untuk platform {platform} tidak ditemukan. Silakan hubungi administrator untuk memeriksa konfigurasi actor.")
+    elif response.status_code == 429 or "rate limit" in error_text.lower():
+        raise Exception("Rate limit Apify tercapai. Silakan tunggu beberapa menit sebelum mencoba lagi.")
+    else:
+        raise Exception(f"Gagal memulai scraping (HTTP {response.status_code}): {error_text}. Silakan coba lagi atau hubungi administrator jika masalah berlanjut.")
 
 
 def prepare_actor_input(platform, keyword, date_from=None, date_to=None, max_results=25, instagram_params=None, language='id'):
@@ -1345,7 +1313,7 @@ def check_apify_run_status(run_id):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=config['timeout'])
+        response = get_client().get(url, headers=headers)
         
         if response.status_code == 200:
             return response.json()['data']
@@ -1372,7 +1340,8 @@ def get_apify_run_results(run_id):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=config['timeout'] * 2)  # Longer timeout for results
+        client = get_client()
+        response = client.get(url, headers=headers, timeout=(client.timeout[0], config['timeout'] * 2))  # Longer timeout for results
         
         if response.status_code == 200:
             results = response.json()
@@ -1436,7 +1405,7 @@ def get_apify_run_progress(run_id):
         status_url = f"{config['base_url']}/actor-runs/{run_id}"
         headers = {'Authorization': f"Bearer {config['api_token']}"}
         
-        response = requests.get(status_url, headers=headers)
+        response = get_client().get(status_url, headers=headers)
         
         if response.status_code == 200:
             run_data = response.json()['data']
@@ -1482,7 +1451,7 @@ def get_apify_run_progress(run_id):
                 # Try to get actual results count
                 try:
                     results_url = f"{config['base_url']}/actor-runs/{run_id}/dataset/items"
-                    results_response = requests.get(results_url, headers=headers)
+                    results_response = get_client().get(results_url, headers=headers)
                     if results_response.status_code == 200:
                         results = results_response.json()
                         progress_info['items_processed'] = len(results)
@@ -1515,7 +1484,7 @@ def abort_apify_run(run_id):
         config = get_apify_config()
         abort_url = f"{config['base_url']}/actor-runs/{run_id}/abort"
         headers = {'Authorization': f"Bearer {config['api_token']}"}
-        resp = requests.post(abort_url, headers=headers)
+        resp = get_client().post(abort_url, headers=headers)
         return resp.status_code in (200, 202)
     except Exception:
         return False